@@ -1,12 +1,24 @@
+import os
+import sys
+
+# Import depuis un autre répertoire (ex. `from tools import app` dans les exemples) :
+# les modules de l'application s'importent entre eux par leur nom
+TOOLS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if TOOLS_DIRECTORY not in sys.path:
+    sys.path.insert(0, TOOLS_DIRECTORY)
+
 from dash import html, dcc
 from dash.dependencies import Input, Output
+import resources
 from pages import page1, page2
 from callbacks.page1_callbacks import register_callbacks as register_page1_callbacks
 from callbacks.page2_callbacks import register_callbacks as register_page2_callbacks
+from session_store import new_session_id
+from metrics import register_metrics_route
 
-def configure_layout_and_routes(app):
+def serve_layout():
     # Layout principal avec un menu de navigation
-    app.layout = html.Div(
+    return html.Div(
         style={
             "fontFamily": "Arial, sans-serif",
             "backgroundColor": "#f4f4f4",
@@ -63,6 +75,8 @@ def configure_layout_and_routes(app):
             ),
             # Conteneur pour les pages
             dcc.Location(id='url', refresh=False),
+            # Identifiant de session, propre à chaque onglet (conservé au rechargement)
+            dcc.Store(id='session-id', data=new_session_id(), storage_type='session'),
             html.Div(
                 id='page-content',
                 style={
@@ -73,14 +87,48 @@ def configure_layout_and_routes(app):
         ]
     )
 
+
+def configure_layout_and_routes(app):
+    # Layout généré à chaque chargement de page (nouvel identifiant de session)
+    app.layout = serve_layout
+
     # Callback pour changer de page
     @app.callback(Output('page-content', 'children'), Input('url', 'pathname'))
     def display_page(pathname):
         if pathname == '/page2':
             return page2.layout
         else:  # Page par défaut
-            return page1.layout
+            return page1.layout()
 
     # Enregistrement des callbacks
     register_page1_callbacks(app)
     register_page2_callbacks(app)
+
+    # Mesures du serveur au format Prometheus (voir metrics.py, NEURO_MESH_METRICS=1)
+    register_metrics_route(app.server)
+
+
+def run_dash_app(mesh_file, texture_paths=(), texture_names=None, debug=False, **run_options):
+    """
+    Lance l'application sur un maillage et des textures préchargés.
+
+    Les textures sont lues une seule fois, au lancement, dans une pile float32
+    (une ligne par texture) ; le sélecteur de texture passe de l'une à l'autre
+    en n'envoyant au navigateur que les nouvelles intensités.
+
+    :param mesh_file: Chemin du maillage GIFTI.
+    :param texture_paths: Chemins des textures GIFTI de ce maillage.
+    :param texture_names: Noms affichés dans le sélecteur (par défaut, les noms des fichiers).
+    :param debug: Mode debug de Dash (sans rechargement automatique, qui relancerait le script appelant).
+    :param run_options: Autres options de app.run (host, port...).
+    """
+    from app_instance import app
+    from callbacks.page1_callbacks import preloaded_entries
+
+    resources.set_preloaded_textures(mesh_file, texture_paths, texture_names)
+    preloaded_entries.cache_clear()
+    # Lecture et vérification des fichiers avant le démarrage du serveur
+    preloaded_entries()
+    if not app.callback_map:
+        configure_layout_and_routes(app)
+    app.run(debug=debug, use_reloader=False, **run_options)
@@ -0,0 +1,144 @@
+/*
+ * Callbacks exécutés dans le navigateur pour la visualisation 3D.
+ *
+ * restyle : applique la colormap et la plage de valeurs à la figure déjà
+ * affichée. Seules les propriétés légères du maillage (cmin, cmax, colorscale)
+ * changent ; les sommets, faces et intensités sont réutilisés tels quels.
+ *
+ * styleRequest : transmet au serveur un changement de colormap ou de plage,
+ * seulement s'il doit y être appliqué : couleurs exactes d'une colormap
+ * personnalisée (vertexcolor), ou intensité quantifiée à recoder sur la
+ * nouvelle plage. Les autres changements ne font aucun aller-retour serveur.
+ *
+ * decodeIntensity : reconvertit l'intensité quantifiée (uint8 / uint16) reçue
+ * dans meta.quantized_intensity en valeurs float32, puis la place dans
+ * l'intensité du maillage. Le code le plus élevé correspond aux valeurs NaN.
+ *
+ * hoverPoint : transmet au serveur l'indice du point survolé, seulement si
+ * l'intensité est quantifiée (la valeur exacte n'est alors pas dans la
+ * figure) ; sinon, aucun aller-retour serveur et l'affichage est vidé.
+ *
+ * togglePlayback / nextFrame : lecture des trames d'une texture multi-trames.
+ * Le navigateur fait avancer le slider des trames ; le serveur n'envoie que
+ * l'intensité de la nouvelle trame.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    viewer: {
+        restyle: function (valueRange, colormap, blackIntervals, centerColormap, colorscales, figure) {
+            var noUpdate = window.dash_clientside.no_update;
+            if (!figure || !figure.data || !figure.data.length || figure.data[0].intensity === undefined) {
+                return noUpdate;
+            }
+            var entry = colorscales && colorscales[colormap];
+            if (!entry || !valueRange) {
+                return noUpdate;
+            }
+
+            var cmin = valueRange[0];
+            var cmax = valueRange[1];
+            // Centrer la colormap sur zéro
+            if (centerColormap && centerColormap.indexOf('on') !== -1) {
+                var maxAbsValue = Math.max(Math.abs(cmin), Math.abs(cmax));
+                cmin = -maxAbsValue;
+                cmax = maxAbsValue;
+            }
+            var useStripes = blackIntervals && blackIntervals.indexOf('on') !== -1;
+
+            var trace = Object.assign({}, figure.data[0], {
+                cmin: cmin,
+                cmax: cmax,
+                colorscale: useStripes ? entry.stripes : entry.plain
+            });
+            return Object.assign({}, figure, {data: [trace].concat(figure.data.slice(1))});
+        },
+
+        styleRequest: function (valueRange, colormap, blackIntervals, centerColormap, vertexColors, state) {
+            var noUpdate = window.dash_clientside.no_update;
+            if (!state || !state.range || !valueRange) {
+                return noUpdate;
+            }
+            var exactColors = state.vertex_colors || (vertexColors && vertexColors.indexOf('on') !== -1);
+            if (!exactColors && !state.quantize) {
+                return noUpdate;
+            }
+            var cmin = valueRange[0];
+            var cmax = valueRange[1];
+            if (centerColormap && centerColormap.indexOf('on') !== -1) {
+                var maxAbsValue = Math.max(Math.abs(cmin), Math.abs(cmax));
+                cmin = -maxAbsValue;
+                cmax = maxAbsValue;
+            }
+            var useStripes = Boolean(blackIntervals && blackIntervals.indexOf('on') !== -1);
+            var rangeChanged = cmin !== state.range[0] || cmax !== state.range[1];
+            var colormapChanged = colormap !== state.colorscale[0] || useStripes !== state.colorscale[1];
+            // Déjà affiché (par exemple, plage renvoyée par le serveur avec la figure)
+            if (!rangeChanged && !(exactColors && colormapChanged)) {
+                return noUpdate;
+            }
+            return {range: [cmin, cmax], colorscale: [colormap, useStripes]};
+        },
+
+        decodeIntensity: function (figure) {
+            var noUpdate = window.dash_clientside.no_update;
+            if (!figure || !figure.data || !figure.data.length) {
+                return noUpdate;
+            }
+            var meta = figure.data[0].meta;
+            var quantized = meta && meta.quantized_intensity;
+            if (!quantized) {
+                return noUpdate;
+            }
+
+            var binary = atob(quantized.bdata);
+            var bytes = new Uint8Array(binary.length);
+            for (var b = 0; b < binary.length; b++) {
+                bytes[b] = binary.charCodeAt(b);
+            }
+            var codes = quantized.dtype === 'u2' ? new Uint16Array(bytes.buffer) : bytes;
+            var values = new Float32Array(codes.length);
+            for (var i = 0; i < codes.length; i++) {
+                values[i] = codes[i] === quantized.nan_code ? NaN : quantized.offset + codes[i] * quantized.scale;
+            }
+
+            // Les codes sont retirés : la figure décodée ne déclenche pas de nouveau décodage
+            var trace = Object.assign({}, figure.data[0], {intensity: values, meta: null});
+            return Object.assign({}, figure, {data: [trace].concat(figure.data.slice(1))});
+        },
+
+        hoverPoint: function (hoverData, state, point) {
+            var noUpdate = window.dash_clientside.no_update;
+            if (!state || !state.quantize) {
+                return [noUpdate, ''];
+            }
+            var hovered = hoverData && hoverData.points && hoverData.points[0];
+            if (!hovered || hovered.curveNumber !== 0 || hovered.pointNumber === undefined) {
+                return [noUpdate, noUpdate];
+            }
+            // Même point que le précédent : la valeur affichée est déjà la bonne
+            if (point && point.index === hovered.pointNumber && point.texture === state.texture
+                    && point.lod === state.lod && point.faces === state.apply_to_faces
+                    && point.reducer === state.face_reducer) {
+                return [noUpdate, noUpdate];
+            }
+            return [{
+                index: hovered.pointNumber,
+                texture: state.texture,
+                lod: state.lod,
+                faces: state.apply_to_faces,
+                reducer: state.face_reducer
+            }, noUpdate];
+        },
+
+        togglePlayback: function (nClicks) {
+            // Nombre impair de clics : lecture en cours
+            return !(nClicks % 2);
+        },
+
+        nextFrame: function (nIntervals, frame, lastFrame) {
+            if (!lastFrame) {
+                return window.dash_clientside.no_update;
+            }
+            return (frame + 1) % (lastFrame + 1);
+        }
+    }
+});
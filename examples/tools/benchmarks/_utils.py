@@ -0,0 +1,92 @@
+"""Outils communs aux benchmarks de l'application Dash (examples/tools)."""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+TOOLS_DIRECTORY = os.path.dirname(BENCHMARK_DIRECTORY)
+RESULTS_DIRECTORY = os.path.join(BENCHMARK_DIRECTORY, 'results')
+
+
+def setup_tools_path():
+    """Se place dans examples/tools (chemins relatifs de l'application) et le rend importable."""
+    os.chdir(TOOLS_DIRECTORY)
+    if TOOLS_DIRECTORY not in sys.path:
+        sys.path.insert(0, TOOLS_DIRECTORY)
+
+
+def git_commit():
+    """Commit courant du dépôt, pour comparer les résultats d'un commit à l'autre."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIRECTORY,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(name, results):
+    """
+    Ajoute un enregistrement à benchmarks/results/<name>.jsonl.
+
+    :return: Chemin du fichier de résultats.
+    """
+    os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+    path = os.path.join(RESULTS_DIRECTORY, f"{name}.jsonl")
+    record = {
+        'commit': git_commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(path, 'a') as file:
+        file.write(json.dumps(record) + '\n')
+    return path
+
+
+def component_values(component, values=None):
+    """Valeurs initiales {'id.propriété': valeur} des composants d'un layout Dash."""
+    if values is None:
+        values = {}
+    component_id = getattr(component, 'id', None)
+    if isinstance(component_id, str):
+        for prop in component._prop_names:
+            if prop not in ('id', 'children', 'style') and getattr(component, prop, None) is not None:
+                values[f"{component_id}.{prop}"] = getattr(component, prop)
+    children = getattr(component, 'children', None)
+    if not isinstance(children, (list, tuple)):
+        children = [children]
+    for child in children:
+        if hasattr(child, '_prop_names'):
+            component_values(child, values)
+    return values
+
+
+def dash_request(app, client, output, values, changed=('.',)):
+    """
+    Déclenche un callback Dash comme le ferait le navigateur.
+
+    :param output: Sous-chaîne identifiant le callback dans app.callback_map (ex. '3d-mesh.figure').
+    :param values: Valeurs {'id.propriété': valeur} des entrées et états.
+    :return: (réponse JSON ou None si pas de mise à jour, taille de la réponse en octets)
+    """
+    key, callback = next((k, v) for k, v in app.callback_map.items() if output in k and 'callback' in v)
+    multi = key.startswith('..')
+    outputs = [dict(zip(('id', 'property'), o.rsplit('.', 1)))
+               for o in (key[2:-2].split('...') if multi else [key])]
+    body = {
+        'output': key,
+        'outputs': outputs if multi else outputs[0],
+        'inputs': [dict(i, value=values.get(f"{i['id']}.{i['property']}")) for i in callback['inputs']],
+        'state': [dict(s, value=values.get(f"{s['id']}.{s['property']}")) for s in callback['state']],
+        'changedPropIds': list(changed),
+    }
+    response = client.post('/_dash-update-component', json=body)
+    if response.status_code == 204:
+        return None, 0
+    if response.status_code != 200:
+        raise RuntimeError(f"Callback {output} : HTTP {response.status_code}")
+    return response.get_json(), len(response.data)
@@ -0,0 +1,288 @@
+"""
+Benchmark des chemins critiques de chargement et de rendu.
+
+Sur des maillages synthétiques (tores maillés régulièrement, texture
+aléatoire) de 10k, 100k, 500k et 1M sommets, mesure :
+- load_mesh et read_gii_file, à froid (cache GIFTI vide) et à chaud,
+- plot_mesh_with_colorbar (sommets / faces, contours, traits noirs,
+  intensité quantifiée sur 16 / 8 bits) et la sérialisation JSON de la
+  figure (taille envoyée au navigateur),
+- le callback update_figure appelé comme par le navigateur (chargement du
+  maillage, de la texture, puis changement d'option) ; le traitement des
+  fichiers importés (ingestion.py) est compté dans les étapes de chargement,
+- la coloration de pyglet_plot (plot.texture_to_colors).
+
+Pour chaque mesure : temps médian, pic mémoire (tracemalloc, mesuré sur une
+exécution séparée) et, le cas échéant, taille en octets.
+
+Usage :
+    python benchmarks/bench_hot_paths.py [--sizes 10000 100000] [--repeat 3] [--no-save]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import _utils
+
+SIZES = [10000, 100000, 500000, 1000000]
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(_utils.TOOLS_DIRECTORY))
+
+
+def torus_mesh(n_vertices, major_radius=60., minor_radius=25.):
+    """
+    Tore maillé régulièrement, d'environ n_vertices sommets.
+
+    :return: (vertices float32 (N, 3), faces int32 (2N, 3))
+    """
+    n_v = max(3, int(np.sqrt(n_vertices / 3)))
+    n_u = max(3, n_vertices // n_v)
+    u, v = np.meshgrid(np.linspace(0, 2 * np.pi, n_u, endpoint=False),
+                       np.linspace(0, 2 * np.pi, n_v, endpoint=False), indexing='ij')
+    ring = major_radius + minor_radius * np.cos(v)
+    vertices = np.column_stack([(ring * np.cos(u)).ravel(), (ring * np.sin(u)).ravel(),
+                                (minor_radius * np.sin(v)).ravel()]).astype(np.float32)
+    i, j = np.meshgrid(np.arange(n_u), np.arange(n_v), indexing='ij')
+    a = (i * n_v + j).ravel()
+    b = (((i + 1) % n_u) * n_v + j).ravel()
+    c = (((i + 1) % n_u) * n_v + (j + 1) % n_v).ravel()
+    d = (i * n_v + (j + 1) % n_v).ravel()
+    faces = np.concatenate([np.column_stack([a, b, c]), np.column_stack([a, c, d])]).astype(np.int32)
+    return vertices, faces
+
+
+def write_gifti(directory, name, vertices, faces, scalars):
+    """Écrit le maillage et la texture en GIFTI ; retourne les chemins (maillage, texture)."""
+    import nibabel as nib
+
+    mesh_path = os.path.join(directory, f"{name}_mesh.gii")
+    texture_path = os.path.join(directory, f"{name}_texture.gii")
+    nib.save(nib.gifti.GiftiImage(darrays=[
+        nib.gifti.GiftiDataArray(vertices, intent='NIFTI_INTENT_POINTSET'),
+        nib.gifti.GiftiDataArray(faces, intent='NIFTI_INTENT_TRIANGLE'),
+    ]), mesh_path)
+    nib.save(nib.gifti.GiftiImage(darrays=[nib.gifti.GiftiDataArray(scalars)]), texture_path)
+    return mesh_path, texture_path
+
+
+def measure(function, repeat, setup=None):
+    """
+    Temps médian de function() sur repeat exécutions, puis pic mémoire d'une exécution de plus.
+
+    Une première exécution, non mesurée, écarte le coût des imports différés.
+
+    :param setup: Fonction appelée (hors mesure) avant chaque exécution.
+    :return: (dict {'time_s', 'peak_mb'}, résultat de la dernière exécution)
+    """
+    if setup is not None:
+        setup()
+    function()
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'time_s': statistics.median(times), 'peak_mb': peak / 1024 ** 2}, result
+
+
+def bench_loading(paths, repeat):
+    """load_mesh / read_gii_file, cache GIFTI vide (froid) puis rempli (chaud)."""
+    import fonctions as fct
+    from gifti_cache import GiftiCache
+
+    mesh_path, texture_path = paths
+    results = {}
+    cold_directory = tempfile.mkdtemp(prefix='bench-gifti-')
+    warm_cache = fct.GIFTI_CACHE
+
+    def cold_cache():
+        shutil.rmtree(cold_directory, ignore_errors=True)
+        fct.GIFTI_CACHE = GiftiCache(cold_directory)
+
+    try:
+        for name, function in [('load_mesh', lambda: fct.load_mesh(mesh_path)),
+                               ('read_gii_file', lambda: np.asarray(fct.read_gii_file(texture_path)).sum())]:
+            results[f"{name}_cold"], _ = measure(function, repeat, setup=cold_cache)
+            fct.GIFTI_CACHE = warm_cache
+            function()
+            results[f"{name}_warm"], _ = measure(function, repeat)
+    finally:
+        fct.GIFTI_CACHE = warm_cache
+        shutil.rmtree(cold_directory, ignore_errors=True)
+    return results
+
+
+def bench_figures(vertices, faces, scalars, repeat):
+    """Construction et sérialisation de la figure pour chaque variante d'affichage."""
+    import fonctions as fct
+
+    variants = {
+        'vertex': {},
+        'face': {'apply_to_faces': True},
+        'contours': {'show_contours': True},
+        'stripes': {'use_black_intervals': True},
+        'quantized_u16': {'quantize_bits': 16},
+        'quantized_u8': {'quantize_bits': 8},
+    }
+    # Sans encodage binaire, le texte de survol par sommet rend les grands maillages trop lents
+    if len(vertices) <= 100000:
+        variants['vertex_json'] = {'binary_encoding': False}
+    results = {}
+
+    def plot(quantize_bits=None, **options):
+        fig = fct.plot_mesh_with_colorbar(vertices, faces, scalars, **options)
+        if quantize_bits:
+            fct.quantize_figure_intensity(fig, scalars, np.nanmin(scalars), np.nanmax(scalars), quantize_bits)
+        return fig
+
+    for name, options in variants.items():
+        options = dict({'binary_encoding': True}, **options)
+        results[f"plot_{name}"], fig = measure(lambda: plot(**options), repeat)
+        results[f"serialize_{name}"], payload = measure(fig.to_json, repeat)
+        results[f"serialize_{name}"]['bytes'] = len(payload.encode('utf-8'))
+    return results
+
+
+def bench_callback(paths, repeat):
+    """update_figure appelé comme par le navigateur (test client Flask)."""
+    from app_instance import app
+    from app import configure_layout_and_routes, serve_layout
+    from callbacks import page1_callbacks
+    from pages import page1
+
+    if not app.callback_map:
+        configure_layout_and_routes(app)
+    client = app.server.test_client()
+    sources = {os.path.basename(path): path for path in paths}
+    mesh_name, texture_name = sources
+    kept_directories = set()
+
+    values = _utils.component_values(serve_layout())
+    values.update(_utils.component_values(page1.layout()))
+
+    def ingest(kind, name):
+        # Fichier importé (la tâche le déplace), puis tâche de la file d'import, attendue ici
+        # pour que son traitement soit compté dans l'étape
+        path = os.path.join(page1_callbacks.UPLOAD_DIRECTORY, name)
+        shutil.copy(sources[name], path)
+        session_id = values['session-id.data']
+        if kind == 'mesh':
+            job_id = page1_callbacks.ingestion.submit(page1_callbacks.ingest_mesh, path, owner=session_id)
+        else:
+            session = page1_callbacks.store.get_session(session_id)
+            job_id = page1_callbacks.ingestion.submit(page1_callbacks.ingest_texture, path, session['mesh'],
+                                                      owner=session_id)
+        while page1_callbacks.ingestion.status(job_id)['status'] not in ('done', 'error'):
+            time.sleep(0.001)
+        kept_directories.add(os.path.dirname(page1_callbacks.ingestion.status(job_id)['result']['entry']['path']))
+        return job_id
+
+    def request(changed, **updates):
+        values.update({name: value() if callable(value) else value for name, value in updates.items()})
+        response, size = _utils.dash_request(app, client, '3d-mesh.figure', values, changed)
+        if response is not None:
+            values['figure-state.data'] = response['response']['figure-state']['data']
+        return size
+
+    steps = [
+        ('upload_mesh', ['ingestion-result.data'],
+         {'ingestion-result.data': lambda: ingest('mesh', mesh_name)}),
+        ('upload_texture', ['ingestion-result.data'],
+         {'ingestion-result.data': lambda: ingest('texture', texture_name)}),
+        ('full_resolution', ['lod-level.value'], {'lod-level.value': 'full'}),
+        ('toggle_faces', ['toggle-triangle.value'], {'toggle-triangle.value': ['on']}),
+    ]
+    results = {}
+    try:
+        for _ in range(repeat):
+            values.update({'figure-state.data': None, 'lod-level.value': 'coarse', 'toggle-triangle.value': []})
+            for name, changed, updates in steps:
+                start = time.perf_counter()
+                size = request(changed, **updates)
+                elapsed = time.perf_counter() - start
+                entry = results.setdefault(f"update_figure_{name}", {'times': [], 'bytes': size})
+                entry['times'].append(elapsed)
+    finally:
+        for directory in kept_directories:
+            shutil.rmtree(directory, ignore_errors=True)
+    return {name: {'time_s': statistics.median(entry['times']), 'bytes': entry['bytes']}
+            for name, entry in results.items()}
+
+
+def bench_pyglet_coloring(vertices, faces, scalars, repeat):
+    """Coloration d'une texture comme dans pyglet_plot (sans ouvrir de fenêtre)."""
+    import trimesh
+    if REPOSITORY_DIRECTORY not in sys.path:
+        sys.path.append(REPOSITORY_DIRECTORY)
+    import plot
+
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+    def color():
+        colored = plot.shallow_mesh(mesh)
+        colored.visual.vertex_colors = plot.texture_to_colors(scalars)
+        return colored
+
+    results = {}
+    results['pyglet_coloring'], _ = measure(color, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="nombres de sommets")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-callback', action='store_true', help="ne pas mesurer update_figure")
+    parser.add_argument('--no-save', action='store_true', help="ne pas enregistrer les résultats")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Caches isolés : les mesures ne dépendent pas des fichiers déjà décodés
+        os.environ['NEURO_MESH_CACHE_DIR'] = os.path.join(directory, 'sessions')
+        os.environ['NEURO_MESH_GIFTI_CACHE_DIR'] = os.path.join(directory, 'gifti')
+        _utils.setup_tools_path()
+
+        results = {'repeat': args.repeat}
+        rng = np.random.default_rng(0)
+        for size in args.sizes:
+            vertices, faces = torus_mesh(size)
+            scalars = rng.standard_normal(len(vertices)).astype(np.float32)
+            paths = write_gifti(directory, f"bench_{size}", vertices, faces, scalars)
+            size_results = {'n_vertices': len(vertices), 'n_faces': len(faces)}
+            size_results.update(bench_loading(paths, args.repeat))
+            size_results.update(bench_figures(vertices, faces, scalars, args.repeat))
+            if not args.no_callback:
+                size_results.update(bench_callback(paths, args.repeat))
+            size_results.update(bench_pyglet_coloring(vertices, faces, scalars, args.repeat))
+            results[str(size)] = size_results
+
+            print(f"\n{len(vertices)} sommets, {len(faces)} faces")
+            for name, entry in size_results.items():
+                if isinstance(entry, dict):
+                    line = f"{name:>32} : {entry['time_s'] * 1000:9.1f} ms"
+                    if 'peak_mb' in entry:
+                        line += f"  {entry['peak_mb']:8.1f} Mo"
+                    if 'bytes' in entry:
+                        line += f"  {entry['bytes'] / 1024 ** 2:8.2f} Mo envoyés"
+                    print(line)
+
+    if not args.no_save:
+        print(f"Résultats ajoutés à {_utils.save_results('hot_paths', results)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark du démarrage de l'application Dash.
+
+Mesure, dans un interpréteur neuf à chaque répétition :
+- le temps d'import et de configuration de l'application (serveur prêt),
+- le temps jusqu'à la première requête servie ('/', layout et dépendances),
+- le temps jusqu'à la première figure (affichage de la page 1 et premier
+  appel de update_figure).
+
+Usage :
+    python benchmarks/bench_startup.py [--repeat 5] [--cold] [--no-save]
+
+--cold utilise des caches vides à chaque répétition (premier lancement) ;
+sinon les caches sont préchauffés par une première exécution.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import _utils
+
+
+def run_once():
+    """Mesures d'un démarrage (exécuté dans un sous-processus)."""
+    t_start = time.perf_counter()
+    _utils.setup_tools_path()
+    from app_instance import app
+    from app import configure_layout_and_routes, serve_layout
+    configure_layout_and_routes(app)
+    t_ready = time.perf_counter()
+
+    client = app.server.test_client()
+    for url in ('/', '/_dash-layout', '/_dash-dependencies'):
+        assert client.get(url).status_code == 200, url
+    t_first_request = time.perf_counter()
+
+    values = _utils.component_values(serve_layout())
+    values['url.pathname'] = '/'
+    _utils.dash_request(app, client, 'page-content.children', values)
+    from pages import page1
+    values.update(_utils.component_values(page1.layout()))
+    _, figure_bytes = _utils.dash_request(app, client, '3d-mesh.figure', values)
+    t_first_figure = time.perf_counter()
+
+    return {
+        'ready_s': t_ready - t_start,
+        'first_request_s': t_first_request - t_start,
+        'first_figure_s': t_first_figure - t_start,
+        'first_figure_bytes': figure_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cold', action='store_true', help="caches vides à chaque répétition")
+    parser.add_argument('--no-save', action='store_true', help="ne pas enregistrer les résultats")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_once()))
+        return
+
+    runs = []
+    with tempfile.TemporaryDirectory() as cache_directory:
+        for repeat in range(args.repeat + (0 if args.cold else 1)):
+            run_cache = os.path.join(cache_directory, str(repeat) if args.cold else 'shared')
+            env = dict(os.environ, NEURO_MESH_CACHE_DIR=os.path.join(run_cache, 'sessions'),
+                       NEURO_MESH_GIFTI_CACHE_DIR=os.path.join(run_cache, 'gifti'))
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], env=env,
+                                     capture_output=True, text=True)
+            if process.returncode != 0:
+                sys.exit(process.stderr)
+            output = process.stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            if args.cold or repeat > 0:  # la première exécution ne sert qu'à préchauffer les caches
+                runs.append(result)
+
+    results = {'mode': 'cold' if args.cold else 'warm', 'repeat': args.repeat}
+    for key in runs[0]:
+        results[key] = statistics.median(run[key] for run in runs)
+    for key, value in results.items():
+        print(f"{key:>20} : {value:.3f}" if isinstance(value, float) else f"{key:>20} : {value}")
+    if not args.no_save:
+        print(f"Résultats ajoutés à {_utils.save_results('startup', results)}")
+
+
+if __name__ == '__main__':
+    main()
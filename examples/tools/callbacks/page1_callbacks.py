@@ -1,28 +1,534 @@
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_uploader as du
 import fonctions as fct
+import functools
 import numpy as np
 import os
-from dash import callback_context
+import resources
+from dash import callback_context, no_update
+from dash.exceptions import PreventUpdate
+from ingestion import IngestionQueue, peek_gifti_header
+from isolines import IsolineExtractor, isoline_segments, parse_levels, segments_to_lines
+from lod import MeshPyramid
+from metrics import METRICS, timed
+from playback import TextureFrames, is_label_texture
+from render_scheduler import RenderScheduler, RenderSkipped
+from session_store import SessionStore, array_digest
 
 
-# Charger les colormaps locales
-local_colormaps = fct.load_local_colormaps('./custom_colormap')
-
-UPLOAD_DIRECTORY = "./uploaded_files/"
+# Répertoires relatifs à examples/tools (comme resources), quel que soit le répertoire courant
+UPLOAD_DIRECTORY = os.path.join(resources.TOOLS_DIRECTORY, 'uploaded_files')
+# Transmettre sommets, faces et intensités en tableaux binaires (float32 / uint32)
+BINARY_ENCODING = True
+# Nombre maximal de sommets affichés en mode aperçu (niveau de détail grossier)
+LOD_VERTEX_BUDGET = 100000
 if not os.path.exists(UPLOAD_DIRECTORY):
     os.makedirs(UPLOAD_DIRECTORY)
 
+# Cache des tableaux (partagé entre sessions et workers) et taille maximale sur disque
+CACHE_DIRECTORY = os.environ.get('NEURO_MESH_CACHE_DIR', os.path.join(resources.TOOLS_DIRECTORY, 'cache'))
+CACHE_MAX_BYTES = int(os.environ.get('NEURO_MESH_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+# Durée (en secondes) après laquelle l'état d'une session inutilisée est supprimé
+SESSION_MAX_AGE = int(os.environ.get('NEURO_MESH_SESSION_MAX_AGE', 7 * 24 * 3600))
+store = SessionStore(CACHE_DIRECTORY, max_bytes=CACHE_MAX_BYTES, max_session_age=SESSION_MAX_AGE)
+# Traitement des fichiers importés en arrière-plan, état des tâches sur disque
+ingestion = IngestionQueue(os.path.join(CACHE_DIRECTORY, 'jobs'),
+                           max_workers=int(os.environ.get('NEURO_MESH_INGESTION_WORKERS', 2)))
+# Regroupement des rafales de rendus (une session ne calcule qu'un rendu par intervalle)
+RENDER_SETTLE_INTERVAL = 0.05
+# Lecture des trames : pas de regroupement, mais les trames dépassées sont abandonnées
+playback_scheduler = RenderScheduler(settle_interval=0)
+scheduler = RenderScheduler(settle_interval=RENDER_SETTLE_INTERVAL)
+METRICS.register_collector(lambda: [('render_requests', {'event': event}, count)
+                                    for event, count in scheduler.stats().items()])
+METRICS.register_collector(lambda: [('topology_registry', {'event': event}, count)
+                                    for event, count in fct.TOPOLOGIES.stats().items()])
 
-def register_callbacks(app):
-    global current_mesh, current_vertices, current_faces, current_scalars, default_min, default_max
-    current_mesh = fct.load_mesh('./data/mesh.gii')
-    current_vertices, current_faces = current_mesh.vertices, current_mesh.faces
-    current_scalars = None  # Pas de texture par défaut
-    default_min, default_max = 0, 1
 
+@timed('mesh_entry')
+def mesh_entry(path):
+    """Charge un maillage et range ses tableaux dans le store."""
+    vertices, faces, _ = fct.load_mesh_arrays(path)
+    vertices_key, faces_key = store.put_arrays(vertices, faces)
+    return {'path': path, 'vertices': vertices_key, 'faces': faces_key}
+
+
+@timed('texture_entry')
+def texture_entry(path):
+    """
+    Charge une texture (sa première trame) et range ses valeurs dans le store.
+
+    La trame est lue comme par la lecture des trames : premier data array, ou
+    première colonne d'un data array 2D (N sommets, T trames).
+    """
+    frames = TextureFrames(path, prefetch=0)
+    try:
+        first_frame = frames.frame(0)
+        labels = frames.labels
+    finally:
+        frames.close()
+    return {'path': path, 'scalars': store.put_array(first_frame), 'n_frames': len(frames), 'labels': labels}
+
+
+def stack_entries(mesh, paths):
+    """
+    Charge des textures dans une pile float32 (T, N), rangée dans le store.
+
+    Le store la relit en mémoire mappée ; chaque texture en est une ligne, et
+    passer de l'une à l'autre ne relit aucun fichier.
+
+    :return: Une entrée de texture par ligne de la pile.
+    """
+    vertices, = entry_arrays(mesh, ['vertices'], mesh_entry)
+    stack = fct.read_texture_stack(paths, len(vertices))
+    key = store.put_array(stack)
+    return [{'path': path, 'stack': key, 'stack_paths': list(paths), 'row': row,
+             'scalars': f"{key}.{row}", 'n_frames': 1, 'labels': is_label_texture(fct.open_gifti(path)),
+             'range': [float(np.nanmin(stack[row])), float(np.nanmax(stack[row]))]}
+            for row, path in enumerate(paths)]
+
+
+def entry_arrays(entry, names, reload):
+    """Tableaux d'une entrée de session ; relit le fichier source s'ils ont été évincés du cache."""
+    try:
+        return [store.get_array(entry[name]) for name in names]
+    except KeyError:
+        entry.update(reload(entry['path']))
+        return [store.get_array(entry[name]) for name in names]
+
+
+@timed('session_pyramid')
+def session_pyramid(mesh):
+    """Pyramide de niveaux de détail du maillage d'une session (construite une fois par processus)."""
+    def build():
+        vertices, faces = entry_arrays(mesh, ['vertices', 'faces'], mesh_entry)
+        return MeshPyramid(vertices, faces)
+    return store.memoize(('lod', mesh['vertices'], mesh['faces']), build)
+
+
+def session_topology(mesh, pyramid, level):
+    """
+    Clé de contenu des faces d'un niveau de détail.
+
+    Deux maillages de même topologie (sujets rééchantillonnés sur un même
+    gabarit) ont la même clé : passer de l'un à l'autre ne renvoie que les
+    sommets au navigateur.
+    """
+    if level == 0:
+        return mesh['faces']
+    return store.memoize(('topology', mesh['vertices'], mesh['faces'], level),
+                         lambda: array_digest(pyramid.faces[level]))
+
+
+def texture_scalars(texture):
+    """Valeurs par sommet d'une texture chargée, ou d'une ligne de la pile préchargée."""
+    if 'stack' in texture:
+        def reload(path):
+            return {'stack': store.put_array(fct.read_texture_stack(texture['stack_paths']))}
+        stack, = entry_arrays(texture, ['stack'], reload)
+        return stack[texture['row']]
+    scalars, = entry_arrays(texture, ['scalars'], texture_entry)
+    return scalars
+
+
+def session_level_scalars(mesh, texture, pyramid):
+    """Texture d'une session projetée sur chaque niveau de détail."""
+    def build():
+        return pyramid.map_texture_to_levels(texture_scalars(texture), texture.get('labels', False))
+    return store.memoize(('lod-texture', mesh['vertices'], mesh['faces'], texture['scalars'],
+                          texture.get('labels', False)), build)
+
+
+def session_frames(texture):
+    """
+    Trames d'une texture multi-trames (lecture mappée et anticipée), ouvertes une fois par processus.
+
+    Le chemin d'une texture importée désigne un contenu fixe (voir keep_upload) : deux sessions ne
+    partagent des trames que si elles regardent le même fichier. Le store ferme les trames évincées.
+    """
+    return store.memoize(('frames', texture['path']), lambda: TextureFrames(texture['path']))
+
+
+@timed('session_frame_scalars')
+def session_frame_scalars(mesh, texture, frame, pyramid, level):
+    """Valeurs d'une trame de la texture d'une session, projetées sur un niveau de détail."""
+    if not frame or texture.get('n_frames', 1) <= 1:
+        return session_level_scalars(mesh, texture, pyramid)[level]
+    return pyramid.map_texture(session_frames(texture).frame(frame), level, texture.get('labels', False))
+
+
+def texture_state_key(texture, frame):
+    """Clé de la texture affichée (contenu et trame), pour figure-state."""
+    return None if texture is None else f"{texture['scalars']}@{frame or 0}"
+
+
+def session_face_scalars(mesh, texture_key, level, scalars, faces, face_reducer):
+    """Texture affichée ramenée aux faces d'un niveau de détail, calculée une fois par réduction."""
+    return store.memoize(('face-scalars', mesh['vertices'], mesh['faces'], texture_key, level, face_reducer),
+                         lambda: fct.scalars_vertices_to_faces(scalars, faces, face_reducer))
+
+
+def session_vertex_colors(mesh, texture_key, level, values, values_key, colormap, interval_colors,
+                          color_min, color_max):
+    """
+    Couleurs (uint8) d'une texture pour une colormap par intervalles.
+
+    Une seule entrée du cache par texture et colormap, qui ne garde que les
+    couleurs de la dernière plage : déplacer le slider ne remplit pas le cache
+    (et n'en chasse pas les pyramides).
+
+    :param values: Valeurs affichées, par sommet ou déjà ramenées aux faces.
+    :param values_key: Réduction utilisée pour les faces (None pour des valeurs par sommet).
+    :return: (valeurs, couleurs).
+    """
+    latest = store.memoize(('vertexcolor', mesh['vertices'], mesh['faces'], texture_key, level,
+                            values_key, colormap), dict)
+    color_range = (float(color_min), float(color_max))
+    cached = latest.get('colors')
+    if cached is None or cached[0] != color_range:
+        cached = color_range, fct.apply_interval_colormap(values, interval_colors, *color_range)
+        latest['colors'] = cached
+    return values, cached[1]
+
+
+def session_isolines(mesh, texture_key, level, vertices, faces, scalars, levels):
+    """
+    Isolignes de la texture affichée aux niveaux levels.
+
+    Les segments sont mis en cache niveau par niveau : changer l'ensemble des
+    niveaux ne calcule que les nouveaux.
+
+    :return: Coordonnées (x, y, z) séparées par NaN, ou None sans niveau.
+    """
+    if not levels:
+        return None
+    extractor = store.memoize(('isolines', mesh['vertices'], mesh['faces'], texture_key, level),
+                              lambda: IsolineExtractor(vertices, faces, scalars))
+    return extractor.lines(levels)
+
+
+@functools.lru_cache(maxsize=1)
+def default_mesh_entry():
+    """Entrée du maillage par défaut, rangée dans le store une seule fois par processus."""
+    vertices, faces = resources.get_default_mesh_arrays()
+    vertices_key, faces_key = store.put_arrays(vertices, faces)
+    return {'path': resources.DEFAULT_MESH_PATH, 'vertices': vertices_key, 'faces': faces_key}
+
+
+def keep_upload(path):
+    """
+    Déplace un fichier importé dans UPLOAD_DIRECTORY/<empreinte du contenu>/<nom>.
+
+    Les fichiers importés partagent un même répertoire : un import de même nom,
+    depuis une autre session, remplacerait le fichier que désignent les entrées
+    de session. Rangé sous son empreinte, un chemin désigne toujours le même contenu.
+
+    :return: Le nouveau chemin du fichier.
+    """
+    directory = os.path.join(UPLOAD_DIRECTORY, fct.GIFTI_CACHE.digest(path))
+    os.makedirs(directory, exist_ok=True)
+    kept_path = os.path.join(directory, os.path.basename(path))
+    os.replace(path, kept_path)
+    return kept_path
+
+
+def ingest_mesh(report, path):
+    """
+    Tâche d'import d'un maillage : vérification, décodage, niveaux de détail.
+
+    :return: {'kind': 'mesh', 'name', 'entry'} (entrée du maillage dans le store).
+    """
+    name = os.path.basename(path)
+    report(0.05, f"Vérification de {name}")
+    header = peek_gifti_header(path)
+    if header['intent'] not in ('NIFTI_INTENT_POINTSET', 'NIFTI_INTENT_TRIANGLE'):
+        raise ValueError(f"{name} n'est pas un maillage (intention {header['intent']})")
+    report(0.1, f"Décodage de {name}")
+    entry = mesh_entry(keep_upload(path))
+    report(0.7, "Calcul des niveaux de détail")
+    session_pyramid(entry)
+    return {'kind': 'mesh', 'name': name, 'entry': entry}
+
+
+def ingest_texture(report, path, mesh):
+    """
+    Tâche d'import d'une texture pour le maillage mesh : le nombre de valeurs
+    est vérifié sur l'en-tête, avant le décodage.
+
+    :return: {'kind': 'texture', 'name', 'entry', 'mesh', 'range'}.
+    """
+    name = os.path.basename(path)
+    report(0.05, f"Vérification de {name}")
+    shape = peek_gifti_header(path)['shape']
+    vertices, = entry_arrays(mesh, ['vertices'], mesh_entry)
+    if not shape or shape[0] != len(vertices):
+        raise ValueError(f"{name} : {shape[0] if shape else 0} valeurs pour un maillage de "
+                         f"{len(vertices)} sommets")
+    report(0.1, f"Décodage de {name}")
+    entry = texture_entry(keep_upload(path))
+    scalars = texture_scalars(entry)
+    report(0.6, "Projection sur les niveaux de détail")
+    session_level_scalars(mesh, entry, session_pyramid(mesh))
+    return {'kind': 'texture', 'name': name, 'entry': entry, 'mesh': mesh['vertices'],
+            'range': [float(np.nanmin(scalars)), float(np.nanmax(scalars))]}
+
+
+def session_job(job_id, session_id):
+    """État d'une tâche d'import soumise par la session session_id, ou None (tâche inconnue ou d'une autre session)."""
+    try:
+        job = ingestion.status(job_id)
+    except ValueError:
+        return None
+    if job is None or job.get('owner') != session_id:
+        return None
+    return job
+
+
+def ingestion_result(job_id, session_id):
+    """Résultat d'une tâche d'import terminée de la session (voir ingest_mesh et ingest_texture), ou None."""
+    job = session_job(job_id, session_id)
+    if job is None or job['status'] != 'done':
+        return None
+    return job['result']
+
+
+@functools.lru_cache(maxsize=1)
+def preloaded_entries():
+    """
+    Maillage et textures préchargés par app.run_dash_app, chargés une seule fois par processus.
+
+    :return: (entrée du maillage, entrées des textures), ou None sans préchargement.
+    """
+    if resources.PRELOADED['mesh_path'] is None:
+        return None
+    mesh = mesh_entry(resources.PRELOADED['mesh_path'])
+    return mesh, stack_entries(mesh, resources.PRELOADED['texture_paths'])
+
+
+def default_session():
+    """État d'une nouvelle session : maillage par défaut sans texture, ou première texture préchargée."""
+    preloaded = preloaded_entries()
+    if preloaded is not None:
+        mesh, textures = preloaded
+        texture = dict(textures[0]) if textures else None
+        return {'mesh': dict(mesh), 'texture': texture,
+                'default_range': texture['range'] if texture else [0, 1]}
+    return {'mesh': dict(default_mesh_entry()), 'texture': None, 'default_range': [0, 1]}
+
+
+def slider_marks(min_value, max_value):
+    """Graduations du range-slider (clés en float natif pour rester sérialisables en JSON)."""
+    return {float(i): f"{i:.2f}" for i in np.linspace(min_value, max_value, 5)}
+
+
+def figure_state(mesh_key, lod_level, texture_key, apply_to_faces, colormap, use_black_intervals,
+                 color_min, color_max, show_contours, vertex_colors=False, face_reducer='max',
+                 isoline_levels=None, topology=None, quantize_bits=None):
+    """
+    Résumé (léger) de ce qui est affiché côté client.
+
+    Il est conservé dans le dcc.Store 'figure-state' et permet de n'envoyer au
+    navigateur que les propriétés modifiées lors de l'interaction suivante.
+    """
+    return {
+        'mesh': mesh_key,
+        'lod': lod_level,
+        'topology': topology,
+        'texture': texture_key,
+        'apply_to_faces': bool(apply_to_faces),
+        'face_reducer': face_reducer,
+        'colorscale': [colormap, bool(use_black_intervals)],
+        'range': None if color_min is None else [float(color_min), float(color_max)],
+        'contours': bool(show_contours),
+        'vertex_colors': bool(vertex_colors),
+        'quantize': quantize_bits,
+        'isolines': list(isoline_levels or []),
+    }
+
+
+def geometry_changed(previous_state, state):
+    """Vrai si le maillage affiché (sommets ou niveau de détail) a changé."""
+    return previous_state['mesh'] != state['mesh'] or previous_state['lod'] != state['lod']
+
+
+def displayed_values_changed(previous_state, state):
+    """Vrai si les valeurs affichées (maillage, texture, trame, mode sommets / faces, réduction) ont changé."""
+    return (geometry_changed(previous_state, state)
+            or previous_state['texture'] != state['texture']
+            or previous_state['apply_to_faces'] != state['apply_to_faces']
+            or (state['apply_to_faces'] and previous_state.get('face_reducer') != state['face_reducer']))
+
+
+@timed('changed_properties')
+def changed_properties(previous_state, state, values, style, vertex_colors=None, vertices=None):
+    """
+    Liste les propriétés du Mesh3d à renvoyer pour passer de previous_state à state.
+
+    Les faces (i, j, k) n'en font jamais partie : si le maillage a changé, il a
+    la même topologie, et seuls les sommets (x, y, z) sont renvoyés. values sont
+    les valeurs affichées (par sommet, ou déjà ramenées aux faces). En mode couleurs
+    calculées sur le serveur, vertex_colors est le couple (valeurs, couleurs).
+    """
+    changes = {}
+    intensitymode = 'cell' if state['apply_to_faces'] else 'vertex'
+    if vertex_colors is not None:
+        values_changed = displayed_values_changed(previous_state, state)
+        if (values_changed or previous_state['range'] != state['range']
+                or previous_state['colorscale'] != state['colorscale']):
+            values, colors = vertex_colors
+            properties = fct.vertex_color_properties(values, colors, intensitymode, BINARY_ENCODING)
+            # Mêmes valeurs : seules les couleurs sont renvoyées (pas les données de survol)
+            if not values_changed:
+                properties = {key: properties[key] for key in ('vertexcolor', 'facecolor') if key in properties}
+            changes.update(properties)
+    elif values is not None:
+        quantize_bits = state.get('quantize')
+        if quantize_bits and (displayed_values_changed(previous_state, state)
+                              or previous_state['range'] != state['range']):
+            # Codes relatifs à la plage de couleurs : recodés quand elle change
+            changes.update(fct.quantized_intensity_properties(values, *state['range'], intensitymode, quantize_bits))
+        elif displayed_values_changed(previous_state, state):
+            changes.update(fct.intensity_properties(values, intensitymode, BINARY_ENCODING))
+        if previous_state['range'] != state['range']:
+            changes.update(cmin=style['cmin'], cmax=style['cmax'])
+        if previous_state['colorscale'] != state['colorscale']:
+            changes.update(colorscale=style['colorscale'])
+    if previous_state['contours'] != state['contours']:
+        changes.update(contour=dict(show=state['contours'], color='black', width=2))
+    if geometry_changed(previous_state, state):
+        changes.update(fct.geometry_properties(vertices, BINARY_ENCODING))
+    return changes
+
+
+def register_callbacks(app):
     du.configure_upload(app, UPLOAD_DIRECTORY, use_upload_id=False)
 
+    # Intensité quantifiée : décodée dans le navigateur à chaque figure ou mise à jour qui en apporte
+    app.clientside_callback(
+        ClientsideFunction(namespace='viewer', function_name='decodeIntensity'),
+        Output('3d-mesh', 'figure', allow_duplicate=True),
+        Input('3d-mesh', 'figure'),
+        prevent_initial_call=True,
+    )
+
+    # Changement de colormap ou de plage : recoloration dans le navigateur, sans aller-retour serveur
+    app.clientside_callback(
+        ClientsideFunction(namespace='viewer', function_name='restyle'),
+        Output('3d-mesh', 'figure', allow_duplicate=True),
+        [
+            Input('range-slider', 'value'),
+            Input('colormap-dropdown', 'value'),
+            Input('toggle-black-intervals', 'value'),
+            Input('toggle-center-colormap', 'value'),
+        ],
+        [
+            State('colorscales', 'data'),
+            State('3d-mesh', 'figure'),
+        ],
+        prevent_initial_call=True,
+    )
+
+    # Couleurs exactes des colormaps personnalisées, ou intensité quantifiée sur une nouvelle plage :
+    # seuls ces changements de style sont transmis à update_figure
+    app.clientside_callback(
+        ClientsideFunction(namespace='viewer', function_name='styleRequest'),
+        Output('style-request', 'data'),
+        [
+            Input('range-slider', 'value'),
+            Input('colormap-dropdown', 'value'),
+            Input('toggle-black-intervals', 'value'),
+            Input('toggle-center-colormap', 'value'),
+        ],
+        [
+            State('toggle-vertex-colors', 'value'),
+            State('figure-state', 'data'),
+        ],
+        prevent_initial_call=True,
+    )
+
+    @app.callback(
+        [
+            Output('lod-level', 'value'),
+            Output('lod-idle-timer', 'n_intervals'),
+            Output('lod-idle-timer', 'disabled'),
+        ],
+        [
+            Input('ingestion-result', 'data'),
+            Input('lod-idle-timer', 'n_intervals'),
+        ],
+        State('session-id', 'data'),
+        prevent_initial_call=True,
+    )
+    def schedule_full_resolution(job_id, n_intervals, session_id):
+        """Affiche d'abord l'aperçu d'un nouveau maillage, puis la pleine résolution une fois inactif."""
+        if any("ingestion-result" in t["prop_id"] for t in callback_context.triggered):
+            ingested = ingestion_result(job_id, session_id)
+            if not ingested or ingested['kind'] != 'mesh':
+                raise PreventUpdate
+            return 'coarse', 0, False
+        return 'full', no_update, True
+
+    @app.callback(
+        [
+            Output('ingestion-job', 'data'),
+            Output('ingestion-timer', 'disabled'),
+            Output('ingestion-progress', 'value'),
+            Output('ingestion-status', 'children'),
+        ],
+        [
+            Input('upload-mesh', 'isCompleted'),
+            Input('upload-texture', 'isCompleted'),
+        ],
+        [
+            State('upload-mesh', 'fileNames'),
+            State('upload-texture', 'fileNames'),
+            State('session-id', 'data'),
+        ],
+        prevent_initial_call=True,
+    )
+    def start_ingestion(mesh_uploaded, texture_uploaded, mesh_files, texture_files, session_id):
+        """Confie le fichier importé à la file de traitement ; le callback répond aussitôt."""
+        triggered = callback_context.triggered
+        if any("upload-mesh" in t["prop_id"] for t in triggered) and mesh_uploaded and mesh_files:
+            path = os.path.join(UPLOAD_DIRECTORY, os.path.basename(mesh_files[0]))
+            job_id = ingestion.submit(ingest_mesh, path, message=f"{mesh_files[0]} en attente", owner=session_id)
+        elif any("upload-texture" in t["prop_id"] for t in triggered) and texture_uploaded and texture_files:
+            # La texture est vérifiée par rapport au maillage affiché au moment de l'import
+            session = store.get_session(session_id) or default_session()
+            path = os.path.join(UPLOAD_DIRECTORY, os.path.basename(texture_files[0]))
+            job_id = ingestion.submit(ingest_texture, path, session['mesh'],
+                                      message=f"{texture_files[0]} en attente", owner=session_id)
+        else:
+            raise PreventUpdate
+        return job_id, False, 0, "Fichier en attente de traitement..."
+
+    @app.callback(
+        [
+            Output('ingestion-progress', 'value', allow_duplicate=True),
+            Output('ingestion-status', 'children', allow_duplicate=True),
+            Output('ingestion-timer', 'disabled', allow_duplicate=True),
+            Output('ingestion-result', 'data'),
+        ],
+        Input('ingestion-timer', 'n_intervals'),
+        [
+            State('ingestion-job', 'data'),
+            State('session-id', 'data'),
+        ],
+        prevent_initial_call=True,
+    )
+    def poll_ingestion(n_intervals, job_id, session_id):
+        """Affiche la progression de la tâche en cours ; signale sa fin à update_figure."""
+        job = session_job(job_id, session_id)
+        if job is None:
+            return 0, "Tâche introuvable.", True, no_update
+        progress = round(100 * job['progress'])
+        if job['status'] == 'error':
+            return 0, f"Erreur : {job['message']}", True, no_update
+        if job['status'] == 'done':
+            # Seul l'identifiant de la tâche passe par le navigateur : son résultat est relu sur le serveur
+            return 100, f"{job['result']['name']} traité.", True, job_id
+        return progress, job['message'], False, no_update
+
     @app.callback(
         [
             Output('3d-mesh', 'figure'),
@@ -31,105 +537,325 @@ def register_callbacks(app):
             Output('range-slider', 'max'),
             Output('range-slider', 'value'),
             Output('range-slider', 'marks'),
+            Output('figure-state', 'data'),
+            Output('frame-slider', 'max'),
+            Output('frame-slider', 'value'),
         ],
         [
-            Input('upload-mesh', 'isCompleted'),
-            Input('upload-texture', 'isCompleted'),
-            Input('range-slider', 'value'),
+            Input('ingestion-result', 'data'),
+            Input('texture-selector', 'value'),
             Input('toggle-triangle', 'value'),
+            Input('face-reducer', 'value'),
             Input('toggle-contours', 'value'),
-            Input('toggle-black-intervals', 'value'),
-            Input('colormap-dropdown', 'value'),
-            Input('toggle-center-colormap', 'value'),
+            Input('isoline-levels', 'value'),
+            Input('lod-level', 'value'),
+            Input('toggle-vertex-colors', 'value'),
+            Input('intensity-transport', 'value'),
+            # La colormap et la plage de valeurs sont appliquées dans le navigateur
+            # (callback client 'viewer.restyle') ; le serveur n'en est averti
+            # ('viewer.styleRequest') qu'en mode couleurs exactes, ou pour recoder
+            # une intensité quantifiée sur une nouvelle plage.
+            Input('style-request', 'data'),
         ],
         [
-            State('upload-mesh', 'fileNames'),
-            State('upload-texture', 'fileNames'),
+            State('range-slider', 'value'),
+            State('toggle-black-intervals', 'value'),
+            State('colormap-dropdown', 'value'),
+            State('toggle-center-colormap', 'value'),
+            State('figure-state', 'data'),
+            State('session-id', 'data'),
+            State('frame-slider', 'value'),
         ],
     )
     def update_figure(
-        mesh_uploaded, texture_uploaded, value_range, toggle_triangle, toggle_contours,
-        toggle_black_intervals, selected_colormap, center_colormap,
-        mesh_files, texture_files
+        ingestion_job, selected_texture, toggle_triangle, face_reducer, toggle_contours,
+        isoline_text, lod_level, toggle_vertex_colors, intensity_transport, style_request,
+        value_range, toggle_black_intervals, selected_colormap, center_colormap,
+        previous_state, session_id, frame
     ):
-        global current_mesh, current_vertices, current_faces, current_scalars, default_min, default_max
+        colormap_registry = resources.get_colormap_registry()
+        local_colormaps = colormap_registry.local_colormaps()
 
         triggered = callback_context.triggered
+        interval_colors = None
+        if 'on' in (toggle_vertex_colors or []):
+            interval_colors = fct.interval_colormap_data(selected_colormap, colormap_registry=colormap_registry)
+        # Changement de style déjà appliqué dans le navigateur, et rien à recalculer ici
+        if ([t["prop_id"] for t in triggered] == ['style-request.data']
+                and interval_colors is None and not (previous_state or {}).get('vertex_colors')
+                and not (previous_state or {}).get('quantize')):
+            raise PreventUpdate
+        with METRICS.timer('update_figure', stage='session'):
+            stored_session = store.get_session(session_id)
+        session = stored_session or default_session()
         feedback = None
 
-        # Handle new mesh upload
-        if any("upload-mesh" in t["prop_id"] for t in triggered):
-            if mesh_uploaded and mesh_files:
-                uploaded_file = os.path.join(UPLOAD_DIRECTORY, mesh_files[0])
-                current_mesh = fct.load_mesh(uploaded_file)
-                current_vertices, current_faces = current_mesh.vertices, current_mesh.faces
-                current_scalars = None  # Reset texture
-                default_min, default_max = 0, 1  # Reset slider range
-                feedback = f"Maillage {mesh_files[0]} chargé avec succès."
-                return (
-                    fct.plot_mesh_with_colorbar(current_vertices, current_faces, None),
-                    feedback,
-                    default_min,
-                    default_max,
-                    [default_min, default_max],
-                    {i: f"{i:.2f}" for i in np.linspace(default_min, default_max, 5)},
-                )
+        # Fichier importé, déjà décodé et vérifié par la file de traitement (voir start_ingestion)
+        ingested = None
+        if any(t["prop_id"] == "ingestion-result.data" for t in triggered):
+            ingested = ingestion_result(ingestion_job, session_id)
+        ingestion_done = ingested is not None
+        if ingestion_done and ingested['kind'] == 'mesh':
+            session['mesh'] = ingested['entry']
+            session['texture'] = None  # Reset texture
+            frame = 0
+            session['default_range'] = [0, 1]  # Reset slider range
+            value_range = session['default_range']
+            feedback = f"Maillage {ingested['name']} chargé avec succès."
+        elif ingestion_done and ingested['kind'] == 'texture':
+            if ingested['mesh'] != session['mesh']['vertices']:
+                # Un autre maillage a été chargé pendant le traitement de la texture
+                feedback = f"Texture {ingested['name']} ignorée : le maillage a changé."
+            else:
+                session['texture'] = ingested['entry']
+                frame = 0
+                feedback = f"Texture {ingested['name']} chargée avec succès."
+                # Update slider and colorbar range based on new texture
+                session['default_range'] = ingested['range']
+                value_range = session['default_range']
 
-        # Handle new texture upload
-        if any("upload-texture" in t["prop_id"] for t in triggered):
-            if texture_uploaded and texture_files:
-                uploaded_file = os.path.join(UPLOAD_DIRECTORY, texture_files[0])
-                current_scalars = fct.read_gii_file(uploaded_file)
-                feedback = f"Texture {texture_files[0]} chargée avec succès."
+        # Texture préchargée choisie dans le sélecteur : aucune lecture de fichier
+        texture_selected = any(t["prop_id"] == "texture-selector.value" for t in triggered)
+        if texture_selected and selected_texture is not None and preloaded_entries() is not None:
+            mesh, textures = preloaded_entries()
+            session['mesh'] = dict(mesh)  # Au cas où un autre maillage a été importé entre-temps
+            session['texture'] = dict(textures[selected_texture])
+            frame = 0
+            session['default_range'] = session['texture']['range']
+            value_range = session['default_range']
+            feedback = f"Texture {resources.get_preloaded_texture_names()[selected_texture]} affichée."
 
-                # Update slider and colorbar range based on new texture
-                default_min, default_max = np.min(current_scalars), np.max(current_scalars)
-                slider_marks = {i: f"{i:.2f}" for i in np.linspace(default_min, default_max, 5)}
-                return (
-                    fct.plot_mesh_with_colorbar(
-                        current_vertices,
-                        current_faces,
-                        current_scalars,
-                        color_min=default_min,
-                        color_max=default_max,
-                        colormap=selected_colormap,
-                        local_colormaps=local_colormaps,  # Passer les colormaps locales ici
-                        show_contours='on' in toggle_contours,
-                        center_colormap_on_zero='on' in center_colormap,
-                        use_black_intervals='on' in toggle_black_intervals,
-                    ),
-                    feedback,
-                    default_min,
-                    default_max,
-                    [default_min, default_max],
-                    slider_marks,
+        # Premier affichage : plage de la texture de la session (préchargée)
+        if previous_state is None and session['texture'] is not None:
+            value_range = session['default_range']
+
+        if feedback is None:
+            if selected_colormap in local_colormaps:
+                feedback = f"Application de la colormap personnalisée : {selected_colormap}"
+            else:
+                feedback = f"Application de la colormap : {selected_colormap}"
+
+        # Nouveau fichier ou texture préchargée : le slider des trames est remis à zéro
+        uploaded = bool(texture_selected or ingestion_done)
+        # Enregistré avant le regroupement des rendus : un rendu différé n'écrase
+        # jamais l'état écrit entre-temps par un autre callback (import, sélection)
+        if stored_session is None or uploaded:
+            store.set_session(session_id, session)
+
+        @timed('update_figure', stage='render')
+        def render():
+            # État le plus récent de la session, s'il a changé pendant le regroupement
+            session.update(store.get_session(session_id) or {})
+            # Niveau de détail affiché : aperçu sous le budget de sommets, ou pleine résolution
+            pyramid = session_pyramid(session['mesh'])
+            level = 0 if lod_level == 'full' else pyramid.level_for_budget(LOD_VERTEX_BUDGET)
+            vertices, faces = pyramid.vertices[level], pyramid.faces[level]
+            scalars = None
+            if session['texture'] is not None:
+                scalars = session_frame_scalars(session['mesh'], session['texture'], frame, pyramid, level)
+
+            apply_to_faces = 'on' in toggle_triangle
+            show_contours = 'on' in toggle_contours
+            use_black_intervals = 'on' in toggle_black_intervals
+            color_min, color_max = None, None
+            if scalars is not None:
+                color_min, color_max = fct.compute_color_range(scalars, value_range[0], value_range[1],
+                                                               'on' in center_colormap)
+            mesh_key = f"{session['mesh']['vertices']}:{session['mesh']['faces']}"
+            texture_key = texture_state_key(session['texture'], frame)
+            use_vertex_colors = scalars is not None and interval_colors is not None
+            quantize_bits = fct.QUANTIZED_BITS.get(intensity_transport) if scalars is not None else None
+            isoline_levels = parse_levels(isoline_text) if scalars is not None else []
+            state = figure_state(mesh_key, level, texture_key, apply_to_faces, selected_colormap,
+                                 use_black_intervals, color_min, color_max, show_contours, use_vertex_colors,
+                                 face_reducer, isoline_levels, session_topology(session['mesh'], pyramid, level),
+                                 quantize_bits)
+            # Valeurs affichées : par sommet, ou ramenées aux faces (une fois par texture et réduction)
+            values = scalars
+            if scalars is not None and apply_to_faces:
+                values = session_face_scalars(session['mesh'], texture_key, level, scalars, faces, face_reducer)
+
+            # Nouvelle topologie (ou premier affichage) : toute la géométrie doit être envoyée
+            if (previous_state is None or previous_state.get('topology') != state['topology']
+                    or (previous_state['texture'] is None) != (state['texture'] is None)
+                    or previous_state.get('vertex_colors', False) != state['vertex_colors']
+                    or previous_state.get('quantize') != state['quantize']):
+                fig = fct.plot_mesh_with_colorbar(
+                    vertices,
+                    faces,
+                    values,
+                    color_min=color_min,
+                    color_max=color_max,
+                    colormap=selected_colormap,
+                    colormap_registry=colormap_registry,  # Colorscales déjà calculées
+                    show_contours=show_contours,
+                    use_black_intervals=use_black_intervals,
+                    apply_to_faces=apply_to_faces,
+                    scalars_on_faces=apply_to_faces,  # Valeurs déjà ramenées aux faces (session_face_scalars)
+                    binary_encoding=BINARY_ENCODING,
+                    use_vertex_colors=use_vertex_colors,
+                    face_reducer=face_reducer,
+                    isolines=session_isolines(session['mesh'], texture_key, level, vertices, faces, scalars,
+                                              isoline_levels),
                 )
+                if quantize_bits and not use_vertex_colors:
+                    fct.quantize_figure_intensity(fig, values, color_min, color_max, quantize_bits)
+            else:
+                # Même topologie : seules les propriétés modifiées (et les sommets d'un autre maillage) sont envoyées
+                style, vertex_colors, colorbar = None, None, None
+                if scalars is not None:
+                    style = fct.compute_style_properties(color_min, color_max, selected_colormap,
+                                                         use_black_intervals, show_contours=show_contours,
+                                                         colormap_registry=colormap_registry)
+                if use_vertex_colors:
+                    vertex_colors = session_vertex_colors(session['mesh'], texture_key, level, values,
+                                                          face_reducer if apply_to_faces else None,
+                                                          selected_colormap, interval_colors, color_min, color_max)
+                    if (previous_state['range'] != state['range']
+                            or previous_state['colorscale'] != state['colorscale']):
+                        colorbar = {key: style[key] for key in ('cmin', 'cmax', 'colorscale')}
+                changes = changed_properties(previous_state, state, values, style, vertex_colors, vertices)
+                isolines = None
+                isolines_changed = (previous_state.get('isolines') != state['isolines']
+                                    or (state['isolines'] and displayed_values_changed(previous_state, state)))
+                if scalars is not None and isolines_changed:
+                    isolines = fct.isoline_properties(
+                        session_isolines(session['mesh'], texture_key, level, vertices, faces, scalars,
+                                         isoline_levels),
+                        BINARY_ENCODING)
+                fig = (fct.patch_mesh_figure(changes, colorbar, isolines) if changes or colorbar or isolines
+                       else no_update)
 
-        # Generate figure with current data
-        feedback = None
-        if selected_colormap in local_colormaps:
-            feedback = f"Application de la colormap personnalisée : {selected_colormap}"
-        else:
-            feedback = f"Application de la colormap : {selected_colormap}"
-
-        fig = fct.plot_mesh_with_colorbar(
-            current_vertices,
-            current_faces,
-            current_scalars,
-            color_min=value_range[0],
-            color_max=value_range[1],
-            colormap=selected_colormap,
-            local_colormaps=local_colormaps,  # Passer les colormaps locales ici
-            show_contours='on' in toggle_contours,
-            center_colormap_on_zero='on' in center_colormap,
-            use_black_intervals='on' in toggle_black_intervals,
-            apply_to_faces='on' in toggle_triangle
-        )
-        return (
-            fig,
-            feedback,
-            default_min,
-            default_max,
-            value_range,
-            {i: f"{i:.2f}" for i in np.linspace(default_min, default_max, 5)},
-        )
+            default_min, default_max = session['default_range']
+            return (
+                fig,
+                feedback,
+                default_min,
+                default_max,
+                value_range,
+                slider_marks(default_min, default_max),
+                state,
+                # Slider des trames : remis à zéro au chargement d'un fichier
+                (session['texture'] or {}).get('n_frames', 1) - 1 if uploaded else no_update,
+                0 if uploaded else no_update,
+            )
+
+        # Les chargements de fichiers sont toujours traités ; les autres rendus d'une
+        # même session sont regroupés et les demandes dépassées abandonnées
+        if uploaded:
+            return render()
+        try:
+            return scheduler.submit(session_id, render)
+        except RenderSkipped:
+            raise PreventUpdate
+
+    # Survol : le navigateur ne sollicite le serveur que si l'intensité est quantifiée
+    app.clientside_callback(
+        ClientsideFunction(namespace='viewer', function_name='hoverPoint'),
+        [
+            Output('hover-point', 'data'),
+            Output('hover-value', 'children'),
+        ],
+        Input('3d-mesh', 'hoverData'),
+        [
+            State('figure-state', 'data'),
+            State('hover-point', 'data'),
+        ],
+        prevent_initial_call=True,
+    )
+
+    @app.callback(
+        Output('hover-value', 'children', allow_duplicate=True),
+        Input('hover-point', 'data'),
+        [
+            State('figure-state', 'data'),
+            State('session-id', 'data'),
+            State('frame-slider', 'value'),
+        ],
+        prevent_initial_call=True,
+    )
+    def show_hover_value(point, state, session_id, frame):
+        """Valeur exacte du point survolé, quand le navigateur n'a reçu qu'une intensité quantifiée."""
+        if not point or not state or not state.get('quantize') or state['texture'] is None:
+            return ""
+        session = store.get_session(session_id)
+        if not session or session['texture'] is None:
+            return ""
+        level = state['lod']
+        pyramid = session_pyramid(session['mesh'])
+        values = session_frame_scalars(session['mesh'], session['texture'], frame, pyramid, level)
+        if state['apply_to_faces']:
+            values = session_face_scalars(session['mesh'], state['texture'], level, values,
+                                          pyramid.faces[level], state['face_reducer'])
+        index = point['index']
+        if not 0 <= index < len(values):
+            raise PreventUpdate
+        return f"Valeur exacte : {float(values[index]):.6g}"
+
+    # Lecture des trames : le navigateur fait avancer le slider, le serveur n'envoie que l'intensité
+    app.clientside_callback(
+        ClientsideFunction(namespace='viewer', function_name='togglePlayback'),
+        Output('playback-timer', 'disabled'),
+        Input('play-button', 'n_clicks'),
+        prevent_initial_call=True,
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='viewer', function_name='nextFrame'),
+        Output('frame-slider', 'value', allow_duplicate=True),
+        Input('playback-timer', 'n_intervals'),
+        [
+            State('frame-slider', 'value'),
+            State('frame-slider', 'max'),
+        ],
+        prevent_initial_call=True,
+    )
+
+    @app.callback(
+        [
+            Output('3d-mesh', 'figure', allow_duplicate=True),
+            Output('figure-state', 'data', allow_duplicate=True),
+        ],
+        Input('frame-slider', 'value'),
+        [
+            State('figure-state', 'data'),
+            State('session-id', 'data'),
+        ],
+        prevent_initial_call=True,
+    )
+    def show_frame(frame, previous_state, session_id):
+        """Affiche une autre trame de la texture : seules les intensités (ou couleurs) sont envoyées."""
+        session = store.get_session(session_id)
+        if previous_state is None or not session or session['texture'] is None:
+            raise PreventUpdate
+        texture_key = texture_state_key(session['texture'], frame)
+        if previous_state['texture'] in (None, texture_key):
+            raise PreventUpdate
+
+        @timed('show_frame')
+        def render():
+            level = previous_state['lod']
+            pyramid = session_pyramid(session['mesh'])
+            vertices, faces = pyramid.vertices[level], pyramid.faces[level]
+            scalars = session_frame_scalars(session['mesh'], session['texture'], frame, pyramid, level)
+            state = dict(previous_state, texture=texture_key)
+            # Pas de mise en cache par trame : elle évincerait les pyramides des sessions
+            values = scalars
+            if state['apply_to_faces']:
+                values = fct.scalars_vertices_to_faces(scalars, faces, state['face_reducer'])
+            vertex_colors = None
+            if state.get('vertex_colors'):
+                interval_colors = fct.interval_colormap_data(state['colorscale'][0],
+                                                             colormap_registry=resources.get_colormap_registry())
+                vertex_colors = values, fct.apply_interval_colormap(values, interval_colors, *state['range'])
+            changes = changed_properties(previous_state, state, values, None, vertex_colors)
+            isolines = None
+            if state.get('isolines'):
+                segments = np.concatenate([isoline_segments(vertices, faces, scalars, isoline_level)
+                                           for isoline_level in state['isolines']])
+                isolines = fct.isoline_properties(segments_to_lines(segments), BINARY_ENCODING)
+            return fct.patch_mesh_figure(changes, isoline_properties=isolines), state
+
+        try:
+            return playback_scheduler.submit(session_id, render)
+        except RenderSkipped:
+            raise PreventUpdate
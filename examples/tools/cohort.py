@@ -0,0 +1,299 @@
+import glob
+import os
+import sys
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import mesh_store
+from gifti_reader import GiftiReader
+from session_store import array_digest
+
+_untracked_lock = threading.Lock()
+
+
+def _open_block(name=None, size=0, track=False):
+    """
+    Crée (name=None) ou ouvre un bloc de mémoire partagée.
+
+    Avant Python 3.13, tout processus qui crée ou ouvre un bloc l'enregistre,
+    et le resource tracker le supprime à la sortie du processus : un
+    processus de lecture ou de rendu supprimerait les blocs de la cohorte.
+    Seul le processus qui possède la cohorte ouvre donc les blocs avec
+    track=True ; le tracker ne libère les blocs que si ce processus se
+    termine sans avoir fermé la cohorte.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=name is None, size=size, track=track)
+    if track:
+        return shared_memory.SharedMemory(name=name, create=name is None, size=size)
+    # Les processus d'un même programme partagent un seul resource tracker : un désenregistrement
+    # après coup retirerait aussi l'enregistrement du processus propriétaire
+    with _untracked_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedArray:
+    """
+    Tableau numpy placé dans un bloc de mémoire partagée (multiprocessing.shared_memory).
+
+    L'objet ne transporte que le nom du bloc, la forme et le type : il se
+    transmet à un autre processus (pickle) sans copier les données, et
+    attach() y retourne une vue sur le même bloc.
+    """
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._shm = None
+        self._tracked = False
+
+    @classmethod
+    def create(cls, array):
+        """Copie array dans un nouveau bloc de mémoire partagée."""
+        array = np.asarray(array)
+        shm = _open_block(size=max(array.nbytes, 1))
+        shared = cls(shm.name, array.shape, array.dtype)
+        shared._shm = shm
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        return shared
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def attach(self):
+        """Vue numpy (lecture seule) sur le bloc, ouvert à la première demande."""
+        if self._shm is None:
+            self._shm = _open_block(self.name, track=self._tracked)
+        array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        array.flags.writeable = False
+        return array
+
+    def track(self):
+        """Enregistre le bloc auprès du resource tracker de ce processus, qui le libère s'il se termine."""
+        if not self._tracked:
+            self.close()
+            self._shm = _open_block(self.name, track=True)
+            self._tracked = True
+
+    def close(self):
+        """Ferme le bloc dans ce processus (les vues retournées par attach deviennent invalides)."""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        """Libère le bloc pour tous les processus."""
+        # unlink() désenregistre le bloc : il doit d'abord être connu du tracker
+        self.track()
+        if self._shm is None:
+            self._shm = _open_block(self.name, track=True)
+        self._shm.unlink()
+        self.close()
+
+    def __getstate__(self):
+        return {'name': self.name, 'shape': self.shape, 'dtype': self.dtype.str}
+
+    def __setstate__(self, state):
+        self.__init__(state['name'], state['shape'], state['dtype'])
+
+
+class Subject:
+    """
+    Maillage ou texture d'un sujet de la cohorte, en mémoire partagée.
+
+    arrays associe 'vertices' et 'faces' (maillage) ou 'texture' (texture,
+    de forme (N,) ou (T, N)) à leur SharedArray. topology est l'empreinte des
+    faces d'un maillage : les sujets de même topologie partagent le même bloc
+    de faces.
+    """
+
+    def __init__(self, path, kind, arrays, topology=None):
+        self.path = path
+        self.kind = kind
+        self.arrays = arrays
+        self.topology = topology
+
+    def __getitem__(self, name):
+        return self.arrays[name].attach()
+
+    def to_trimesh(self):
+        """Objet trimesh.Trimesh du maillage (ses tableaux sont copiés par trimesh)."""
+        import trimesh
+        return trimesh.Trimesh(vertices=self['vertices'], faces=self['faces'],
+                               metadata={'filename': self.path}, process=False)
+
+    def close(self):
+        for shared in self.arrays.values():
+            shared.close()
+
+
+def read_subject(path):
+    """
+    Lit un maillage ou une texture GIFTI (ou un répertoire mesh_store).
+
+    :return: (kind, arrays) : ('mesh', {'vertices', 'faces'}) ou
+        ('texture', {'texture'}), texture de forme (N,) ou (T, N).
+    """
+    if mesh_store.is_store(path):
+        gifti = mesh_store.open_store(path)
+        arrays = gifti.darrays(range(len(gifti)))
+        if gifti.kind == 'mesh':
+            return 'mesh', {'vertices': arrays[0], 'faces': arrays[1]}
+    else:
+        # Un seul thread de décodage par fichier : les processus se partagent déjà les cœurs
+        reader = GiftiReader(path)
+        intents = [header['intent'] for header in reader.headers]
+        if all(intent in intents for intent in mesh_store.MESH_INTENTS):
+            indices = [intents.index(intent) for intent in mesh_store.MESH_INTENTS]
+            vertices, faces = reader.darrays(indices, max_workers=1)
+            return 'mesh', {'vertices': vertices, 'faces': faces}
+        arrays = reader.darrays(range(len(reader)), max_workers=1)
+    if len(arrays) == 1:
+        texture = arrays[0].T if arrays[0].ndim == 2 else arrays[0]
+    else:
+        texture = np.stack(arrays)
+    return 'texture', {'texture': texture}
+
+
+def _load_subject(path):
+    shared = {}
+    try:
+        kind, arrays = read_subject(path)
+        topology = array_digest(arrays['faces']) if kind == 'mesh' else None
+        for name, array in arrays.items():
+            shared[name] = SharedArray.create(array)
+    except Exception as e:
+        # Blocs déjà créés pour ce sujet : personne d'autre ne les connaît
+        for array in shared.values():
+            array.unlink()
+        return path, None, str(e)
+    # Les blocs restent disponibles après leur fermeture dans le processus de lecture
+    for array in shared.values():
+        array.close()
+    return path, Subject(path, kind, shared, topology), None
+
+
+def _unlink_subjects(subjects):
+    # Un bloc de faces peut être partagé par plusieurs sujets
+    blocks = {shared.name: shared for subject in subjects for shared in subject.arrays.values()}
+    for shared in blocks.values():
+        try:
+            shared.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _drain(results):
+    """Sujets des lectures déjà commencées, après l'annulation des autres."""
+    subjects = []
+    try:
+        for _, subject, _ in results:
+            if subject is not None:
+                subjects.append(subject)
+    except Exception:
+        # Première lecture annulée : les suivantes le sont aussi
+        pass
+    return subjects
+
+
+class Cohort:
+    """
+    Sujets chargés par load_cohort, dans l'ordre des chemins.
+
+    La cohorte possède les blocs de mémoire partagée : close() (ou la sortie
+    d'un bloc with) les libère. Les objets Subject et SharedArray peuvent être
+    transmis à d'autres processus, qui y accèdent sans copie tant que la
+    cohorte n'est pas fermée. Les blocs sont aussi libérés quand la cohorte
+    est détruite, à la sortie du processus, ou par le resource tracker si le
+    processus est tué.
+    """
+
+    def __init__(self, subjects, errors):
+        self.subjects = subjects
+        self.errors = errors
+        self._finalizer = weakref.finalize(self, _unlink_subjects, list(subjects))
+
+    def __len__(self):
+        return len(self.subjects)
+
+    def __getitem__(self, index):
+        return self.subjects[index]
+
+    def __iter__(self):
+        return iter(self.subjects)
+
+    @property
+    def nbytes(self):
+        blocks = {shared.name: shared.nbytes for subject in self.subjects for shared in subject.arrays.values()}
+        return sum(blocks.values())
+
+    @property
+    def topologies(self):
+        """Nombre de topologies distinctes parmi les maillages de la cohorte."""
+        return len({subject.topology for subject in self.subjects if subject.topology is not None})
+
+    def close(self):
+        self._finalizer()
+        self.subjects = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_cohort(paths, max_workers=None):
+    """
+    Lit les maillages et textures d'une cohorte en parallèle, dans des processus.
+
+    Chaque processus décode ses fichiers et copie les tableaux dans des blocs
+    de mémoire partagée ; seuls leurs noms reviennent au processus appelant.
+    Les maillages de même topologie (même empreinte de faces) partagent un
+    seul bloc de faces : les doublons sont libérés dès leur réception.
+
+    :param paths: Liste de chemins, ou motif glob ('cohorte/*/lh.white.gii', '**' accepté).
+    :param max_workers: Nombre de processus (par défaut, le nombre de cœurs).
+    :return: Cohort ; les fichiers illisibles sont listés dans cohort.errors
+        (liste de (chemin, message d'erreur)).
+    """
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths, recursive=True))
+    paths = list(paths)
+    max_workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (4 * max_workers))
+    subjects, errors = [], []
+    topologies = {}  # empreinte -> bloc de faces partagé
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_load_subject, paths, chunksize=chunksize)
+        try:
+            for path, subject, error in results:
+                if error is not None:
+                    errors.append((path, error))
+                    continue
+                subjects.append(subject)
+                # Ce processus possède désormais les blocs : ils sont libérés s'il se termine sans close()
+                for shared in subject.arrays.values():
+                    shared.track()
+                if subject.topology is not None:
+                    faces = topologies.setdefault(subject.topology, subject.arrays['faces'])
+                    if faces is not subject.arrays['faces']:
+                        subject.arrays['faces'].unlink()
+                        subject.arrays['faces'] = faces
+        except BaseException:
+            # Chargement interrompu : les blocs reçus, ou encore en route, n'appartiendront à aucune cohorte
+            executor.shutdown(cancel_futures=True)
+            _unlink_subjects(subjects + _drain(results))
+            raise
+    return Cohort(subjects, errors)
@@ -0,0 +1,70 @@
+import threading
+
+import plotly.colors as pc
+from matplotlib.colors import to_rgba
+
+import fonctions as fct
+from metrics import METRICS
+
+
+def parse_color(color):
+    """
+    Convertit une couleur Plotly ('rgb(r, g, b)', 'rgba(...)', '#rrggbb' ou nom CSS) en RGBA dans [0, 1].
+    """
+    color = color.strip()
+    if color.startswith('rgb'):
+        values = [float(c) for c in color[color.index('(') + 1:-1].split(',')]
+        alpha = values[3] if len(values) > 3 else 1.0
+        return values[0] / 255, values[1] / 255, values[2] / 255, alpha
+    return to_rgba(color)
+
+
+class ColormapRegistry:
+    """
+    Registre des colormaps, construit une fois et partagé par tous les rendus.
+
+    Pour chaque (nom, traits noirs, nombre de traits, largeur des traits), il
+    conserve la colorscale Plotly. Les noms proposés et les colormaps
+    personnalisées du répertoire local sont lus une seule fois.
+    """
+
+    def __init__(self, local_directory=None):
+        self.local_directory = local_directory
+        self._local_colormaps = None
+        self._names = None
+        self._colorscales = {}
+        self._lock = threading.Lock()
+
+    def local_colormaps(self):
+        """Colormaps personnalisées du répertoire local ({nom: contenu du JSON})."""
+        if self._local_colormaps is None:
+            self._local_colormaps = {} if self.local_directory is None else \
+                fct.load_local_colormaps(self.local_directory)
+        return self._local_colormaps
+
+    def names(self):
+        """Noms des colormaps proposées (Plotly + personnalisées)."""
+        if self._names is None:
+            self._names = list(fct.get_colorscale_names(self.local_directory,
+                                                        local_colormaps=self.local_colormaps()))
+        return self._names
+
+    def colorscale(self, name, black_stripes=False, num_intervals=10, black_line_width=0.01):
+        """Colorscale Plotly d'une colormap (calculée une seule fois par jeu de paramètres)."""
+        key = (name, bool(black_stripes), num_intervals, black_line_width)
+        with self._lock:
+            if key in self._colorscales:
+                METRICS.inc('cache_lookups', cache='colorscales', result='hit')
+                return self._colorscales[key]
+        METRICS.inc('cache_lookups', cache='colorscales', result='miss')
+        with METRICS.timer('colorscale'):
+            local_colormaps = self.local_colormaps()
+            if name in local_colormaps:
+                colorscale = fct.convert_custom_colormap_to_plotly(local_colormaps[name]["data"])
+            elif black_stripes:
+                colorscale = fct.create_colormap_with_black_stripes(name, num_intervals, black_line_width)
+            else:
+                colorscale = pc.get_colorscale(name)
+        with self._lock:
+            self._colorscales[key] = colorscale
+        return colorscale
@@ -1,18 +1,41 @@
 import numpy as np
 import plotly.colors as pc
-import nibabel as nib
-import trimesh
 import plotly.graph_objects as go
 import json
 import os
+import base64
 from matplotlib.colors import to_rgba
+import lod
+import mesh_store
+from gifti_cache import GiftiCache
+from metrics import timed
+from topology import TopologyRegistry
 
-def get_colorscale_names(local_directory='./custom_colormap'):
+# Cache des fichiers GIFTI décodés (tableaux .npy relus en mémoire mappée), dans examples/tools
+# quel que soit le répertoire courant ; créé au premier fichier décodé
+GIFTI_CACHE = GiftiCache(os.environ.get('NEURO_MESH_GIFTI_CACHE_DIR',
+                                        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'gifti')))
+# Faces partagées entre maillages de même topologie (sujets rééchantillonnés sur un gabarit)
+TOPOLOGIES = TopologyRegistry()
+
+
+def open_gifti(path):
+    """
+    Ouvre un fichier GIFTI (via GIFTI_CACHE) ou un répertoire converti par mesh_store.
+
+    :return: Objet exposant meta, darray(index), shape(index) et get_arrays_from_intent(intent).
+    """
+    if mesh_store.is_store(path):
+        return mesh_store.open_store(path)
+    return GIFTI_CACHE.open(path)
+
+def get_colorscale_names(local_directory='./custom_colormap', local_colormaps=None):
     sequential_names = [name for name in pc.sequential.__dict__.keys() if '__' not in name and 'swatches' not in name and '_r' not in name]
     diverging_names = [name for name in pc.diverging.__dict__.keys() if '__' not in name and 'swatches' not in name and '_r' not in name]
     cyclical_names = [name for name in pc.cyclical.__dict__.keys() if '__' not in name and 'swatches' not in name and '_r' not in name]
     
-    local_colormaps = load_local_colormaps(local_directory)
+    if local_colormaps is None:
+        local_colormaps = load_local_colormaps(local_directory)
     local_names = list(local_colormaps.keys())
     print(f"Local colormaps détectées : {local_names}")  # Débogage
     predefined_colormaps = np.hstack([sequential_names[0:10], diverging_names[0:10], cyclical_names[0:10], local_names])    
@@ -42,7 +65,7 @@ def create_colormap_with_black_stripes(base_colormap, num_intervals=10, black_li
 
     for i in range(len(old_colormap) - 1):
         custom_colormap.append([base_intervals[i], old_colormap[i]])
-        if i % (len(old_colormap) // num_intervals) == 0:
+        if i % max(1, len(old_colormap) // num_intervals) == 0:
             black_start = base_intervals[i]
             black_end = min(black_start + black_line_width, 1)
             custom_colormap.append([black_start, 'rgb(0, 0, 0)'])
@@ -154,67 +177,481 @@ def convert_custom_colormap_to_plotly(colors):
 
 
 
+# Fonction pour lire les tableaux d'un maillage GIFTI, sans construire d'objet Trimesh
+@timed('load_mesh_arrays')
+def load_mesh_arrays(gifti_file):
+    """
+    Charge un fichier GIfTI et retourne ses sommets, ses faces et ses métadonnées.
+
+    Le fichier n'est décodé qu'une fois par contenu : les chargements suivants
+    relisent les tableaux depuis GIFTI_CACHE (mémoire mappée, lecture seule).
+    Un répertoire converti par mesh_store est lu directement, sans décodage.
+    Les faces sont partagées avec celles des maillages déjà chargés de même
+    topologie (voir TOPOLOGIES).
+
+    :param gifti_file: Chemin vers le fichier GIfTI (ou répertoire mesh_store).
+    :return: (coords, faces, metadata)
+    :raises ValueError: Si le fichier GIfTI ne contient pas les intentions requises.
+    """
+    # Charger le fichier GIfTI (décodé, ou relu depuis le cache)
+    g = open_gifti(gifti_file)
+
+    # Extraire les coordonnées des sommets (POINTSET)
+    pointset_array = g.get_arrays_from_intent('NIFTI_INTENT_POINTSET')
+    if not pointset_array:
+        raise ValueError("Le fichier GIfTI ne contient pas d'intention POINTSET.")
+    coords = pointset_array[0]
+
+    # Extraire les indices des triangles (TRIANGLE)
+    triangle_array = g.get_arrays_from_intent('NIFTI_INTENT_TRIANGLE')
+    if not triangle_array:
+        raise ValueError("Le fichier GIfTI ne contient pas d'intention TRIANGLE.")
+    faces = TOPOLOGIES.intern(triangle_array[0])
+
+    # Extraire les métadonnées
+    metadata = dict(g.meta)  # Copie, pour ne pas modifier le manifest en cache
+    metadata['filename'] = gifti_file
+    return coords, faces, metadata
+
+
 # Fonction pour charger un maillage GIFTI
-def load_mesh(gifti_file):
+@timed('load_mesh')
+def load_mesh(gifti_file, build_lod=False):
     """
     Charge un fichier GIfTI et retourne un objet Trimesh.
     
     :param gifti_file: Chemin vers le fichier GIfTI.
+    :param build_lod: Si True, construit la pyramide de niveaux de détail du maillage
+        (voir lod.MeshPyramid), accessible dans mesh.metadata['lod'].
     :return: Objet trimesh.Trimesh contenant les sommets, les faces et les métadonnées.
     :raises ValueError: Si le fichier GIfTI ne contient pas les intentions requises.
     """
+    # import différé : trimesh est long à importer et inutile au démarrage du serveur
+    import trimesh
+
     try:
-        # Charger le fichier GIfTI
-        g = nib.load(gifti_file)
-        
-        # Extraire les coordonnées des sommets (POINTSET)
-        pointset_code = nib.nifti1.intent_codes['NIFTI_INTENT_POINTSET']
-        pointset_array = g.get_arrays_from_intent(pointset_code)
-        if not pointset_array:
-            raise ValueError("Le fichier GIfTI ne contient pas d'intention POINTSET.")
-        coords = pointset_array[0].data
-
-        # Extraire les indices des triangles (TRIANGLE)
-        triangle_code = nib.nifti1.intent_codes['NIFTI_INTENT_TRIANGLE']
-        triangle_array = g.get_arrays_from_intent(triangle_code)
-        if not triangle_array:
-            raise ValueError("Le fichier GIfTI ne contient pas d'intention TRIANGLE.")
-        faces = triangle_array[0].data
-
-        # Extraire les métadonnées
-        metadata = dict(g.meta.metadata)  # Convertir en dictionnaire classique
-        metadata['filename'] = gifti_file
+        coords, faces, metadata = load_mesh_arrays(gifti_file)
+        # trimesh convertit les faces en int64 : c'est la version int64 qui est partagée
+        faces = TOPOLOGIES.intern(np.asarray(faces, dtype=np.int64))
 
         # Créer et retourner l'objet Trimesh
-        return trimesh.Trimesh(faces=faces, vertices=coords, metadata=metadata, process=False)
+        mesh = trimesh.Trimesh(faces=faces, vertices=coords, metadata=metadata, process=False)
+        if build_lod:
+            mesh.metadata['lod'] = lod.build_lod_pyramid(mesh)
+        return mesh
 
     except Exception as e:
         raise RuntimeError(f"Erreur lors du chargement du fichier GIfTI : {e}")
 
 
 # Fonction pour lire un fichier GIFTI (scalars.gii)
-def read_gii_file(file_path):
+# Les valeurs retournées sont en lecture seule (mémoire mappée depuis GIFTI_CACHE ou un répertoire mesh_store)
+# index : data array à lire (trame d'une texture multi-trames, voir playback.TextureFrames)
+@timed('read_gii_file')
+def read_gii_file(file_path, index=0):
     try:
-        gifti_img = nib.load(file_path)
-        scalars = gifti_img.darrays[0].data
+        gifti_img = open_gifti(file_path)
+        scalars = gifti_img.darray(index)
         return scalars
     except Exception as e:
         print(f"Erreur lors du chargement de la texture : {e}")
         return None
 
 
+def read_texture_stack(paths, n_vertices=None):
+    """
+    Lit plusieurs textures d'un même maillage dans un seul tableau float32 (T, N) contigu.
+
+    :param paths: Chemins des T textures (première trame de chacune).
+    :param n_vertices: Nombre de sommets attendu (celui du maillage), vérifié s'il est fourni.
+    :return: Tableau (T, N), une ligne par texture.
+    :raises ValueError: si une texture est illisible ou n'a pas le bon nombre de valeurs.
+    """
+    stack = None
+    for row, path in enumerate(paths):
+        values = read_gii_file(path)
+        if values is None:
+            raise ValueError(f"Texture illisible : {path}")
+        if stack is None:
+            n_vertices = len(values) if n_vertices is None else n_vertices
+            stack = np.empty((len(paths), n_vertices), dtype=np.float32)
+        if values.shape != (n_vertices,):
+            raise ValueError(f"{path} : tableau de forme {values.shape}, attendu ({n_vertices},)")
+        stack[row] = values
+    return stack
+
+
+# Réductions disponibles pour ramener une texture des sommets aux faces
+FACE_REDUCERS = {
+    'max': "Maximum",
+    'min': "Minimum",
+    'mean': "Moyenne",
+    'median': "Médiane",
+    'majority': "Label majoritaire",
+}
+
+
+def scalars_vertices_to_faces(scalars, faces, reducer='max'):
+    """
+    Convertit les scalars définis sur les sommets en scalars définis sur les faces.
+
+    Les trois sommets de chaque face sont lus colonne par colonne (pas de
+    tableau (M, 3) intermédiaire) et combinés élément par élément.
+
+    :param reducer: 'max', 'min', 'mean', 'median' ou 'majority' (label porté
+        par au moins deux sommets ; à défaut, le plus petit des trois, pour un
+        résultat indépendant de l'ordre des sommets).
+    """
+    if reducer not in FACE_REDUCERS:
+        raise ValueError(f"Réduction inconnue : {reducer} (choix : {', '.join(FACE_REDUCERS)})")
+    scalars = np.asarray(scalars)
+    faces = np.asarray(faces)
+    a, b, c = (scalars[faces[:, column]] for column in range(3))
+    if reducer == 'max':
+        return np.maximum(np.maximum(a, b, out=a), c, out=a)
+    if reducer == 'min':
+        return np.minimum(np.minimum(a, b, out=a), c, out=a)
+    if reducer == 'mean':
+        return (a + b + c) / 3
+    high = np.maximum(np.maximum(a, b), c)
+    low = np.minimum(np.minimum(a, b), c)
+    if reducer == 'median':
+        # Somme des trois moins les extrêmes (en float pour éviter les débordements d'entiers)
+        return a.astype(np.float64) + b + c - high - low
+    return np.where((a == b) | (a == c), a, np.where(b == c, b, low))
+
+
+def compute_colorscale(colormap='jet', use_black_intervals=False, local_colormaps=None, colormap_registry=None):
+    """
+    Retourne une colormap adaptée selon les paramètres.
+
+    Si un ColormapRegistry est fourni, la colorscale est lue dans le registre
+    (calculée une seule fois) et local_colormaps est ignoré.
+    """
+    if colormap_registry is not None:
+        return colormap_registry.colorscale(colormap, use_black_intervals)
+    if local_colormaps and colormap in local_colormaps:
+        return convert_custom_colormap_to_plotly(local_colormaps[colormap]["data"])
+    elif use_black_intervals:
+        return create_colormap_with_black_stripes(colormap)
+    else:
+        return pc.get_colorscale(colormap)
+
+
+def interval_colormap_data(colormap, local_colormaps=None, colormap_registry=None):
+    """Intervalles ({'min', 'max', 'color'}) d'une colormap personnalisée, ou None pour une colormap Plotly."""
+    if colormap_registry is not None:
+        local_colormaps = colormap_registry.local_colormaps()
+    if local_colormaps and colormap in local_colormaps:
+        return local_colormaps[colormap]["data"] or None
+    return None
+
+
+def interval_colormap_table(colors):
+    """
+    Table d'une colormap par intervalles (format du Colormap Builder).
+
+    :param colors: Liste de dicts contenant 'min', 'max', et 'color'.
+    :return: (starts, rgba) : début normalisé de chaque intervalle (K,) et couleurs (K, 4) uint8.
+    """
+    from colormap_registry import parse_color
+
+    total_range = colors[-1]["max"] - colors[0]["min"]
+    starts = np.array([(entry["min"] - colors[0]["min"]) / total_range for entry in colors])
+    rgba = np.round(np.array([parse_color(entry["color"]) for entry in colors]) * 255).astype(np.uint8)
+    return starts, rgba
+
+
+def apply_interval_colormap(values, colors, color_min, color_max, nan_color='lightgray'):
+    """
+    Couleurs RGBA (uint8) de chaque valeur pour une colormap par intervalles.
+
+    Les valeurs sont ramenées dans [0, 1] par (cmin, cmax), comme le fait Plotly
+    pour une colorscale, puis chaque valeur prend exactement la couleur de son
+    intervalle (recherche dichotomique vectorisée, sans interpolation).
+
+    :param values: Valeurs par sommet ou par face.
+    :param colors: Liste de dicts contenant 'min', 'max', et 'color'.
+    :param nan_color: Couleur des valeurs NaN.
+    :return: Tableau (N, 4) uint8.
+    """
+    starts, rgba = interval_colormap_table(colors)
+    values = np.asarray(values)
+    span = color_max - color_min
+    positions = (values - color_min) / span if span else np.zeros(values.shape)
+    index = np.clip(np.searchsorted(starts, positions, side='right') - 1, 0, len(starts) - 1)
+    result = rgba[index]
+    result[np.isnan(values)] = np.round(np.array(to_rgba(nan_color)) * 255).astype(np.uint8)
+    return result
+
+
+def compute_color_range(scalars, color_min=None, color_max=None, center_colormap_on_zero=False):
+    """Retourne les bornes (cmin, cmax) de l'échelle des couleurs."""
+    color_min = color_min if color_min is not None else np.min(scalars)
+    color_max = color_max if color_max is not None else np.max(scalars)
+
+    if center_colormap_on_zero:
+        max_abs_value = max(abs(color_min), abs(color_max))
+        color_min, color_max = -max_abs_value, max_abs_value
+    return color_min, color_max
+
+
+def encode_typed_array(array, dtype):
+    """
+    Encode un tableau numpy au format "typed array" de Plotly.
+
+    Le navigateur reçoit les octets bruts en base64 ({'dtype', 'bdata'}) au lieu
+    d'une liste JSON de nombres, et les décode directement en TypedArray.
+
+    :param array: Tableau numpy (1D ou 2D).
+    :param dtype: Type numpy cible (ex. np.float32, np.uint32).
+    :return: dict {'dtype': ..., 'bdata': ...} (+ 'shape' pour un tableau 2D).
+    """
+    array = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder('<'))
+    encoded = {'dtype': array.dtype.str[1:], 'bdata': base64.b64encode(array).decode('ascii')}
+    if array.ndim > 1:
+        encoded['shape'] = ','.join(str(n) for n in array.shape)
+    return encoded
+
+
+def intensity_properties(values, intensitymode='vertex', binary_encoding=False):
+    """
+    Propriétés du Mesh3d qui dépendent des valeurs de la texture.
+
+    Ce sont les seules propriétés volumineuses (proportionnelles au nombre de
+    sommets ou de faces) en dehors de la géométrie.
+
+    :param values: Valeurs par sommet ('vertex') ou par face ('cell').
+    :param binary_encoding: Si True, l'intensité est envoyée en float32 binaire
+        et le texte de survol est produit par un hovertemplate côté navigateur.
+    """
+    if binary_encoding:
+        return dict(
+            intensity=encode_typed_array(values, np.float32),
+            intensitymode=intensitymode,
+            hovertemplate='Scalar value: %{intensity:.2f}<extra></extra>',
+        )
+    return dict(
+        intensity=values,
+        intensitymode=intensitymode,
+        hovertext=[f'Scalar value: {s:.2f}' for s in values],
+        hoverinfo='text',
+    )
+
+
+def plotly_color_array(colors, binary_encoding=False):
+    """
+    Couleurs RGBA (N, 4) uint8 au format d'un vertexcolor / facecolor de Plotly.
+
+    plotly.js lit des canaux tous <= 1 comme des flottants dans [0, 1] (et un
+    alpha de 1 comme opaque) : une couleur presque noire comme (1, 0, 1) serait
+    affichée en magenta. Si une couleur est dans ce cas, toutes sont envoyées
+    en chaînes rgba() ; sinon, en uint8 (binaire si binary_encoding).
+    """
+    ambiguous = (colors[:, :3].max(axis=1) == 1) | (colors[:, 3] == 1)
+    if not ambiguous.any():
+        return encode_typed_array(colors, np.uint8) if binary_encoding else colors
+    palette, index = np.unique(colors, axis=0, return_inverse=True)
+    names = np.array([f"rgba({r},{g},{b},{a / 255:.4g})" for r, g, b, a in palette.tolist()])
+    return names[index.reshape(-1)].tolist()
+
+
+def vertex_color_properties(values, colors, intensitymode='vertex', binary_encoding=False):
+    """
+    Propriétés du Mesh3d pour des couleurs calculées sur le serveur.
+
+    Les couleurs remplacent l'intensité (vertexcolor ou facecolor) ; les
+    valeurs restent disponibles pour le survol.
+
+    :param values: Valeurs par sommet ('vertex') ou par face ('cell').
+    :param colors: Tableau (N, 4) uint8 des couleurs correspondantes.
+    """
+    color_key = 'facecolor' if intensitymode == 'cell' else 'vertexcolor'
+    if binary_encoding:
+        return {
+            color_key: plotly_color_array(colors, binary_encoding),
+            'customdata': encode_typed_array(values, np.float32),
+            'hovertemplate': 'Scalar value: %{customdata:.2f}<extra></extra>',
+        }
+    return {
+        color_key: plotly_color_array(colors),
+        'hovertext': [f'Scalar value: {s:.2f}' for s in values],
+        'hoverinfo': 'text',
+    }
+
+
+def geometry_properties(vertices, binary_encoding=False):
+    """
+    Coordonnées des sommets du Mesh3d (x, y, z).
+
+    Renvoyées seules quand un maillage de même topologie remplace le maillage
+    affiché : les faces (i, j, k) déjà présentes côté client sont conservées.
+    """
+    if binary_encoding:
+        vertices = np.asarray(vertices, dtype=np.float32)
+        return {axis: encode_typed_array(vertices[:, column], np.float32) for column, axis in enumerate('xyz')}
+    return dict(x=vertices[:, 0], y=vertices[:, 1], z=vertices[:, 2])
+
+
+# Transport de l'intensité vers le navigateur : float32 exact, ou quantifié (décodé par assets/viewer.js)
+INTENSITY_TRANSPORTS = {
+    'float32': 'Exacte (float32)',
+    'uint16': 'Quantifiée 16 bits',
+    'uint8': 'Quantifiée 8 bits',
+}
+QUANTIZED_BITS = {'uint16': 16, 'uint8': 8}
+
+
+def quantized_intensity_properties(values, color_min, color_max, intensitymode='vertex', bits=16):
+    """
+    Propriétés du Mesh3d pour une intensité quantifiée sur 8 ou 16 bits.
+
+    Les valeurs sont codées par rapport à la plage de couleurs affichée
+    (color_min, color_max) : 256 ou 65536 niveaux suffisent à la colormap, pour
+    2 à 4 fois moins d'octets qu'en float32. Les codes voyagent dans
+    meta['quantized_intensity'] et sont reconvertis en intensité par le
+    navigateur (viewer.decodeIntensity) ; les valeurs exactes restent sur le serveur.
+
+    :param values: Valeurs par sommet ('vertex') ou par face ('cell').
+    :param bits: 8 ou 16.
+    """
+    codes, quantization = mesh_store.quantize(np.asarray(values, dtype=np.float32), bits, color_min, color_max)
+    payload = encode_typed_array(codes, codes.dtype)
+    payload.update(offset=quantization['offset'], scale=quantization['scale'], nan_code=quantization['nan_code'])
+    return dict(
+        meta={'quantized_intensity': payload},
+        intensitymode=intensitymode,
+        hovertemplate='Scalar value: %{intensity:.2f}<extra></extra>',
+    )
+
+
+def quantize_figure_intensity(fig, values, color_min, color_max, bits=16):
+    """
+    Remplace l'intensité d'une figure de plot_mesh_with_colorbar par sa version quantifiée.
+
+    La figure obtenue n'est affichable que par le viewer Dash, dont
+    assets/viewer.js décode l'intensité (voir quantized_intensity_properties) ;
+    ailleurs, la texture n'apparaîtrait pas.
+
+    :param values: Valeurs affichées par la figure (par sommet, ou par face en mode 'cell').
+    :return: La figure, modifiée en place.
+    """
+    mesh = fig.data[0]
+    mesh.update(intensity=None, hovertext=None, hoverinfo=None,
+                **quantized_intensity_properties(values, color_min, color_max, mesh.intensitymode, bits))
+    return fig
+
 
+def compute_intensity_properties(scalars, faces, apply_to_faces=False, binary_encoding=False, face_reducer='max'):
+    """Propriétés d'intensité pour des scalars par sommet, éventuellement ramenés aux faces."""
+    if apply_to_faces:
+        return intensity_properties(scalars_vertices_to_faces(scalars, faces, face_reducer), 'cell',
+                                    binary_encoding)
+    return intensity_properties(scalars, 'vertex', binary_encoding)
 
+
+def compute_style_properties(color_min, color_max, colormap='jet', use_black_intervals=False,
+                             local_colormaps=None, show_contours=False, colormap_registry=None):
+    """
+    Propriétés légères du Mesh3d (bornes, colormap, contours).
+
+    Leur taille ne dépend pas du maillage : elles peuvent être renvoyées au
+    navigateur à chaque interaction sans coût notable.
+    """
+    return dict(
+        cmin=color_min,
+        cmax=color_max,
+        colorscale=compute_colorscale(colormap, use_black_intervals, local_colormaps, colormap_registry),
+        contour=dict(show=bool(show_contours), color='black', width=2),
+    )
+
+
+# Position des traces dans les figures de maillage texturé : maillage, isolignes, barre de couleur
+ISOLINE_TRACE = 1
+COLORBAR_TRACE = 2
+
+
+def patch_mesh_figure(properties, colorbar_properties=None, isoline_properties=None):
+    """
+    Construit une mise à jour partielle (dash.Patch) du maillage affiché.
+
+    Seules les propriétés fournies sont envoyées au navigateur ; les sommets et
+    les faces déjà présents côté client ne sont pas retransmis.
+
+    :param properties: dict {nom de propriété du Mesh3d: nouvelle valeur}.
+    :param colorbar_properties: dict {nom: valeur} à appliquer au marker de la trace
+        portant la barre de couleur (couleurs calculées sur le serveur).
+    :param isoline_properties: dict {nom: valeur} à appliquer à la trace des isolignes.
+    :return: dash.Patch à renvoyer comme sortie 'figure' d'un dcc.Graph.
+    """
+    from dash import Patch
+
+    patch = Patch()
+    for key, value in properties.items():
+        patch['data'][0][key] = value
+    for key, value in (colorbar_properties or {}).items():
+        patch['data'][COLORBAR_TRACE]['marker'][key] = value
+    for key, value in (isoline_properties or {}).items():
+        patch['data'][ISOLINE_TRACE][key] = value
+    return patch
+
+
+# Barre de couleur des figures de maillage
+COLORBAR = dict(
+    title="Scalars",
+    tickformat=".2f",
+    thickness=30,
+    len=0.9
+)
+
+
+def colorbar_trace(color_min, color_max, colorscale):
+    """Trace invisible qui porte la barre de couleur quand le Mesh3d est coloré par vertexcolor/facecolor."""
+    return go.Scatter3d(
+        x=[None], y=[None], z=[None],
+        mode='markers',
+        hoverinfo='skip',
+        showlegend=False,
+        marker=dict(size=0, color=[color_min], cmin=color_min, cmax=color_max, colorscale=colorscale,
+                    showscale=True, colorbar=COLORBAR),
+    )
+
+
+def isoline_properties(lines, binary_encoding=False):
+    """Coordonnées de la trace des isolignes (x, y, z séparés par NaN ; None : aucune isoligne)."""
+    if lines is None:
+        lines = (np.empty(0, dtype=np.float32),) * 3
+    if binary_encoding:
+        return {axis: encode_typed_array(values, np.float32) for axis, values in zip('xyz', lines)}
+    return {axis: np.asarray(values, dtype=np.float64) for axis, values in zip('xyz', lines)}
+
+
+def isoline_trace(lines, binary_encoding=False):
+    """Trace Scatter3d des isolignes de la texture (une seule trace pour tous les niveaux)."""
+    return go.Scatter3d(
+        mode='lines',
+        line=dict(color='black', width=3),
+        connectgaps=False,
+        hoverinfo='skip',
+        showlegend=False,
+        **isoline_properties(lines, binary_encoding),
+    )
+
+
+@timed('plot_mesh_with_colorbar')
 def plot_mesh_with_colorbar(vertices, faces, scalars=None, color_min=None, color_max=None, camera=None,
                             show_contours=False, colormap='jet', use_black_intervals=False,
-                            center_colormap_on_zero=False, local_colormaps=None, apply_to_faces=False):
+                            center_colormap_on_zero=False, local_colormaps=None, apply_to_faces=False,
+                            binary_encoding=False, colormap_registry=None, use_vertex_colors=False,
+                            face_reducer='max', isolines=None, scalars_on_faces=False):
     """
     Générer un graphique 3D de maillage avec une barre de couleur et options avancées.
 
     Args:
         vertices (np.ndarray): Tableau (N, 3) des coordonnées des sommets.
         faces (np.ndarray): Tableau (M, 3) des indices des sommets formant les triangles.
-        scalars (np.ndarray, optional): Tableau (N,) ou (M,) des valeurs scalaires à mapper.
+        scalars (np.ndarray, optional): Tableau (N,) des valeurs scalaires à mapper, ou (M,) avec
+            scalars_on_faces.
         color_min (float, optional): Valeur minimale pour l'échelle des couleurs.
         color_max (float, optional): Valeur maximale pour l'échelle des couleurs.
         camera (dict, optional): Paramètres de la caméra 3D.
@@ -224,29 +661,32 @@ def plot_mesh_with_colorbar(vertices, faces, scalars=None, color_min=None, color
         center_colormap_on_zero (bool, optional): Centrer la colormap autour de zéro.
         local_colormaps (dict, optional): Colormaps personnalisées au format Plotly.
         apply_to_faces (bool, optional): Si True, les scalars sont convertis pour être appliqués aux faces.
+        face_reducer (str, optional): Réduction des valeurs des trois sommets d'une face
+            (voir FACE_REDUCERS).
+        scalars_on_faces (bool, optional): Si True, les scalars sont déjà des valeurs par face (M,),
+            utilisées telles quelles (implique apply_to_faces).
+        isolines (tuple, optional): Coordonnées (x, y, z), séparées par NaN, des isolignes
+            de la texture (voir isolines.IsolineExtractor).
+        binary_encoding (bool, optional): Si True, les sommets (float32), les faces (uint32) et
+            l'intensité (float32) sont transmis en tableaux binaires, et le survol utilise un
+            hovertemplate au lieu d'un texte par sommet.
+        colormap_registry (ColormapRegistry, optional): Registre où lire les colorscales
+            déjà calculées (remplace local_colormaps).
+        use_vertex_colors (bool, optional): Si True et que la colormap est une colormap personnalisée
+            par intervalles, les couleurs sont calculées sur le serveur (vertexcolor/facecolor uint8)
+            au lieu d'être interpolées par le navigateur.
 
     Returns:
         go.Figure: Figure Plotly contenant le maillage 3D.
     """
-
-    def scalars_vertices_to_faces(scalars, faces):
-        """Convertit les scalars définis sur les sommets en scalars définis sur les faces."""
-        return np.max(scalars[faces], axis=1)
-
-    def compute_colorscale():
-        """Retourne une colormap adaptée selon les paramètres."""
-        if local_colormaps and colormap in local_colormaps:
-            return convert_custom_colormap_to_plotly(local_colormaps[colormap]["data"])
-        elif use_black_intervals:
-            return create_colormap_with_black_stripes(colormap)
-        else:
-            return pc.get_colorscale(colormap)
+    if binary_encoding:
+        vertices = np.asarray(vertices, dtype=np.float32)
+        faces = np.asarray(faces, dtype=np.uint32)
 
     fig_data = dict(
         x=vertices[:, 0], y=vertices[:, 1], z=vertices[:, 2],
         i=faces[:, 0], j=faces[:, 1], k=faces[:, 2],
         flatshading=False,
-        hoverinfo='text',
         lighting=dict(
             ambient=0.3,
             diffuse=0.7,
@@ -257,47 +697,53 @@ def plot_mesh_with_colorbar(vertices, faces, scalars=None, color_min=None, color
         lightposition=dict(x=100, y=200, z=300)
     )
 
+    extra_traces = []
     if scalars is not None:
+        # Toujours présente (éventuellement vide) pour que sa position dans la figure soit fixe
+        extra_traces.append(isoline_trace(isolines, binary_encoding))
+
         # Convertir les scalars pour les faces si demandé
-        if apply_to_faces:
-            scalars = scalars_vertices_to_faces(scalars, faces)
+        if scalars_on_faces:
+            if len(scalars) != len(faces):
+                raise ValueError(f"{len(scalars)} valeurs par face pour {len(faces)} faces")
+            apply_to_faces = True
+        elif apply_to_faces:
+            scalars = scalars_vertices_to_faces(scalars, faces, face_reducer)
 
         # Gestion des plages de couleurs
-        color_min = color_min if color_min is not None else np.min(scalars)
-        color_max = color_max if color_max is not None else np.max(scalars)
-
-        if center_colormap_on_zero:
-            max_abs_value = max(abs(color_min), abs(color_max))
-            color_min, color_max = -max_abs_value, max_abs_value
+        color_min, color_max = compute_color_range(scalars, color_min, color_max, center_colormap_on_zero)
 
         # Appliquer la colormap
-        colorscale = compute_colorscale()
-
-        fig_data.update(
-            intensity=scalars,
-            intensitymode='cell' if apply_to_faces else 'vertex',
-            cmin=color_min,
-            cmax=color_max,
-            colorscale=colorscale,
-            showscale=True,
-            colorbar=dict(
-                title="Scalars",
-                tickformat=".2f",
-                thickness=30,
-                len=0.9
-            ),
-            hovertext=[f'Scalar value: {s:.2f}' for s in scalars]
-        )
+        intensitymode = 'cell' if apply_to_faces else 'vertex'
+        interval_colors = None
+        if use_vertex_colors:
+            interval_colors = interval_colormap_data(colormap, local_colormaps, colormap_registry)
+        if interval_colors is not None:
+            colors = apply_interval_colormap(scalars, interval_colors, color_min, color_max)
+            fig_data.update(vertex_color_properties(scalars, colors, intensitymode, binary_encoding))
+            if show_contours:
+                fig_data.update(contour=dict(show=True, color='black', width=2))
+            extra_traces.append(colorbar_trace(
+                color_min, color_max,
+                compute_colorscale(colormap, use_black_intervals, local_colormaps, colormap_registry)))
+        else:
+            fig_data.update(intensity_properties(scalars, intensitymode, binary_encoding))
+            fig_data.update(
+                compute_style_properties(color_min, color_max, colormap, use_black_intervals, local_colormaps,
+                                         show_contours, colormap_registry),
+                showscale=True,
+                colorbar=COLORBAR,
+            )
     else:
         fig_data.update(
             color='lightgray',
-            opacity=1
+            opacity=1,
+            hoverinfo='skip',
         )
+        if show_contours:
+            fig_data.update(contour=dict(show=True, color='black', width=2))
 
-    fig = go.Figure(data=[go.Mesh3d(**fig_data)])
-
-    if show_contours:
-        fig.data[0].update(contour=dict(show=True, color='black', width=2))
+    fig = go.Figure(data=[go.Mesh3d(**fig_data)] + extra_traces)
 
     fig.update_layout(scene=dict(
         xaxis=dict(visible=False),
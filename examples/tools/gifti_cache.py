@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import nibabel as nib
+import numpy as np
+
+from gifti_reader import GiftiReader
+from metrics import METRICS
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Empreinte (blake2b) du contenu d'un fichier, lu par blocs."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class CachedGifti:
+    """
+    Contenu d'un fichier GIFTI, décodé à la demande et relu depuis le cache.
+
+    Chaque data array est décodé à sa première demande (voir GiftiReader),
+    écrit en .npy puis ouvert en mémoire mappée (lecture seule). Les data
+    arrays externes (ExternalFileBinary) sont mappés directement depuis leur
+    fichier.
+
+    Le fichier source peut avoir été remplacé depuis l'ouverture : son
+    contenu est revérifié (empreinte) avant le premier décodage, et sa taille
+    et sa date de modification avant chaque écriture dans le cache.
+    """
+
+    def __init__(self, directory, manifest, source=None):
+        self.directory = directory
+        self.source = source
+        self.digest = os.path.basename(directory)
+        self._source_stat = None
+        self.meta = manifest['meta']
+        self.intents = [entry['intent'] for entry in manifest['darrays']]
+        self._entries = manifest['darrays']
+        self._darrays = {}
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def shape(self, index):
+        """Forme du data array d'indice index, sans le décoder."""
+        if 'shape' in self._entries[index]:
+            return tuple(self._entries[index]['shape'])
+        return self.darray(index).shape
+
+    def _stat_source(self):
+        stat = os.stat(self.source)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _check_source(self):
+        if self._stat_source() != self._source_stat:
+            raise ValueError(f"{self.source} a été modifié depuis son ouverture")
+
+    def _get_reader(self):
+        with self._lock:
+            if self._reader is None:
+                source_stat = self._stat_source()
+                if file_digest(self.source) != self.digest:
+                    raise ValueError(f"{self.source} a été modifié depuis son ouverture")
+                self._source_stat = source_stat
+                self._reader = GiftiReader(self.source)
+            return self._reader
+
+    def _decode(self, index):
+        entry = self._entries[index]
+        if entry.get('external'):
+            return self._get_reader().darray(index)
+        path = os.path.join(self.directory, entry['file'])
+        if os.path.exists(path):
+            METRICS.inc('cache_lookups', cache='gifti_darray', result='hit')
+        else:
+            METRICS.inc('cache_lookups', cache='gifti_darray', result='miss')
+            with METRICS.timer('gifti_decode'):
+                data = self._get_reader().darray(index)
+                # Le cache est adressé par le contenu : rien n'est écrit si le fichier a changé pendant la lecture
+                self._check_source()
+                # Écriture atomique : un autre worker ne lit jamais de fichier partiel
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp_path, 'wb') as file:
+                    np.save(file, np.ascontiguousarray(data))
+                os.replace(tmp_path, path)
+        return np.load(path, mmap_mode='r')
+
+    def darray(self, index):
+        """Retourne le data array d'indice index (mémoire mappée, lecture seule)."""
+        with self._lock:
+            data = self._darrays.get(index)
+        if data is None:
+            data = self._decode(index)
+            with self._lock:
+                self._darrays[index] = data
+        return data
+
+    def darrays(self, indices):
+        """Retourne plusieurs data arrays ; ceux qui ne sont pas encore décodés le sont en parallèle."""
+        indices = list(indices)
+        with self._lock:
+            missing = [index for index in indices if index not in self._darrays]
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(missing), os.cpu_count() or 1)) as executor:
+                list(executor.map(self.darray, missing))
+        return [self.darray(index) for index in indices]
+
+    def get_arrays_from_intent(self, intent):
+        """Équivalent de GiftiImage.get_arrays_from_intent, mais retourne directement les tableaux."""
+        code = nib.nifti1.intent_codes[intent]
+        return self.darrays(index for index, darray_intent in enumerate(self.intents) if darray_intent == code)
+
+
+class GiftiCache:
+    """
+    Cache des fichiers GIFTI décodés, adressé par le contenu du fichier.
+
+    Au premier chargement d'un fichier, seule sa structure est lue (voir
+    GiftiReader) et résumée dans un manifest JSON (métadonnées, intentions,
+    formes) dans `cache_dir/<empreinte>/`. Chaque data array y est écrit en .npy
+    à sa première demande. Les chargements suivants du même contenu, quel que
+    soit le chemin, ne font que mapper ces fichiers.
+    """
+
+    def __init__(self, cache_dir):
+        # Le répertoire n'est créé qu'à l'écriture du premier manifest (voir _write_manifest)
+        self.cache_dir = cache_dir
+        # (chemin, taille, date de modification) -> empreinte, pour ne pas relire un fichier inchangé
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path):
+        """Empreinte du contenu d'un fichier (recalculée seulement s'il a changé)."""
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._digests:
+                return self._digests[key]
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[key] = digest
+        return digest
+
+    def open(self, path):
+        """
+        Retourne le contenu d'un fichier GIFTI ; seul l'en-tête est lu s'il n'est pas en cache.
+
+        :param path: Chemin vers le fichier GIFTI.
+        :return: CachedGifti.
+        """
+        directory = os.path.join(self.cache_dir, self.digest(path))
+        manifest_path = os.path.join(directory, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            METRICS.inc('cache_lookups', cache='gifti', result='miss')
+            with METRICS.timer('gifti_header'):
+                self._write_manifest(path, directory)
+        else:
+            METRICS.inc('cache_lookups', cache='gifti', result='hit')
+        with open(manifest_path, 'r') as file:
+            return CachedGifti(directory, json.load(file), source=path)
+
+    def _write_manifest(self, path, directory):
+        reader = GiftiReader(path)
+        # Écriture dans un répertoire temporaire puis renommage : jamais d'entrée partielle
+        tmp_directory = f"{directory}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_directory)  # Crée aussi cache_dir
+        darrays = [{
+            'file': f"darray_{index}.npy",
+            'intent': int(nib.nifti1.intent_codes.code.get(header['intent'], 0)),
+            'shape': list(header['shape']),
+            'external': header['encoding'] == 'ExternalFileBinary',
+        } for index, header in enumerate(reader.headers)]
+        reader.close()
+        manifest = {'meta': reader.meta, 'darrays': darrays}
+        with open(os.path.join(tmp_directory, 'manifest.json'), 'w') as file:
+            json.dump(manifest, file)
+        try:
+            os.rename(tmp_directory, directory)
+        except OSError:
+            # Un autre processus a décodé le même fichier entre-temps
+            shutil.rmtree(tmp_directory, ignore_errors=True)
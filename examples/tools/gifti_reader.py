@@ -0,0 +1,193 @@
+import base64
+import collections
+import io
+import mmap
+import os
+import re
+import xml.etree.ElementTree as ET
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Balise ouvrante (ou vide) d'un élément <Data> : seule position repérée dans les octets,
+# pour ne pas donner les données encodées à l'analyseur XML
+DATA_TAG = re.compile(rb'<Data(\s[^>]*?)?(/?)>')
+
+# Types NIFTI des data arrays
+DATA_TYPES = {
+    'NIFTI_TYPE_UINT8': np.uint8,
+    'NIFTI_TYPE_INT8': np.int8,
+    'NIFTI_TYPE_UINT16': np.uint16,
+    'NIFTI_TYPE_INT16': np.int16,
+    'NIFTI_TYPE_UINT32': np.uint32,
+    'NIFTI_TYPE_INT32': np.int32,
+    'NIFTI_TYPE_UINT64': np.uint64,
+    'NIFTI_TYPE_INT64': np.int64,
+    'NIFTI_TYPE_FLOAT32': np.float32,
+    'NIFTI_TYPE_FLOAT64': np.float64,
+}
+
+
+def data_array_header(attributes):
+    """
+    Description d'un data array à partir des attributs de son élément <DataArray>.
+
+    :param attributes: dict des attributs (chaînes).
+    :return: dict {'intent', 'dtype', 'shape', 'encoding', 'order', 'byteorder',
+        'external_file', 'external_offset'}.
+    """
+    ndim = int(attributes.get('Dimensionality', 1))
+    return {
+        'intent': attributes.get('Intent', 'NIFTI_INTENT_NONE'),
+        'dtype': attributes.get('DataType', 'NIFTI_TYPE_FLOAT32'),
+        'shape': tuple(int(attributes.get(f'Dim{axis}', 0)) for axis in range(ndim)),
+        'encoding': attributes.get('Encoding', 'ASCII'),
+        'order': 'F' if attributes.get('ArrayIndexingOrder') == 'ColumnMajorOrder' else 'C',
+        'byteorder': '>' if attributes.get('Endian') == 'BigEndian' else '<',
+        'external_file': attributes.get('ExternalFileName') or None,
+        'external_offset': int(attributes.get('ExternalFileOffset') or 0),
+    }
+
+
+def metadata_pairs(element):
+    """Paires nom / valeur d'un élément <MetaData>."""
+    return {md.findtext('Name', '').strip(): md.findtext('Value', '').strip() for md in element.iter('MD')}
+
+
+def scan_gifti(data, name='', first_only=False):
+    """
+    Structure d'un fichier GIFTI : métadonnées et en-têtes des data arrays, sans leurs données.
+
+    Le XML est analysé par ET.XMLPullParser, à l'exception du contenu des
+    éléments <Data> : leur position (octets) est repérée dans data et ils
+    sont donnés vides à l'analyseur.
+
+    :param data: Contenu du fichier (bytes ou mmap).
+    :param name: Nom du fichier, pour les messages d'erreur.
+    :param first_only: Ne lire que l'en-tête du premier data array (data peut
+        alors n'être que le début du fichier).
+    :return: (meta, headers) ; chaque en-tête (voir data_array_header) contient
+        aussi 'meta', et 'data_start' / 'data_end' (position des données encodées).
+    :raises ValueError: si data n'est pas un fichier GIFTI.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    meta, headers = {}, []
+    payloads = collections.deque()
+    stack = []
+
+    def read_events():
+        """Traite les éléments analysés ; vrai quand first_only est satisfait."""
+        nonlocal meta
+        for event, element in parser.read_events():
+            if event == 'start':
+                if not stack and element.tag != 'GIFTI':
+                    raise ValueError(f"{name} n'est pas un fichier GIFTI")
+                if element.tag == 'DataArray':
+                    headers.append(dict(data_array_header(element.attrib), meta={}))
+                    if first_only:
+                        return True
+                elif element.tag == 'Data':
+                    data_start, data_end = payloads.popleft()
+                    if stack[-1] == 'DataArray':
+                        headers[-1].update(data_start=data_start, data_end=data_end)
+                stack.append(element.tag)
+                continue
+            stack.pop()
+            if element.tag == 'MetaData' and stack[-1] == 'GIFTI':
+                meta = metadata_pairs(element)
+            elif element.tag == 'MetaData' and stack[-1] == 'DataArray':
+                headers[-1]['meta'] = metadata_pairs(element)
+            elif element.tag == 'DataArray':
+                if 'data_start' not in headers[-1]:
+                    raise ValueError(f"{name} : data array {len(headers) - 1} incomplet")
+                element.clear()
+        return False
+
+    position = 0
+    try:
+        # Recherche reprise après chaque </Data> : les données encodées ne sont pas parcourues
+        match = DATA_TAG.search(data, position)
+        while match is not None:
+            parser.feed(data[position:match.start()])
+            if read_events():
+                return meta, headers
+            end = match.end() if match.group(2) else data.find(b'</Data>', match.end())
+            if end < 0:
+                raise ValueError(f"{name} : data array {len(headers)} incomplet")
+            payloads.append((match.end(), end))
+            parser.feed(data[match.start():match.end()])
+            position = end
+            if read_events():
+                return meta, headers
+            match = DATA_TAG.search(data, position)
+        parser.feed(data[position:])
+        if read_events():
+            return meta, headers
+        parser.close()
+        read_events()
+    except ET.ParseError as e:
+        raise ValueError(f"{name} n'est pas un fichier GIFTI ({e})") from None
+    return meta, headers
+
+
+class GiftiReader:
+    """
+    Lecture paresseuse d'un fichier GIFTI.
+
+    L'ouverture ne lit que la structure du fichier (mappé en mémoire) : les
+    attributs et métadonnées de chaque data array, et la position de ses
+    données encodées, sans les décoder. Un data array n'est décodé que
+    lorsqu'il est demandé ; les données externes (ExternalFileBinary) sont
+    mappées en mémoire sans copie.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.meta, self.headers = scan_gifti(self._map, os.path.basename(self.path))
+
+    def __len__(self):
+        return len(self.headers)
+
+    def darray(self, index):
+        """
+        Décode (ou mappe, s'il est externe) le data array d'indice index.
+
+        :return: Tableau numpy de forme et de type déclarés dans l'en-tête.
+        """
+        header = self.headers[index]
+        dtype = np.dtype(DATA_TYPES[header['dtype']]).newbyteorder(header['byteorder'])
+        shape, order = header['shape'], header['order']
+        encoding = header['encoding']
+        if encoding == 'ExternalFileBinary':
+            external = os.path.join(os.path.dirname(os.path.abspath(self.path)), header['external_file'])
+            return np.memmap(external, dtype=dtype, mode='r', offset=header['external_offset'],
+                             shape=shape, order=order)
+        encoded = self._map[header['data_start']:header['data_end']]
+        if encoding == 'ASCII':
+            # Comme nibabel : un texte en lignes et colonnes garde sa disposition, quel que soit l'ordre
+            values = np.loadtxt(io.BytesIO(encoded), dtype=dtype, ndmin=1)
+        else:
+            raw = base64.b64decode(encoded)
+            if encoding == 'GZipBase64Binary':
+                raw = zlib.decompress(raw)
+            values = np.frombuffer(raw, dtype=dtype)
+        return values.reshape(shape, order=order)
+
+    def darrays(self, indices, max_workers=None):
+        """
+        Décode plusieurs data arrays en parallèle (un thread par data array).
+
+        La décompression (zlib) libère le GIL : les data arrays d'un même
+        fichier (sommets et faces, trames...) sont décodés simultanément.
+        """
+        indices = list(indices)
+        if len(indices) <= 1:
+            return [self.darray(index) for index in indices]
+        with ThreadPoolExecutor(max_workers=max_workers or min(len(indices), os.cpu_count() or 1)) as executor:
+            return list(executor.map(self.darray, indices))
+
+    def close(self):
+        self._map.close()
@@ -0,0 +1,110 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from gifti_reader import scan_gifti
+
+
+def peek_gifti_header(path, max_bytes=1 << 20):
+    """
+    Attributs du premier data array d'un fichier GIFTI, lus sans décoder ses données.
+
+    Permet de vérifier un fichier (format, nombre de valeurs) avant de le
+    décoder en entier.
+
+    :param path: Chemin vers le fichier GIFTI.
+    :param max_bytes: Nombre d'octets lus au maximum au début du fichier.
+    :return: dict {'intent', 'shape', 'encoding', ...} (voir gifti_reader.data_array_header).
+    :raises ValueError: si le fichier n'est pas un fichier GIFTI.
+    """
+    with open(path, 'rb') as file:
+        head = file.read(max_bytes)
+    name = os.path.basename(path)
+    _, headers = scan_gifti(head, name, first_only=True)
+    if not headers:
+        raise ValueError(f"{name} n'est pas un fichier GIFTI")
+    return headers[0]
+
+
+class IngestionQueue:
+    """
+    File des traitements de fichiers importés (décodage, validation, pré-calculs).
+
+    Les tâches sont exécutées dans des threads : le worker Dash qui reçoit
+    l'import répond immédiatement et reste disponible pour les autres
+    interactions. L'état de chaque tâche (en attente, en cours, terminée, en
+    erreur), sa progression et son résultat sont écrits dans `directory/<id>.json`,
+    lisible par tous les workers.
+
+    La fonction d'une tâche reçoit en premier argument report(progression, message),
+    à appeler au fil du traitement (progression entre 0 et 1) ; elle retourne un
+    résultat sérialisable en JSON.
+    """
+
+    def __init__(self, directory, max_workers=2, max_age=24 * 3600):
+        self.directory = directory
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingestion')
+
+    def _job_path(self, job_id):
+        if not isinstance(job_id, str) or not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            raise ValueError(f"Identifiant de tâche invalide : {job_id!r}")
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _update(self, job_id, **fields):
+        path = self._job_path(job_id)
+        with self._lock:
+            job = self.status(job_id) or {'id': job_id, 'created': time.time()}
+            job.update(fields, updated=time.time())
+            # Écriture atomique : un autre worker ne lit jamais d'état partiel
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(job, file)
+            os.replace(tmp_path, path)
+
+    def submit(self, function, *args, message='', owner=None):
+        """
+        Ajoute une tâche à la file et retourne son identifiant.
+
+        :param owner: Identifiant de la session qui a soumis la tâche, enregistré avec son état.
+        """
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        self._update(job_id, status='queued', progress=0.0, message=message, result=None, owner=owner)
+        self._executor.submit(self._run, job_id, function, args)
+        return job_id
+
+    def _run(self, job_id, function, args):
+        def report(progress, message):
+            self._update(job_id, status='running', progress=float(progress), message=message)
+
+        try:
+            result = function(report, *args)
+        except Exception as e:
+            self._update(job_id, status='error', message=str(e))
+        else:
+            self._update(job_id, status='done', progress=1.0, result=result)
+
+    def status(self, job_id):
+        """État d'une tâche (dict), ou None si elle est inconnue."""
+        try:
+            with open(self._job_path(job_id), 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def cleanup(self):
+        """Supprime les états des tâches plus anciennes que max_age."""
+        limit = time.time() - self.max_age
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json') and entry.stat().st_mtime < limit:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
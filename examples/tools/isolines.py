@@ -0,0 +1,117 @@
+import threading
+
+import numpy as np
+
+import fonctions as fct
+
+
+# Marching triangles : isolignes d'un champ scalaire défini sur les sommets
+def isoline_segments(vertices, faces, scalars, level, face_min=None, face_max=None):
+    """
+    Segments de l'isoligne scalars == level.
+
+    Une face est traversée quand ses sommets ne sont pas tous du même côté du
+    niveau (valeur >= level ou < level) ; ses deux arêtes traversées donnent
+    les extrémités du segment, par interpolation linéaire. Les faces ayant un
+    sommet NaN sont ignorées.
+
+    :param vertices: Tableau (N, 3) des coordonnées des sommets.
+    :param faces: Tableau (M, 3) des indices des sommets.
+    :param scalars: Tableau (N,) des valeurs par sommet.
+    :param face_min: Minimum des valeurs de chaque face (M,), s'il est déjà calculé.
+    :param face_max: Maximum des valeurs de chaque face (M,), s'il est déjà calculé.
+    :return: Tableau (K, 2, 3) float32 des extrémités des K segments.
+    """
+    if face_min is None or face_max is None:
+        face_min = fct.scalars_vertices_to_faces(scalars, faces, 'min')
+        face_max = fct.scalars_vertices_to_faces(scalars, faces, 'max')
+    # Comparaisons fausses pour NaN : les faces concernées ne sont jamais retenues
+    crossed = faces[(face_min < level) & (face_max >= level)]
+    if not len(crossed):
+        return np.empty((0, 2, 3), dtype=np.float32)
+
+    start = crossed
+    end = np.roll(crossed, -1, axis=1)  # Arêtes (0, 1), (1, 2), (2, 0)
+    start_values, end_values = scalars[start], scalars[end]
+    # Chaque face traversée a exactement deux arêtes traversées
+    edge_crossed = (start_values >= level) != (end_values >= level)
+    start, end = start[edge_crossed], end[edge_crossed]
+    start_values, end_values = start_values[edge_crossed], end_values[edge_crossed]
+
+    t = ((level - start_values) / (end_values - start_values))[:, None]
+    points = vertices[start] + t * (vertices[end] - vertices[start])
+    return points.astype(np.float32).reshape(-1, 2, 3)
+
+
+def segments_to_lines(segments):
+    """
+    Coordonnées x, y, z d'une trace Scatter3d dessinant des segments.
+
+    Les segments sont séparés par un point NaN, pour que toutes les isolignes
+    tiennent dans une seule trace.
+
+    :param segments: Tableau (K, 2, 3) des extrémités des segments.
+    :return: (x, y, z), tableaux float32 de longueur 3K.
+    """
+    lines = np.full((len(segments), 3, 3), np.nan, dtype=np.float32)
+    lines[:, :2] = segments
+    lines = lines.reshape(-1, 3)
+    return lines[:, 0], lines[:, 1], lines[:, 2]
+
+
+def parse_levels(text):
+    """
+    Niveaux saisis par l'utilisateur ('-1, 0, 0.5' ou '-1 0 0.5').
+
+    :return: Liste triée et sans doublon des niveaux valides.
+    """
+    levels = set()
+    for token in (text or '').replace(';', ',').replace(',', ' ').split():
+        try:
+            level = float(token)
+        except ValueError:
+            continue
+        if np.isfinite(level):
+            levels.add(level)
+    return sorted(levels)
+
+
+class IsolineExtractor:
+    """
+    Isolignes d'une texture sur un maillage, mises en cache niveau par niveau.
+
+    Le minimum et le maximum de chaque face sont calculés une fois : pour un
+    nouveau niveau, seules les faces traversées sont lues. Changer l'ensemble
+    des niveaux ne calcule que les niveaux encore jamais demandés.
+    """
+
+    def __init__(self, vertices, faces, scalars, max_levels=64):
+        self.vertices = np.asarray(vertices, dtype=np.float32)
+        self.faces = np.asarray(faces)
+        self.scalars = np.asarray(scalars, dtype=np.float32)
+        self.max_levels = max_levels
+        self.face_min = fct.scalars_vertices_to_faces(self.scalars, self.faces, 'min')
+        self.face_max = fct.scalars_vertices_to_faces(self.scalars, self.faces, 'max')
+        self._segments = {}  # niveau -> segments (K, 2, 3)
+        self._lock = threading.Lock()
+
+    def segments(self, level):
+        """Segments (K, 2, 3) de l'isoligne au niveau level."""
+        level = float(level)
+        with self._lock:
+            segments = self._segments.get(level)
+        if segments is None:
+            segments = isoline_segments(self.vertices, self.faces, self.scalars, level,
+                                        self.face_min, self.face_max)
+            with self._lock:
+                if len(self._segments) >= self.max_levels:
+                    self._segments.pop(next(iter(self._segments)))
+                self._segments[level] = segments
+        return segments
+
+    def lines(self, levels):
+        """Coordonnées (x, y, z) séparées par NaN de toutes les isolignes de levels."""
+        segments = [self.segments(level) for level in levels]
+        if not segments:
+            return segments_to_lines(np.empty((0, 2, 3), dtype=np.float32))
+        return segments_to_lines(np.concatenate(segments))
@@ -0,0 +1,155 @@
+import numpy as np
+
+
+# Décimation par regroupement de sommets (vertex clustering)
+def cluster_vertices(vertices, cell_size):
+    """
+    Regroupe les sommets par cellule d'une grille régulière.
+
+    :param vertices: Tableau (N, 3) des coordonnées des sommets.
+    :param cell_size: Taille d'une cellule de la grille.
+    :return: (vertex_map, n_clusters) où vertex_map[i] est l'indice du groupe du sommet i.
+    """
+    cells = np.floor((vertices - vertices.min(axis=0)) / cell_size).astype(np.int64)
+    dims = cells.max(axis=0) + 1
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    _, vertex_map = np.unique(keys, return_inverse=True)
+    vertex_map = vertex_map.reshape(-1)
+    return vertex_map, int(vertex_map.max()) + 1
+
+
+def decimate_mesh(vertices, faces, target_vertices, n_iter=4):
+    """
+    Décime un maillage jusqu'à environ target_vertices sommets.
+
+    Chaque sommet du maillage décimé est le barycentre d'un groupe de sommets
+    d'origine ; les faces dégénérées ou dupliquées sont supprimées.
+
+    :param vertices: Tableau (N, 3) des coordonnées des sommets.
+    :param faces: Tableau (M, 3) des indices des sommets.
+    :param target_vertices: Nombre de sommets visé.
+    :param n_iter: Nombre d'ajustements de la taille de cellule.
+    :return: (vertices, faces, vertex_map) du maillage décimé.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    extent = np.ptp(vertices, axis=0)
+    # Estimation initiale : surface ~ extent², un sommet par cellule
+    area = extent[0] * extent[1] + extent[1] * extent[2] + extent[0] * extent[2]
+    cell_size = np.sqrt(2 * area / target_vertices)
+    for _ in range(n_iter):
+        vertex_map, n_clusters = cluster_vertices(vertices, cell_size)
+        if abs(n_clusters - target_vertices) < 0.1 * target_vertices:
+            break
+        cell_size *= np.sqrt(n_clusters / target_vertices)
+
+    counts = np.bincount(vertex_map, minlength=n_clusters).astype(np.float64)
+    new_vertices = np.column_stack([
+        np.bincount(vertex_map, weights=vertices[:, axis], minlength=n_clusters) / counts
+        for axis in range(3)
+    ])
+
+    new_faces = vertex_map[faces]
+    valid = ((new_faces[:, 0] != new_faces[:, 1]) & (new_faces[:, 1] != new_faces[:, 2])
+             & (new_faces[:, 0] != new_faces[:, 2]))
+    new_faces = new_faces[valid]
+    _, unique_index = np.unique(np.sort(new_faces, axis=1), axis=0, return_index=True)
+    new_faces = new_faces[np.sort(unique_index)]
+    return new_vertices, new_faces, vertex_map
+
+
+def majority_labels(labels, vertex_map, n_clusters):
+    """
+    Étiquette la plus fréquente de chaque groupe de sommets (la plus petite en cas d'égalité).
+
+    :param labels: Tableau (N,) des étiquettes des sommets d'origine.
+    :param vertex_map: Tableau (N,) des groupes des sommets (chaque groupe est non vide).
+    :param n_clusters: Nombre de groupes.
+    :return: Tableau (n_clusters,) du type de labels.
+    """
+    values, label_index = np.unique(labels, return_inverse=True)
+    pairs = vertex_map.astype(np.int64) * len(values) + label_index.reshape(-1)
+    pairs, counts = np.unique(pairs, return_counts=True)
+    clusters = pairs // len(values)
+    # Par groupe, du plus fréquent au moins fréquent ; lexsort est stable, donc à égalité la plus petite étiquette
+    order = np.lexsort((-counts, clusters))
+    pairs, clusters = pairs[order], clusters[order]
+    first = np.r_[True, clusters[1:] != clusters[:-1]]
+    result = np.empty(n_clusters, dtype=labels.dtype)
+    result[clusters[first]] = values[pairs[first] % len(values)]
+    return result
+
+
+class MeshPyramid:
+    """
+    Pyramide de niveaux de détail d'un maillage.
+
+    Le niveau 0 est le maillage d'origine ; chaque niveau suivant contient
+    environ `factor` fois moins de sommets. vertex_maps[k] associe chaque
+    sommet d'origine à un sommet du niveau k, ce qui permet de projeter
+    n'importe quelle texture sur tous les niveaux.
+    """
+
+    def __init__(self, vertices, faces, min_vertices=5000, factor=4):
+        self.vertices = [np.asarray(vertices)]
+        self.faces = [np.asarray(faces)]
+        self.vertex_maps = [np.arange(len(vertices))]
+        while len(self.vertices[-1]) // factor >= min_vertices:
+            level_vertices, level_faces, vertex_map = decimate_mesh(
+                self.vertices[-1], self.faces[-1], len(self.vertices[-1]) // factor)
+            self.vertices.append(level_vertices)
+            self.faces.append(level_faces)
+            self.vertex_maps.append(vertex_map[self.vertex_maps[-1]])
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def n_vertices(self, level):
+        return len(self.vertices[level])
+
+    def level_for_budget(self, vertex_budget):
+        """Niveau le plus fin dont le nombre de sommets respecte le budget."""
+        for level in range(len(self)):
+            if self.n_vertices(level) <= vertex_budget:
+                return level
+        return len(self) - 1
+
+    def map_texture(self, scalars, level, labels=None):
+        """
+        Projette une texture définie sur le maillage d'origine sur un niveau.
+
+        La valeur d'un sommet décimé est la moyenne des valeurs des sommets
+        d'origine qu'il regroupe (les NaN sont ignorés). Pour une texture
+        d'étiquettes, c'est l'étiquette la plus fréquente du groupe : une
+        moyenne créerait des étiquettes qui n'existent pas.
+
+        :param labels: Texture d'étiquettes ; par défaut, si ses valeurs sont entières.
+        """
+        if level == 0:
+            return scalars
+        vertex_map = self.vertex_maps[level]
+        n_vertices = self.n_vertices(level)
+        if labels is None:
+            labels = np.issubdtype(scalars.dtype, np.integer)
+        if labels:
+            return majority_labels(scalars, vertex_map, n_vertices)
+        valid = ~np.isnan(scalars)
+        sums = np.bincount(vertex_map[valid], weights=scalars[valid], minlength=n_vertices)
+        counts = np.bincount(vertex_map[valid], minlength=n_vertices)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (sums / counts).astype(np.result_type(scalars.dtype, np.float32))
+
+    def map_texture_to_levels(self, scalars, labels=None):
+        """Projette une texture sur chaque niveau de la pyramide."""
+        return [self.map_texture(scalars, level, labels) for level in range(len(self))]
+
+
+def build_lod_pyramid(mesh, min_vertices=5000, factor=4):
+    """
+    Construit la pyramide de niveaux de détail d'un objet trimesh.
+
+    :param mesh: Objet trimesh.Trimesh.
+    :param min_vertices: Nombre de sommets en dessous duquel on arrête la décimation.
+    :param factor: Facteur de réduction du nombre de sommets entre deux niveaux.
+    :return: MeshPyramid.
+    """
+    return MeshPyramid(mesh.vertices, mesh.faces, min_vertices=min_vertices, factor=factor)
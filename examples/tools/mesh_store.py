@@ -0,0 +1,303 @@
+"""
+Stockage des maillages et textures en tableaux binaires, prêts à être servis.
+
+Un fichier GIFTI converti devient un répertoire contenant des fichiers .npy
+et un petit manifest JSON :
+- maillage : vertices.npy (float32, ou float16 en option) et faces.npy ;
+- texture : trames regroupées par blocs de chunk_frames trames
+  (frames_0000.npy de forme (k, N), ...), en float32 ou quantifiées sur
+  8 / 16 bits (uint8 / uint16, avec offset et échelle dans le manifest) ;
+  une texture d'étiquettes garde son type entier et n'est jamais quantifiée.
+
+Le répertoire s'ouvre avec open_store, qui se comporte comme un fichier
+GIFTI du cache (voir gifti_cache.CachedGifti) : chaque data array (sommets,
+faces ou trame) est une vue en mémoire mappée, sans copie ni décodage, sauf
+pour les valeurs quantifiées, converties en float32 à la lecture.
+
+Conversion d'une cohorte (tous les .gii d'un répertoire) :
+    python mesh_store.py cohorte/ store/ [--float16] [--quantize 8] [--workers 4]
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import nibabel as nib
+import numpy as np
+
+from gifti_reader import DATA_TYPES, GiftiReader
+
+STORE_FORMAT = 'neuro-mesh-store'
+STORE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+QUANTIZED_TYPES = {8: np.uint8, 16: np.uint16}
+MESH_INTENTS = ('NIFTI_INTENT_POINTSET', 'NIFTI_INTENT_TRIANGLE')
+
+
+def is_store(path):
+    """Vrai si path est un répertoire créé par export_mesh ou export_texture."""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST_NAME))
+
+
+def _intent_code(intent):
+    return int(nib.nifti1.intent_codes.code[intent])
+
+
+def is_label_header(header):
+    """Vrai pour un data array d'étiquettes : intention NIFTI_INTENT_LABEL ou type entier."""
+    return header['intent'] == 'NIFTI_INTENT_LABEL' or np.issubdtype(DATA_TYPES[header['dtype']], np.integer)
+
+
+def _write_store(directory, manifest, arrays):
+    """Écrit les tableaux et le manifest dans un répertoire temporaire, puis le renomme."""
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_directory = f"{directory}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp_directory)
+    try:
+        for filename, array in arrays.items():
+            np.save(os.path.join(tmp_directory, filename), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_directory, MANIFEST_NAME), 'w') as file:
+            json.dump(dict(manifest, format=STORE_FORMAT, version=STORE_VERSION), file)
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.rename(tmp_directory, directory)
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+    return directory
+
+
+def export_mesh(gifti_path, directory, float16=False):
+    """
+    Convertit un maillage GIFTI en répertoire de tableaux.
+
+    :param float16: Stocke les coordonnées en float16 (moitié moins de place,
+        précision relative d'environ 1e-3).
+    :return: Le répertoire créé.
+    """
+    reader = GiftiReader(gifti_path)
+    intents = [header['intent'] for header in reader.headers]
+    missing = [intent for intent in MESH_INTENTS if intent not in intents]
+    if missing:
+        raise ValueError(f"{gifti_path} : pas d'intention {', '.join(missing)}")
+    vertices, faces = reader.darrays([intents.index(intent) for intent in MESH_INTENTS])
+    vertices = vertices.astype(np.float16 if float16 else np.float32)
+    faces = faces.astype(np.uint32 if faces.max() > np.iinfo(np.int32).max else np.int32)
+    reader.close()
+    manifest = {
+        'kind': 'mesh',
+        'source': os.path.basename(gifti_path),
+        'meta': reader.meta,
+        'darrays': [
+            {'file': 'vertices.npy', 'intent': _intent_code('NIFTI_INTENT_POINTSET'), 'shape': list(vertices.shape)},
+            {'file': 'faces.npy', 'intent': _intent_code('NIFTI_INTENT_TRIANGLE'), 'shape': list(faces.shape)},
+        ],
+    }
+    return _write_store(directory, manifest, {'vertices.npy': vertices, 'faces.npy': faces})
+
+
+def quantize(values, bits, value_min=None, value_max=None):
+    """
+    Quantifie des valeurs sur bits bits (8 ou 16) entre value_min et value_max.
+
+    Le code le plus élevé est réservé aux valeurs NaN ; les valeurs hors de
+    [value_min, value_max] reçoivent le code de la borne la plus proche.
+
+    :param value_min: Borne inférieure (par défaut, le minimum des valeurs).
+    :param value_max: Borne supérieure (par défaut, le maximum des valeurs).
+    :return: (codes entiers, dict {'bits', 'offset', 'scale', 'nan_code'}).
+    """
+    dtype = QUANTIZED_TYPES[bits]
+    nan_code = np.iinfo(dtype).max
+    finite = values[np.isfinite(values)]
+    if value_min is None:
+        value_min = finite.min() if finite.size else 0.
+    if value_max is None:
+        value_max = finite.max() if finite.size else 0.
+    offset = float(value_min)
+    span = float(value_max) - offset
+    scale = span / (nan_code - 1) if span > 0 else 1.
+    codes = np.rint((values - offset) / scale)
+    codes = np.where(np.isfinite(values), np.clip(codes, 0, nan_code - 1), nan_code).astype(dtype)
+    return codes, {'bits': bits, 'offset': offset, 'scale': scale, 'nan_code': int(nan_code)}
+
+
+def dequantize(codes, quantization):
+    """Valeurs float32 de codes quantifiés (NaN pour le code réservé)."""
+    values = quantization['offset'] + codes.astype(np.float32) * np.float32(quantization['scale'])
+    values[codes == quantization['nan_code']] = np.nan
+    return values
+
+
+def export_texture(gifti_path, directory, quantize_bits=None, chunk_frames=16):
+    """
+    Convertit une texture GIFTI (une ou plusieurs trames) en répertoire de tableaux.
+
+    Les trames sont les data arrays du fichier, ou les colonnes d'un unique
+    data array 2D (N sommets, T trames) ; elles sont écrites par blocs de
+    chunk_frames trames contiguës. Le manifest garde l'intention et le type
+    d'origine de chaque trame.
+
+    :param quantize_bits: None (float32), 8 ou 16 : quantification des valeurs,
+        avec un offset et une échelle communs à toutes les trames. Ignoré pour
+        une texture d'étiquettes (voir is_label_header), gardée dans son type entier.
+    :return: Le répertoire créé.
+    """
+    reader = GiftiReader(gifti_path)
+    columns = len(reader) == 1 and len(reader.headers[0]['shape']) == 2
+    headers = reader.headers * reader.headers[0]['shape'][1] if columns else reader.headers
+    labels = any(is_label_header(header) for header in headers)
+    if columns:
+        frames = np.asarray(reader.darray(0)).T
+    else:
+        frames = np.stack(reader.darrays(range(len(reader))))
+    reader.close()
+    if not (labels and np.issubdtype(frames.dtype, np.integer)):
+        frames = frames.astype(np.float32)
+    quantization = None
+    if quantize_bits and not labels:
+        frames, quantization = quantize(frames, quantize_bits)
+
+    arrays, darrays = {}, []
+    for start in range(0, len(frames), chunk_frames):
+        filename = f"frames_{start // chunk_frames:04d}.npy"
+        arrays[filename] = frames[start:start + chunk_frames]
+        darrays.extend({'file': filename, 'row': row, 'shape': [frames.shape[1]],
+                        'intent': _intent_code(headers[start + row]['intent']),
+                        'dtype': headers[start + row]['dtype']}
+                       for row in range(len(arrays[filename])))
+    manifest = {
+        'kind': 'texture',
+        'source': os.path.basename(gifti_path),
+        'meta': reader.meta,
+        'quantization': quantization,
+        'darrays': darrays,
+    }
+    return _write_store(directory, manifest, arrays)
+
+
+class StoredGifti:
+    """
+    Répertoire créé par export_mesh / export_texture, avec l'interface de gifti_cache.CachedGifti.
+
+    Les fichiers .npy sont ouverts en mémoire mappée à la première demande ;
+    une trame est une ligne d'un bloc, donc une vue contiguë sans copie.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_NAME), 'r') as file:
+            manifest = json.load(file)
+        if manifest.get('format') != STORE_FORMAT or manifest.get('version', 0) > STORE_VERSION:
+            raise ValueError(f"{directory} : format de stockage non reconnu")
+        self.kind = manifest['kind']
+        self.meta = manifest['meta']
+        self.quantization = manifest.get('quantization')
+        self.intents = [entry['intent'] for entry in manifest['darrays']]
+        self._entries = manifest['darrays']
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def shape(self, index):
+        """Forme du data array d'indice index."""
+        return tuple(self._entries[index]['shape'])
+
+    def _file(self, filename):
+        with self._lock:
+            if filename not in self._files:
+                self._files[filename] = np.load(os.path.join(self.directory, filename), mmap_mode='r')
+            return self._files[filename]
+
+    def darray(self, index):
+        """Data array d'indice index (mémoire mappée, lecture seule ; float32 si quantifié)."""
+        entry = self._entries[index]
+        data = self._file(entry['file'])
+        if entry.get('row') is not None:
+            data = data[entry['row']]
+        if self.quantization is not None:
+            return dequantize(data, self.quantization)
+        return data
+
+    def darrays(self, indices):
+        return [self.darray(index) for index in indices]
+
+    def get_arrays_from_intent(self, intent):
+        """Équivalent de GiftiImage.get_arrays_from_intent, mais retourne directement les tableaux."""
+        code = _intent_code(intent)
+        return self.darrays(index for index, darray_intent in enumerate(self.intents) if darray_intent == code)
+
+
+def open_store(directory):
+    """Ouvre un répertoire créé par export_mesh ou export_texture."""
+    return StoredGifti(directory)
+
+
+def export_gifti(gifti_path, directory, float16=False, quantize_bits=None, chunk_frames=16):
+    """Convertit un fichier GIFTI, maillage ou texture selon ses intentions."""
+    intents = [header['intent'] for header in GiftiReader(gifti_path).headers]
+    if all(intent in intents for intent in MESH_INTENTS):
+        return export_mesh(gifti_path, directory, float16)
+    return export_texture(gifti_path, directory, quantize_bits, chunk_frames)
+
+
+def _export_job(job):
+    source, directory, options = job
+    try:
+        export_gifti(source, directory, **options)
+        return source, None
+    except Exception as e:
+        return source, str(e)
+
+
+def export_cohort(input_directory, output_directory, float16=False, quantize_bits=None, chunk_frames=16,
+                  workers=None, overwrite=False):
+    """
+    Convertit tous les fichiers .gii d'un répertoire (et de ses sous-répertoires).
+
+    Chaque fichier `a/b.gii` devient le répertoire `output_directory/a/b.store`.
+    Les fichiers sont convertis en parallèle, un par processus ; les
+    conversions déjà faites sont conservées, sauf si overwrite.
+
+    :return: Liste des (fichier, message d'erreur) des conversions en échec.
+    """
+    options = dict(float16=float16, quantize_bits=quantize_bits, chunk_frames=chunk_frames)
+    jobs = []
+    for root, _, filenames in os.walk(input_directory):
+        for filename in sorted(filenames):
+            if not filename.endswith('.gii'):
+                continue
+            source = os.path.join(root, filename)
+            relative = os.path.relpath(source, input_directory)
+            directory = os.path.join(output_directory, relative[:-len('.gii')] + '.store')
+            if overwrite or not is_store(directory):
+                jobs.append((source, directory, options))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_export_job, jobs))
+    print(f"{len(jobs) - sum(error is not None for _, error in results)} / {len(jobs)} fichiers convertis")
+    return [(source, error) for source, error in results if error is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input_directory', help="répertoire de la cohorte (fichiers .gii)")
+    parser.add_argument('output_directory', help="répertoire des fichiers convertis")
+    parser.add_argument('--float16', action='store_true', help="coordonnées des sommets en float16")
+    parser.add_argument('--quantize', type=int, choices=sorted(QUANTIZED_TYPES), help="textures quantifiées")
+    parser.add_argument('--chunk-frames', type=int, default=16, help="trames par bloc")
+    parser.add_argument('--workers', type=int, default=None, help="nombre de processus")
+    parser.add_argument('--overwrite', action='store_true', help="reconvertir les fichiers déjà convertis")
+    args = parser.parse_args()
+    errors = export_cohort(args.input_directory, args.output_directory, args.float16, args.quantize,
+                           args.chunk_frames, args.workers, args.overwrite)
+    for source, error in errors:
+        print(f"Erreur : {source} : {error}")
+
+
+if __name__ == '__main__':
+    main()
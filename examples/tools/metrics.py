@@ -0,0 +1,176 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Instrumentation activée par NEURO_MESH_METRICS=1 ; journal JSON optionnel (une ligne par mesure)
+METRICS_ENABLED = os.environ.get('NEURO_MESH_METRICS', '') not in ('', '0')
+METRICS_LOG = os.environ.get('NEURO_MESH_METRICS_LOG')
+METRIC_PREFIX = 'neuro_mesh'
+
+_NULL_TIMER = nullcontext()
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in key) + '}'
+
+
+class Metrics:
+    """
+    Compteurs et durées des étapes du serveur.
+
+    - timer(nom, **labels) mesure la durée d'un bloc (somme, nombre, maximum) ;
+    - inc(nom, valeur, **labels) incrémente un compteur (succès de cache, octets envoyés...) ;
+    - register_collector(fonction) ajoute des valeurs lues au moment de l'export
+      (ex. statistiques du RenderScheduler).
+
+    Désactivé, timer() retourne un contexte vide partagé et inc() ne fait rien :
+    le coût est celui d'un appel de méthode. Les fonctions décorées avec
+    timed() à l'import ne sont pas du tout enveloppées.
+    """
+
+    def __init__(self, enabled=False, log_path=None):
+        self.enabled = enabled
+        self._timers = {}  # (nom, labels) -> [somme, nombre, maximum]
+        self._counters = {}  # (nom, labels) -> valeur
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._log = open(log_path, 'a', buffering=1) if enabled and log_path else None
+
+    def _write_log(self, record):
+        record['time'] = time.time()
+        line = json.dumps(record)
+        with self._lock:
+            self._log.write(line + '\n')
+
+    def observe(self, name, seconds, **labels):
+        """Enregistre une durée (en secondes) pour l'étape name."""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            entry = self._timers.setdefault(key, [0.0, 0, 0.0])
+            entry[0] += seconds
+            entry[1] += 1
+            entry[2] = max(entry[2], seconds)
+        if self._log is not None:
+            self._write_log({'stage': name, 'labels': labels, 'seconds': seconds})
+
+    @contextmanager
+    def _timer(self, name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timer(self, name, **labels):
+        """Contexte qui mesure la durée de son bloc."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(name, labels)
+
+    def inc(self, name, value=1, **labels):
+        """Incrémente le compteur name."""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if self._log is not None:
+            self._write_log({'counter': name, 'labels': labels, 'value': value})
+
+    def register_collector(self, collector):
+        """Ajoute une fonction retournant une liste de (nom, {labels}, valeur), lue à chaque export."""
+        self._collectors.append(collector)
+
+    def render_prometheus(self):
+        """Toutes les mesures au format texte de Prometheus."""
+        with self._lock:
+            timers = dict(self._timers)
+            counters = dict(self._counters)
+        lines = []
+        for name in sorted({name for name, _ in timers}):
+            metric = f"{METRIC_PREFIX}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            entries = [(key, entry) for (entry_name, key), entry in sorted(timers.items()) if entry_name == name]
+            for key, (total, count, _) in entries:
+                lines.append(f"{metric}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{metric}_count{_format_labels(key)} {count}")
+            # Le maximum ne fait pas partie d'un summary : famille de gauges distincte
+            lines.append(f"# TYPE {metric}_max gauge")
+            for key, (_, _, maximum) in entries:
+                lines.append(f"{metric}_max{_format_labels(key)} {maximum:.6f}")
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (entry_name, key), value in sorted(counters.items()):
+                if entry_name == name:
+                    lines.append(f"{metric}{_format_labels(key)} {value}")
+        gauges = {}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                gauges.setdefault(name, []).append((_label_key(labels), value))
+        for name, values in sorted(gauges.items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            for key, value in values:
+                lines.append(f"{metric}{_format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics(METRICS_ENABLED, METRICS_LOG)
+
+
+def timed(name, **labels):
+    """
+    Décorateur : mesure chaque appel de la fonction sous le nom d'étape name.
+
+    Si l'instrumentation est désactivée, la fonction est retournée telle quelle.
+    """
+    def decorator(function):
+        if not METRICS.enabled:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with METRICS.timer(name, **labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def register_metrics_route(server, path='/metrics'):
+    """
+    Ajoute au serveur Flask la route path (format Prometheus, réservée aux requêtes locales)
+    et mesure la durée et la taille des réponses des callbacks Dash (sérialisation JSON comprise).
+    """
+    from flask import Response, abort, g, request
+
+    @server.route(path)
+    def metrics_endpoint():
+        if request.remote_addr not in ('127.0.0.1', '::1', None):
+            abort(403)
+        return Response(METRICS.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    if not METRICS.enabled:
+        return
+
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_request(response):
+        if request.path.endswith('/_dash-update-component'):
+            METRICS.observe('dash_request', time.perf_counter() - g.metrics_start)
+            METRICS.inc('response_bytes', response.calculate_content_length() or 0)
+        return response
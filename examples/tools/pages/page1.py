@@ -2,119 +2,170 @@ from dash import html, dcc
 import dash_uploader as du
 import fonctions as fct
 import numpy as np
-
-# Chemins par défaut
-DEFAULT_MESH_PATH = './data/mesh.gii'
-colorscale_names = fct.get_colorscale_names('./custom_colormap')
-
-# Charger les données par défaut
-mesh = fct.load_mesh(DEFAULT_MESH_PATH)
-vertices = mesh.vertices
-faces = mesh.faces
+import resources
 
 # Définir les plages par défaut
 default_min, default_max = 0, 1
-default_marks = {i: f"{i:.2f}" for i in np.linspace(default_min, default_max, 5)}
+default_marks = {float(i): f"{i:.2f}" for i in np.linspace(default_min, default_max, 5)}
+
+
+# Layout pour la page 1 (construit à l'affichage, les colormaps sont chargées une seule fois)
+def layout():
+    colorscale_names = resources.get_colorscale_names()
+    texture_names = resources.get_preloaded_texture_names()
+    return html.Div(
+        style={
+            "display": "flex",
+            "flexDirection": "column",
+            "alignItems": "center",
+            "backgroundColor": "#ffffff",
+            "padding": "20px",
+            "height": "calc(100vh - 60px)",
+            "boxSizing": "border-box",
+        },
+        children=[
+            # Contenu principal
+            html.Div(
+                style={
+                    "display": "flex",
+                    "flexGrow": 1,
+                    "width": "100%",
+                    "gap": "20px",
+                },
+                children=[
+                    # Panneau gauche : Options
+                    html.Div(
+                        style={
+                            "flex": "1",
+                            "backgroundColor": "#f9f9f9",
+                            "padding": "20px",
+                            "borderRadius": "8px",
+                            "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
+                            "display": "flex",
+                            "flexDirection": "column",
+                            "gap": "20px",
+                        },
+                        children=[
+                            html.Label("Importer un nouveau maillage :", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            du.Upload(id='upload-mesh', text="Importer un maillage", default_style={"padding": "10px"}),
+
+                            html.Label("Importer une texture :", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            du.Upload(id='upload-texture', text="Importer une texture", default_style={"padding": "10px"}),
 
-# Layout pour la page 1
-layout = html.Div(
-    style={
-        "display": "flex",
-        "flexDirection": "column",
-        "alignItems": "center",
-        "backgroundColor": "#ffffff",
-        "padding": "20px",
-        "height": "calc(100vh - 60px)",
-        "boxSizing": "border-box",
-    },
-    children=[
-        # Contenu principal
-        html.Div(
-            style={
-                "display": "flex",
-                "flexGrow": 1,
-                "width": "100%",
-                "gap": "20px",
-            },
-            children=[
-                # Panneau gauche : Options
-                html.Div(
-                    style={
-                        "flex": "1",
-                        "backgroundColor": "#f9f9f9",
-                        "padding": "20px",
-                        "borderRadius": "8px",
-                        "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
-                        "display": "flex",
-                        "flexDirection": "column",
-                        "gap": "20px",
-                    },
-                    children=[
-                        html.Label("Importer un nouveau maillage :", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        du.Upload(id='upload-mesh', text="Importer un maillage", default_style={"padding": "10px"}),
+                            # Traitement des fichiers importés, en arrière-plan (voir ingestion.py)
+                            html.Progress(id='ingestion-progress', max=100, value=0, style={"width": "100%"}),
+                            html.Div(id='ingestion-status', style={"fontSize": "14px"}),
+                            dcc.Interval(id='ingestion-timer', interval=250, disabled=True),
+                            dcc.Store(id='ingestion-job'),
+                            dcc.Store(id='ingestion-result'),
 
-                        html.Label("Importer une texture :", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        du.Upload(id='upload-texture', text="Importer une texture", default_style={"padding": "10px"}),
+                            # Textures préchargées par app.run_dash_app (masqué sinon)
+                            html.Div(
+                                style={} if texture_names else {"display": "none"},
+                                children=[
+                                    html.Label("Textures préchargées", style={"fontWeight": "bold", "fontSize": "16px"}),
+                                    dcc.Dropdown(id='texture-selector',
+                                                 options=[{'label': name, 'value': index}
+                                                          for index, name in enumerate(texture_names)],
+                                                 value=0 if texture_names else None, clearable=False),
+                                ],
+                            ),
 
-                        html.Label("Sélectionner une colormap", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Dropdown( id='colormap-dropdown', options=[{'label': cmap, 'value': cmap} for cmap in colorscale_names],
-                                     value='Viridis',clearable=False),    
-                        html.Label("Appliquer valeur max sommet aux faces", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Checklist(id='toggle-triangle', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
-                        html.Label("Afficher les isolignes", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Checklist(id='toggle-contours', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
-                        html.Label("Activer traits noirs", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Checklist(id='toggle-black-intervals', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
-                        html.Label("Centrer la colormap sur 0", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Checklist(id='toggle-center-colormap', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
-                    ],
-                ),
-                # Zone centrale : Visualisation
-                html.Div(
-                    style={
-                        "flex": "2",
-                        "backgroundColor": "#ffffff",
-                        "padding": "20px",
-                        "borderRadius": "8px",
-                        "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
-                        "display": "flex",
-                        "justifyContent": "center",
-                        "alignItems": "center",
-                    },
-                    children=[
-                        dcc.Graph(id='3d-mesh', style={"width": "100%", "height": "100%"}),
-                    ],
-                ),
-                # Panneau droit : Slider
-                html.Div(
-                    style={
-                        "flex": "1",
-                        "backgroundColor": "#f9f9f9",
-                        "padding": "20px",
-                        "borderRadius": "8px",
-                        "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
-                        "display": "flex",
-                        "flexDirection": "column",
-                        "justifyContent": "center",
-                        "alignItems": "center",
-                    },
-                    children=[
-                        html.Label("Ajuster la plage de valeurs", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.RangeSlider(
-                            id='range-slider',
-                            min=default_min,
-                            max=default_max,
-                            step=0.01,
-                            value=[default_min, default_max],
-                            marks=default_marks,
-                            vertical=True,
-                            verticalHeight=500,
-                            tooltip={"placement": "right", "always_visible": True},
-                        ),
-                        html.Div(id='upload-status', style={"color": "green", "marginTop": "10px"}),
-                    ],
-                ),
-            ],
-        ),
-    ],
-)
\ No newline at end of file
+                            html.Label("Sélectionner une colormap", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Dropdown( id='colormap-dropdown', options=[{'label': cmap, 'value': cmap} for cmap in colorscale_names],
+                                         value='Viridis',clearable=False),    
+                            html.Label("Appliquer valeur sommet aux faces", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-triangle', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            dcc.Dropdown(id='face-reducer',
+                                         options=[{'label': label, 'value': value}
+                                                  for value, label in fct.FACE_REDUCERS.items()],
+                                         value='max', clearable=False),
+                            html.Label("Afficher les arêtes des triangles", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-contours', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            html.Label("Isolignes de la texture (niveaux)", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Input(id='isoline-levels', type='text', value='', debounce=True,
+                                      placeholder="ex. -1, 0, 0.5"),
+                            html.Label("Activer traits noirs", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-black-intervals', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            html.Label("Centrer la colormap sur 0", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-center-colormap', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            html.Label("Couleurs exactes des colormaps personnalisées", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-vertex-colors', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            html.Label("Transmission de la texture", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Dropdown(id='intensity-transport',
+                                         options=[{'label': label, 'value': value}
+                                                  for value, label in fct.INTENSITY_TRANSPORTS.items()],
+                                         value='float32', clearable=False),
+                            html.Label("Niveau de détail", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.RadioItems(id='lod-level',
+                                           options=[{'label': 'Aperçu', 'value': 'coarse'},
+                                                    {'label': 'Pleine résolution', 'value': 'full'}],
+                                           value='coarse'),
+                            # Passage automatique en pleine résolution après un temps d'inactivité
+                            dcc.Interval(id='lod-idle-timer', interval=2000, max_intervals=1),
+                            html.Label("Trames de la texture", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            html.Button("Lecture / Pause", id='play-button', n_clicks=0),
+                            dcc.Slider(id='frame-slider', min=0, max=0, step=1, value=0, marks=None,
+                                       tooltip={"placement": "bottom", "always_visible": True}),
+                            # Cadence de lecture (ms par trame)
+                            dcc.Interval(id='playback-timer', interval=100, disabled=True),
+                        ],
+                    ),
+                    # Zone centrale : Visualisation
+                    html.Div(
+                        style={
+                            "flex": "2",
+                            "backgroundColor": "#ffffff",
+                            "padding": "20px",
+                            "borderRadius": "8px",
+                            "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
+                            "display": "flex",
+                            "justifyContent": "center",
+                            "alignItems": "center",
+                        },
+                        children=[
+                            dcc.Graph(id='3d-mesh', style={"width": "100%", "height": "100%"}),
+                            # État de la figure affichée côté client (sert à n'envoyer que les changements)
+                            dcc.Store(id='figure-state'),
+                            # Changements de style que le serveur doit appliquer (voir viewer.styleRequest)
+                            dcc.Store(id='style-request'),
+                            # Colorscales précalculées, appliquées dans le navigateur (assets/viewer.js)
+                            dcc.Store(id='colorscales', data=resources.get_colorscales()),
+                        ],
+                    ),
+                    # Panneau droit : Slider
+                    html.Div(
+                        style={
+                            "flex": "1",
+                            "backgroundColor": "#f9f9f9",
+                            "padding": "20px",
+                            "borderRadius": "8px",
+                            "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
+                            "display": "flex",
+                            "flexDirection": "column",
+                            "justifyContent": "center",
+                            "alignItems": "center",
+                        },
+                        children=[
+                            html.Label("Ajuster la plage de valeurs", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.RangeSlider(
+                                id='range-slider',
+                                min=default_min,
+                                max=default_max,
+                                step=0.01,
+                                value=[default_min, default_max],
+                                marks=default_marks,
+                                vertical=True,
+                                verticalHeight=500,
+                                tooltip={"placement": "right", "always_visible": True},
+                            ),
+                            html.Div(id='upload-status', style={"color": "green", "marginTop": "10px"}),
+                            # Valeur exacte du point survolé (texture transmise quantifiée)
+                            html.Div(id='hover-value', style={"marginTop": "10px"}),
+                            dcc.Store(id='hover-point'),
+                        ],
+                    ),
+                ],
+            ),
+        ],
+    )
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import nibabel as nib
+import numpy as np
+
+import fonctions as fct
+
+
+def frame_count(gifti):
+    """Nombre de trames d'une texture GIFTI ouverte avec GiftiCache.open."""
+    if len(gifti) == 1 and len(gifti.shape(0)) == 2:
+        return gifti.shape(0)[1]
+    return len(gifti)
+
+
+def is_label_texture(gifti):
+    """Vrai pour une texture d'étiquettes : intention NIFTI_INTENT_LABEL ou valeurs entières."""
+    return (gifti.intents[0] == nib.nifti1.intent_codes['NIFTI_INTENT_LABEL']
+            or np.issubdtype(gifti.darray(0).dtype, np.integer))
+
+
+class TextureFrames:
+    """
+    Trames d'une texture multi-trames (série temporelle, plusieurs sujets...).
+
+    Une trame est soit un data array du fichier GIFTI, soit une colonne d'un
+    data array 2D (N sommets, T trames). Les data arrays sont lus en mémoire
+    mappée depuis GIFTI_CACHE : ouvrir la texture ne décode aucune trame, et
+    chaque trame d'un fichier à plusieurs data arrays est décodée séparément.
+    Chaque trame demandée déclenche la lecture anticipée des suivantes dans
+    un thread, pour que la lecture continue ne bloque pas sur le disque.
+    """
+
+    def __init__(self, path, cache_size=16, prefetch=8, gifti_cache=None):
+        self.path = path
+        self.prefetch_count = prefetch
+        self.cache_size = cache_size
+        self._gifti = gifti_cache.open(path) if gifti_cache else fct.open_gifti(path)
+        # Un seul data array 2D : une trame par colonne
+        self._columns = len(self._gifti) == 1 and len(self._gifti.shape(0)) == 2
+        self._frames = OrderedDict()  # indice -> trame (float32)
+        self._pending = {}  # indice -> Future de lecture anticipée
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='texture-prefetch')
+
+    def __len__(self):
+        return frame_count(self._gifti)
+
+    def __getitem__(self, index):
+        return self.frame(index)
+
+    @property
+    def labels(self):
+        """Vrai si les trames sont des étiquettes (voir is_label_texture), bien que lues en float32."""
+        return is_label_texture(self._gifti)
+
+    def _load(self, index):
+        raw = self._gifti.darray(0)[:, index] if self._columns else self._gifti.darray(index)
+        # Copie contiguë : les pages du fichier sont lues ici, pas pendant le rendu
+        return np.array(raw, dtype=np.float32)
+
+    def _store(self, index, frame):
+        with self._lock:
+            self._pending.pop(index, None)
+            self._frames[index] = frame
+            self._frames.move_to_end(index)
+            while len(self._frames) > self.cache_size:
+                self._frames.popitem(last=False)
+
+    def _prefetch_one(self, index):
+        try:
+            frame = self._load(index)
+        except Exception:
+            with self._lock:
+                self._pending.pop(index, None)
+            raise
+        self._store(index, frame)
+
+    def frame(self, index):
+        """Retourne la trame index (float32) et lance la lecture des suivantes."""
+        index = index % len(self)
+        with self._lock:
+            frame = self._frames.get(index)
+            future = self._pending.get(index)
+        if frame is None:
+            if future is not None:
+                try:
+                    future.result()
+                except CancelledError:
+                    pass  # Lecture anticipée annulée par close() : la trame est lue ci-dessous
+                with self._lock:
+                    frame = self._frames.get(index)
+            if frame is None:
+                frame = self._load(index)
+                self._store(index, frame)
+        self.prefetch(index + 1)
+        return frame
+
+    def prefetch(self, start):
+        """Lit en arrière-plan les trames start, start + 1, ... absentes du cache."""
+        n_frames = len(self)
+        with self._lock:
+            if self._closed:
+                return
+            for index in range(start, start + min(self.prefetch_count, n_frames)):
+                index = index % n_frames
+                if index not in self._frames and index not in self._pending:
+                    self._pending[index] = self._executor.submit(self._prefetch_one, index)
+
+    def close(self):
+        """
+        Arrête le thread de lecture anticipée.
+
+        Les trames restent lisibles (sans lecture anticipée) par un rendu qui utilise encore l'objet.
+        """
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import defaultdict
+
+
+class RenderSkipped(Exception):
+    """La demande de rendu a été remplacée par une demande plus récente."""
+
+
+class RenderScheduler:
+    """
+    Regroupe les rafales de demandes de rendu et abandonne celles qui sont dépassées.
+
+    Pour une même clé (une session), chaque demande attend `settle_interval`
+    secondes : si une demande plus récente arrive entre-temps, la précédente est
+    abandonnée sans rien calculer. Les rendus d'une même clé sont exécutés un
+    par un, et un résultat devenu obsolète pendant son calcul n'est pas renvoyé.
+    Le serveur calcule donc au plus un rendu par session et par intervalle de
+    stabilisation, quel que soit le nombre d'événements reçus. L'état d'une clé
+    est oublié dès qu'elle n'a plus de demande en cours.
+    """
+
+    def __init__(self, settle_interval=0.05):
+        self.settle_interval = settle_interval
+        self._generations = defaultdict(int)
+        self._locks = defaultdict(threading.Lock)
+        self._pending = defaultdict(int)  # clé -> demandes en cours
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'rendered': 0, 'skipped': 0}
+
+    def _is_latest(self, key, generation):
+        with self._lock:
+            return self._generations[key] == generation
+
+    def _skip(self):
+        with self._lock:
+            self._stats['skipped'] += 1
+        raise RenderSkipped()
+
+    def submit(self, key, render, *args, **kwargs):
+        """
+        Exécute render(*args, **kwargs) si aucune demande plus récente n'arrive pour key.
+
+        :return: Le résultat de render.
+        :raises RenderSkipped: si la demande a été remplacée avant ou pendant le rendu.
+        """
+        with self._lock:
+            self._generations[key] += 1
+            generation = self._generations[key]
+            self._stats['submitted'] += 1
+            self._pending[key] += 1
+            key_lock = self._locks[key]
+        try:
+            return self._run(key, generation, key_lock, render, args, kwargs)
+        finally:
+            with self._lock:
+                self._pending[key] -= 1
+                if not self._pending[key]:
+                    del self._pending[key], self._generations[key], self._locks[key]
+
+    def _run(self, key, generation, key_lock, render, args, kwargs):
+        # Regroupement : on laisse aux événements suivants le temps d'arriver
+        time.sleep(self.settle_interval)
+        if not self._is_latest(key, generation):
+            self._skip()
+
+        with key_lock:
+            # Une demande plus récente a pu arriver pendant l'attente du verrou
+            if not self._is_latest(key, generation):
+                self._skip()
+            result = render(*args, **kwargs)
+
+        with self._lock:
+            self._stats['rendered'] += 1
+        # Le résultat est obsolète : une demande plus récente est déjà en cours
+        if not self._is_latest(key, generation):
+            self._skip()
+        return result
+
+    def stats(self):
+        """Compteurs {'submitted', 'rendered', 'skipped'} depuis le démarrage."""
+        with self._lock:
+            return dict(self._stats)
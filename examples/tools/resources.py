@@ -0,0 +1,65 @@
+import functools
+import os
+
+import fonctions as fct
+from colormap_registry import ColormapRegistry
+
+# Ressources partagées par les pages et les callbacks. Elles sont chargées à la
+# première utilisation (et non à l'import), une seule fois par processus.
+TOOLS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MESH_PATH = os.path.join(TOOLS_DIRECTORY, 'data', 'mesh.gii')
+COLORMAP_DIRECTORY = os.path.join(TOOLS_DIRECTORY, 'custom_colormap')
+# Maillage et textures préchargés par app.run_dash_app (aucun par défaut)
+PRELOADED = {'mesh_path': None, 'texture_paths': [], 'texture_names': []}
+
+
+@functools.lru_cache(maxsize=None)
+def get_colormap_registry():
+    """Registre des colormaps (Plotly + répertoire custom_colormap), partagé par tous les rendus."""
+    return ColormapRegistry(COLORMAP_DIRECTORY)
+
+
+def get_colorscale_names():
+    """Noms des colormaps proposées dans l'interface (Plotly + personnalisées)."""
+    return get_colormap_registry().names()
+
+
+@functools.lru_cache(maxsize=None)
+def get_colorscales():
+    """
+    Colorscales Plotly de chaque colormap proposée, avec et sans traits noirs.
+
+    Calculées une fois puis envoyées au navigateur avec le layout, sous la forme
+    {nom: {'plain': colorscale, 'stripes': colorscale}}.
+    """
+    registry = get_colormap_registry()
+    colorscales = {}
+    for name in registry.names():
+        colorscales[name] = {
+            'plain': registry.colorscale(name, False),
+            'stripes': registry.colorscale(name, True),
+        }
+    return colorscales
+
+
+def set_preloaded_textures(mesh_path, texture_paths, texture_names=None):
+    """Déclare le maillage et les textures à afficher dès l'ouverture de l'application."""
+    texture_paths = [os.path.abspath(path) for path in texture_paths]
+    if texture_names is None:
+        texture_names = [os.path.splitext(os.path.basename(path))[0] for path in texture_paths]
+    if len(texture_names) != len(texture_paths):
+        raise ValueError("Il faut un nom par texture")
+    PRELOADED.update(mesh_path=os.path.abspath(mesh_path), texture_paths=texture_paths,
+                     texture_names=list(texture_names))
+
+
+def get_preloaded_texture_names():
+    """Noms des textures préchargées, proposés dans le sélecteur de texture."""
+    return list(PRELOADED['texture_names'])
+
+
+@functools.lru_cache(maxsize=None)
+def get_default_mesh_arrays():
+    """Sommets et faces du maillage affiché par défaut."""
+    vertices, faces, _ = fct.load_mesh_arrays(DEFAULT_MESH_PATH)
+    return vertices, faces
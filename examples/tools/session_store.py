@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import METRICS
+
+
+def array_digest(array):
+    """Empreinte (blake2b) du contenu d'un tableau numpy, de son type et de sa forme."""
+    array = np.ascontiguousarray(array)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{array.dtype.str}{array.shape}".encode())
+    h.update(memoryview(array).cast('B'))
+    return h.hexdigest()
+
+
+def new_session_id():
+    """Identifiant aléatoire d'une session (un onglet de navigateur)."""
+    return uuid.uuid4().hex
+
+
+class SessionStore:
+    """
+    Stockage des maillages et textures par session.
+
+    - Les tableaux sont adressés par leur contenu (array_digest) et écrits une
+      seule fois en .npy dans `cache_dir/arrays`. Ils sont relus en mémoire
+      mappée : deux sessions (ou deux processus workers) qui regardent le même
+      sujet partagent les mêmes pages mémoire.
+    - L'état de chaque session (clés des tableaux, plage de couleurs...) est un
+      petit JSON dans `cache_dir/sessions`, lisible par tous les workers.
+    - Quand la taille des tableaux sur disque dépasse `max_bytes`, les moins
+      récemment utilisés sont supprimés, sauf ceux que l'appel vient d'écrire.
+    - Les états de session inutilisés depuis `max_session_age` secondes sont
+      supprimés (au plus une vérification par heure).
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, max_objects=16, max_mapped=64,
+                 max_session_age=7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_session_age = max_session_age
+        self.max_objects = max_objects
+        self.max_mapped = max_mapped
+        self._arrays_dir = os.path.join(cache_dir, 'arrays')
+        self._sessions_dir = os.path.join(cache_dir, 'sessions')
+        os.makedirs(self._arrays_dir, exist_ok=True)
+        os.makedirs(self._sessions_dir, exist_ok=True)
+        self._mapped = OrderedDict()  # clé -> tableau mappé
+        self._objects = OrderedDict()  # objets dérivés (ex. pyramide de niveaux de détail)
+        self._lock = threading.Lock()
+        self._next_session_expiry = 0.
+
+    # Tableaux adressés par contenu
+    def _array_path(self, key):
+        # Les clés peuvent venir d'un état modifiable par le navigateur : jamais de chemin arbitraire
+        if not isinstance(key, str) or not re.fullmatch(r'[0-9a-f]+', key):
+            raise ValueError(f"Clé de tableau invalide : {key!r}")
+        return os.path.join(self._arrays_dir, f"{key}.npy")
+
+    def _write_array(self, array):
+        """Écrit un tableau s'il n'est pas déjà stocké ; retourne (clé, vrai s'il a été écrit)."""
+        array = np.asarray(array)
+        key = array_digest(array)
+        path = self._array_path(key)
+        if os.path.exists(path):
+            os.utime(path)
+            return key, False
+        # Écriture atomique : un autre worker ne voit jamais de fichier partiel
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as file:
+            np.save(file, array)
+        os.replace(tmp_path, path)
+        return key, True
+
+    def put_arrays(self, *arrays):
+        """
+        Enregistre plusieurs tableaux et retourne leurs clés de contenu.
+
+        Les tableaux identiques déjà stockés ne sont pas réécrits. L'éviction
+        qui suit ne supprime aucun des tableaux de l'appel (ex. les sommets
+        d'un maillage quand ses faces dépassent la taille restante).
+        """
+        keys, written = zip(*(self._write_array(array) for array in arrays))
+        if any(written):
+            self.evict(keep=keys)
+        return list(keys)
+
+    def put_array(self, array):
+        """Enregistre un tableau et retourne sa clé de contenu (voir put_arrays)."""
+        key, = self.put_arrays(array)
+        return key
+
+    def get_array(self, key):
+        """
+        Retourne le tableau (en lecture seule, mappé en mémoire) associé à une clé.
+
+        :raises KeyError: si le tableau n'est pas (ou plus) dans le cache.
+        """
+        with self._lock:
+            if key in self._mapped:
+                self._mapped.move_to_end(key)
+                METRICS.inc('cache_lookups', cache='arrays', result='hit')
+                return self._mapped[key]
+        METRICS.inc('cache_lookups', cache='arrays', result='miss')
+        path = self._array_path(key)
+        try:
+            array = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except FileNotFoundError:
+            raise KeyError(key)
+        with self._lock:
+            self._mapped[key] = array
+            while len(self._mapped) > self.max_mapped:
+                self._mapped.popitem(last=False)
+        return array
+
+    def evict(self, keep=()):
+        """
+        Supprime les tableaux les moins récemment utilisés au-delà de max_bytes.
+
+        :param keep: Clés à conserver quelle que soit la taille totale.
+        """
+        keep = set(keep)
+        entries = []
+        for entry in os.scandir(self._arrays_dir):
+            if entry.name.endswith('.npy') and entry.name[:-4] not in keep:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path, entry.name[:-4]))
+        total = sum(size for _, size, _, _ in entries)
+        total += sum(os.path.getsize(self._array_path(key)) for key in keep
+                     if os.path.exists(self._array_path(key)))
+        for _, size, path, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                # Les vues déjà mappées restent valides : le fichier n'est libéré qu'à leur fermeture
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                self._mapped.pop(key, None)
+            total -= size
+
+    # Objets dérivés, recalculés par chaque processus à la demande
+    def memoize(self, key, factory):
+        """
+        Retourne l'objet associé à key, en le construisant avec factory() si besoin.
+
+        Les objets évincés qui ont une méthode close() (ex. playback.TextureFrames) sont fermés.
+        """
+        with self._lock:
+            if key in self._objects:
+                self._objects.move_to_end(key)
+                METRICS.inc('cache_lookups', cache='objects', result='hit')
+                return self._objects[key]
+        METRICS.inc('cache_lookups', cache='objects', result='miss')
+        value = factory()
+        evicted = []
+        with self._lock:
+            if key in self._objects:
+                # Construit en même temps par un autre thread : un seul objet est gardé
+                evicted.append(value)
+                value = self._objects[key]
+            else:
+                self._objects[key] = value
+            while len(self._objects) > self.max_objects:
+                evicted.append(self._objects.popitem(last=False)[1])
+        for obj in evicted:
+            close = getattr(obj, 'close', None)
+            if close is not None:
+                close()
+        return value
+
+    # État des sessions
+    def _session_path(self, session_id):
+        if not isinstance(session_id, str) or not re.fullmatch(r'[0-9a-f]{32}', session_id):
+            raise ValueError(f"Identifiant de session invalide : {session_id!r}")
+        return os.path.join(self._sessions_dir, f"{session_id}.json")
+
+    def get_session(self, session_id):
+        """Retourne l'état d'une session, ou None si elle est inconnue."""
+        path = self._session_path(session_id)
+        try:
+            with open(path, 'r') as file:
+                state = json.load(file)
+            # Une session lue est active : sa date de modification repousse son expiration
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return state
+
+    def set_session(self, session_id, state):
+        """Enregistre l'état (sérialisable en JSON) d'une session."""
+        path = self._session_path(session_id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, path)
+        now = time.monotonic()
+        if now >= self._next_session_expiry:
+            self._next_session_expiry = now + 3600
+            self.expire_sessions()
+
+    def expire_sessions(self):
+        """Supprime les états de session (et écritures interrompues) inutilisés depuis max_session_age."""
+        limit = time.time() - self.max_session_age
+        for entry in os.scandir(self._sessions_dir):
+            try:
+                if entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
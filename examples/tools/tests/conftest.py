@@ -0,0 +1,35 @@
+import os
+import sys
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+# Les modules de examples/tools s'importent à plat, comme dans l'application
+TOOLS_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if TOOLS_DIRECTORY not in sys.path:
+    sys.path.insert(0, TOOLS_DIRECTORY)
+
+
+def save_gifti(path, arrays, encoding='GIFTI_ENCODING_B64GZ', ordering='RowMajorOrder', intents=None, meta=None):
+    """Écrit des tableaux dans un fichier GIFTI avec nibabel, et retourne son chemin."""
+    intents = intents or ['NIFTI_INTENT_NONE'] * len(arrays)
+    darrays = [nib.gifti.GiftiDataArray(array, intent=intent, encoding=encoding, ordering=ordering)
+               for array, intent in zip(arrays, intents)]
+    image = nib.gifti.GiftiImage(darrays=darrays, meta=nib.gifti.GiftiMetaData(meta or {}))
+    nib.save(image, str(path))
+    return str(path)
+
+
+def save_mesh(path, vertices, faces, encoding='GIFTI_ENCODING_B64GZ'):
+    return save_gifti(path, [vertices, faces], encoding,
+                      intents=['NIFTI_INTENT_POINTSET', 'NIFTI_INTENT_TRIANGLE'])
+
+
+@pytest.fixture
+def mesh_arrays():
+    """Petit maillage : sommets (N, 3) float32 et faces (M, 3) int32."""
+    rng = np.random.default_rng(0)
+    vertices = rng.standard_normal((50, 3)).astype(np.float32)
+    faces = rng.integers(0, 50, (80, 3)).astype(np.int32)
+    return vertices, faces
@@ -0,0 +1,77 @@
+import pickle
+
+import numpy as np
+import pytest
+
+import cohort
+import mesh_store
+from conftest import save_gifti, save_mesh
+
+
+@pytest.fixture
+def cohort_files(tmp_path, mesh_arrays):
+    """Trois maillages (deux de même topologie), une texture multi-trames et un fichier invalide."""
+    vertices, faces = mesh_arrays
+    rng = np.random.default_rng(2)
+    paths = [
+        save_mesh(tmp_path / 's1.gii', vertices, faces),
+        save_mesh(tmp_path / 's2.gii', vertices + 1, faces),
+        save_mesh(tmp_path / 's3.gii', vertices, faces[::-1].copy()),
+        save_gifti(tmp_path / 'frames.gii', list(rng.standard_normal((4, len(vertices))).astype(np.float32))),
+    ]
+    (tmp_path / 'bad.gii').write_text('not a gifti file')
+    return paths + [str(tmp_path / 'bad.gii')]
+
+
+def test_load_cohort(cohort_files, mesh_arrays):
+    vertices, faces = mesh_arrays
+    with cohort.load_cohort(cohort_files, max_workers=2) as loaded:
+        assert [subject.kind for subject in loaded] == ['mesh', 'mesh', 'mesh', 'texture']
+        assert [path for path, _ in loaded.errors] == [cohort_files[-1]]
+        np.testing.assert_array_equal(loaded[0]['vertices'], vertices)
+        np.testing.assert_array_equal(loaded[1]['vertices'], vertices + 1)
+        np.testing.assert_array_equal(loaded[2]['faces'], faces[::-1])
+        assert loaded[3]['texture'].shape == (4, len(vertices))
+        assert not loaded[0]['vertices'].flags.writeable
+        # Même topologie : un seul bloc de faces
+        assert loaded[0].arrays['faces'] is loaded[1].arrays['faces']
+        assert loaded.topologies == 2
+
+
+def test_close_releases_blocks(cohort_files):
+    loaded = cohort.load_cohort(cohort_files[:2], max_workers=1)
+    shared = cohort.SharedArray(loaded[0].arrays['vertices'].name, (1,), np.float32)
+    loaded.close()
+    with pytest.raises(FileNotFoundError):
+        shared.attach()
+
+
+def test_subjects_are_picklable(cohort_files):
+    with cohort.load_cohort(cohort_files[:1], max_workers=1) as loaded:
+        subject = pickle.loads(pickle.dumps(loaded[0]))
+        np.testing.assert_array_equal(subject['vertices'], loaded[0]['vertices'])
+        subject.close()
+
+
+def test_glob_and_store_directories(tmp_path, cohort_files):
+    store_directory = mesh_store.export_mesh(cohort_files[0], str(tmp_path / 'store' / 's1.store'))
+    with cohort.load_cohort(str(tmp_path / '**' / '*.store'), max_workers=1) as loaded:
+        assert len(loaded) == 1 and loaded[0].path == store_directory
+        np.testing.assert_array_equal(loaded[0]['faces'], mesh_store.open_store(store_directory).darray(1))
+
+
+def test_failed_subject_releases_its_blocks(cohort_files, monkeypatch):
+    created = []
+    create = cohort.SharedArray.create.__func__
+
+    def create_then_fail(cls, array):
+        if created:
+            raise MemoryError("plus de mémoire partagée")
+        created.append(create(cls, array))
+        return created[-1]
+
+    monkeypatch.setattr(cohort.SharedArray, 'create', classmethod(create_then_fail))
+    path, subject, error = cohort._load_subject(cohort_files[0])
+    assert subject is None and 'mémoire' in error
+    with pytest.raises(FileNotFoundError):
+        cohort.SharedArray(created[0].name, (1,), np.float32).attach()
@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+import fonctions as fct
+
+
+def test_face_values_when_vertex_and_face_counts_match():
+    # Autant de sommets que de faces : les valeurs par sommet doivent quand même être ramenées aux faces
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float32)
+    faces = np.array([[0, 1, 2], [0, 1, 3], [0, 2, 3], [1, 2, 3]])
+    scalars = np.array([0., 1., 2., 3.])
+    fig = fct.plot_mesh_with_colorbar(vertices, faces, scalars, apply_to_faces=True)
+    np.testing.assert_array_equal(fig.data[0].intensity, [2., 3., 3., 3.])
+    fig = fct.plot_mesh_with_colorbar(vertices, faces, scalars, scalars_on_faces=True)
+    assert fig.data[0].intensitymode == 'cell'
+    np.testing.assert_array_equal(fig.data[0].intensity, scalars)
+    with pytest.raises(ValueError):
+        fct.plot_mesh_with_colorbar(vertices, faces[:3], scalars, scalars_on_faces=True)
@@ -0,0 +1,118 @@
+import re
+
+import nibabel as nib
+import numpy as np
+import pytest
+
+from conftest import save_gifti, save_mesh
+from gifti_reader import GiftiReader
+from ingestion import peek_gifti_header
+
+ENCODINGS = ['GIFTI_ENCODING_ASCII', 'GIFTI_ENCODING_B64BIN', 'GIFTI_ENCODING_B64GZ']
+ORDERINGS = ['RowMajorOrder', 'ColumnMajorOrder']
+
+
+def assert_same_as_nibabel(path):
+    reader = GiftiReader(path)
+    image = nib.load(path)
+    assert len(reader) == len(image.darrays)
+    assert reader.meta == dict(image.meta)
+    for index, expected in enumerate(image.darrays):
+        assert nib.nifti1.intent_codes.code[reader.headers[index]['intent']] == expected.intent
+        assert reader.headers[index]['meta'] == dict(expected.meta)
+        data = reader.darray(index)
+        assert data.shape == expected.data.shape
+        np.testing.assert_array_equal(data, expected.data)
+    reader.close()
+
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+@pytest.mark.parametrize('ordering', ORDERINGS)
+def test_encodings_and_orderings(tmp_path, mesh_arrays, encoding, ordering):
+    vertices, faces = mesh_arrays
+    texture = np.linspace(-1, 1, len(vertices) * 4, dtype=np.float32).reshape(len(vertices), 4)
+    path = save_gifti(tmp_path / 'mesh.gii', [vertices, faces, texture], encoding, ordering,
+                      intents=['NIFTI_INTENT_POINTSET', 'NIFTI_INTENT_TRIANGLE', 'NIFTI_INTENT_NONE'],
+                      meta={'AnatomicalStructurePrimary': 'CortexLeft'})
+    assert_same_as_nibabel(path)
+
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.int32, np.float32])
+def test_data_types(tmp_path, dtype):
+    values = np.arange(30).astype(dtype)
+    assert_same_as_nibabel(save_gifti(tmp_path / 'texture.gii', [values]))
+
+
+def test_big_endian(tmp_path, mesh_arrays):
+    path = save_mesh(tmp_path / 'mesh.gii', *mesh_arrays, encoding='GIFTI_ENCODING_B64BIN')
+    with open(path, 'rb') as file:
+        content = file.read()
+    # Données réécrites en big endian, comme les produisent certains logiciels
+    image = nib.load(path)
+    for darray in image.darrays:
+        little = darray.data.astype(darray.data.dtype.newbyteorder('<')).tobytes()
+        big = darray.data.astype(darray.data.dtype.newbyteorder('>')).tobytes()
+        content = content.replace(nib.gifti.gifti.base64.b64encode(little), nib.gifti.gifti.base64.b64encode(big))
+    content = content.replace(b'Endian="LittleEndian"', b'Endian="BigEndian"')
+    with open(path, 'wb') as file:
+        file.write(content)
+    assert_same_as_nibabel(path)
+
+
+def test_single_quoted_attributes(tmp_path, mesh_arrays):
+    path = save_mesh(tmp_path / 'mesh.gii', *mesh_arrays)
+    with open(path, 'rb') as file:
+        content = file.read()
+    content = re.sub(rb'(\w+)="([^"]*)"', rb"\1='\2'", content)
+    with open(path, 'wb') as file:
+        file.write(content)
+    assert_same_as_nibabel(path)
+    assert peek_gifti_header(path)['intent'] == 'NIFTI_INTENT_POINTSET'
+
+
+@pytest.mark.parametrize('empty_data', ['<Data/>', '<Data />', '<Data></Data>'])
+def test_external_file(tmp_path, mesh_arrays, empty_data):
+    vertices, faces = mesh_arrays
+    with open(tmp_path / 'mesh.dat', 'wb') as file:
+        file.write(b'\0' * 16 + vertices.tobytes() + faces.tobytes())
+    darrays = []
+    for intent, data_type, array, offset in [('NIFTI_INTENT_POINTSET', 'NIFTI_TYPE_FLOAT32', vertices, 16),
+                                             ('NIFTI_INTENT_TRIANGLE', 'NIFTI_TYPE_INT32', faces,
+                                              16 + vertices.nbytes)]:
+        darrays.append(
+            f'<DataArray Intent="{intent}" DataType="{data_type}" ArrayIndexingOrder="RowMajorOrder" '
+            f'Dimensionality="2" Dim0="{array.shape[0]}" Dim1="3" Encoding="ExternalFileBinary" '
+            f'Endian="LittleEndian" ExternalFileName="mesh.dat" ExternalFileOffset="{offset}">'
+            f'<MetaData/>{empty_data}</DataArray>')
+    path = tmp_path / 'mesh.gii'
+    path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    f'<GIFTI Version="1.0" NumberOfDataArrays="2"><MetaData/>{"".join(darrays)}</GIFTI>')
+    assert_same_as_nibabel(str(path))
+
+
+def test_metadata_with_markup(tmp_path):
+    # Valeurs contenant des caractères échappés ou une section CDATA
+    meta = {'Description': 'a < b & "c"', 'Name': 'texture'}
+    path = save_gifti(tmp_path / 'texture.gii', [np.arange(5, dtype=np.float32)], meta=meta)
+    with open(path, 'rb') as file:
+        content = file.read().replace(b'<Value>texture</Value>', b'<Value><![CDATA[texture]]></Value>')
+    with open(path, 'wb') as file:
+        file.write(content)
+    assert_same_as_nibabel(path)
+    assert GiftiReader(path).meta == meta
+
+
+@pytest.mark.parametrize('content', [b'', b'not a gifti file', b'<?xml version="1.0"?><NIFTI/>',
+                                     b'<GIFTI><DataArray><Data>AAAA'])
+def test_invalid_files(tmp_path, content):
+    path = tmp_path / 'bad.gii'
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        GiftiReader(str(path))
+
+
+def test_peek_reads_only_the_head(tmp_path, mesh_arrays):
+    path = save_mesh(tmp_path / 'mesh.gii', *mesh_arrays)
+    header = peek_gifti_header(path, max_bytes=1500)
+    assert header['shape'] == mesh_arrays[0].shape
+    assert header['encoding'] == 'GZipBase64Binary'
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from isolines import IsolineExtractor, isoline_segments, parse_levels, segments_to_lines
+
+# Deux triangles formant le carré unité : valeurs 0 à gauche (x = 0), 2 à droite (x = 1)
+VERTICES = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=np.float32)
+FACES = np.array([[0, 1, 2], [0, 2, 3]])
+SCALARS = np.array([0., 2., 2., 0.], dtype=np.float32)
+
+
+def sorted_points(segments):
+    points = segments.reshape(-1, 3)
+    return points[np.lexsort(points.T[::-1])]
+
+
+def test_segment_endpoints():
+    segments = isoline_segments(VERTICES, FACES, SCALARS, 0.5)
+    assert segments.shape == (2, 2, 3) and segments.dtype == np.float32
+    # Isoligne verticale x = 0.25 : arêtes du bas, du haut et diagonale
+    expected = [[0.25, 0, 0], [0.25, 0.25, 0], [0.25, 0.25, 0], [0.25, 1, 0]]
+    np.testing.assert_allclose(sorted_points(segments), expected, atol=1e-6)
+
+
+def test_level_on_vertex_values():
+    # Un sommet égal au niveau est du côté >= : le segment passe par ce sommet
+    segments = isoline_segments(VERTICES, FACES, np.array([0., 1., 2., 1.], dtype=np.float32), 1.)
+    assert len(segments) == 2
+    for segment in segments:
+        assert np.allclose(segment[:, 0] + segment[:, 1], 1)
+
+
+@pytest.mark.parametrize('level', [-1., 2.5, 100.])
+def test_levels_outside_range(level):
+    assert isoline_segments(VERTICES, FACES, SCALARS, level).shape == (0, 2, 3)
+    x, y, z = IsolineExtractor(VERTICES, FACES, SCALARS).lines([level])
+    assert len(x) == len(y) == len(z) == 0
+
+
+def test_nan_faces_ignored():
+    scalars = np.array([0., 2., np.nan, 0.], dtype=np.float32)
+    assert len(isoline_segments(VERTICES, FACES, scalars, 0.5)) == 0
+
+
+def test_extractor_cache():
+    extractor = IsolineExtractor(VERTICES, FACES, SCALARS, max_levels=2)
+    first = extractor.segments(0.5)
+    assert extractor.segments(0.5) is first
+    assert extractor.segments(np.float32(0.5)) is first
+    np.testing.assert_array_equal(first, isoline_segments(VERTICES, FACES, SCALARS, 0.5))
+    extractor.segments(1.)
+    extractor.segments(1.5)
+    # Au plus max_levels niveaux gardés : le plus ancien est recalculé
+    assert extractor.segments(0.5) is not first
+
+
+def test_lines_separated_by_nan():
+    x, y, z = IsolineExtractor(VERTICES, FACES, SCALARS).lines([0.5, 1.5])
+    assert len(x) == 4 * 3
+    assert np.isnan(x[2::3]).all() and not np.isnan(x[0::3]).any()
+    segments = np.zeros((1, 2, 3), dtype=np.float32)
+    assert [len(axis) for axis in segments_to_lines(segments)] == [3, 3, 3]
+
+
+def test_parse_levels():
+    assert parse_levels('1, -0.5; 1 abc inf 2') == [-0.5, 1., 2.]
+    assert parse_levels(None) == []
@@ -0,0 +1,36 @@
+import numpy as np
+
+from lod import MeshPyramid, majority_labels
+
+
+def test_majority_labels():
+    labels = np.array([3, 3, 7, 7, 7, 5, 2, 9], dtype=np.int32)
+    vertex_map = np.array([0, 0, 0, 1, 1, 1, 2, 2])
+    result = majority_labels(labels, vertex_map, 3)
+    assert result.dtype == np.int32
+    # Groupe 2 : égalité entre 2 et 9, la plus petite étiquette l'emporte
+    np.testing.assert_array_equal(result, [3, 7, 2])
+
+
+def grid_mesh(n=40):
+    """Grille plane de n x n sommets."""
+    i, j = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    vertices = np.column_stack([i.ravel(), j.ravel(), np.zeros(n * n)]).astype(np.float32)
+    a = (i[:-1, :-1] * n + j[:-1, :-1]).ravel()
+    faces = np.concatenate([np.column_stack([a, a + n, a + n + 1]), np.column_stack([a, a + n + 1, a + 1])])
+    return vertices, faces
+
+
+def test_map_label_texture():
+    vertices, faces = grid_mesh()
+    pyramid = MeshPyramid(vertices, faces, min_vertices=100)
+    assert len(pyramid) > 1
+    labels = (vertices[:, 0] > 19.5).astype(np.int32) * 10
+    for level in range(1, len(pyramid)):
+        # Entiers : vote majoritaire ; les mêmes valeurs en float32 avec labels=True
+        for texture, flag in ((labels, None), (labels.astype(np.float32), True)):
+            mapped = pyramid.map_texture(texture, level, flag)
+            assert len(mapped) == pyramid.n_vertices(level)
+            assert set(np.unique(mapped)) <= {0, 10}
+        averaged = pyramid.map_texture(labels.astype(np.float32), level)
+        assert not set(np.unique(averaged)) <= {0, 10}
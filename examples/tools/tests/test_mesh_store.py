@@ -0,0 +1,116 @@
+import nibabel as nib
+import numpy as np
+import pytest
+
+import mesh_store
+from conftest import save_gifti, save_mesh
+from playback import is_label_texture
+
+
+def test_export_mesh(tmp_path, mesh_arrays):
+    vertices, faces = mesh_arrays
+    source = save_mesh(tmp_path / 'mesh.gii', vertices, faces)
+    directory = mesh_store.export_mesh(source, str(tmp_path / 'mesh.store'))
+    assert mesh_store.is_store(directory)
+    stored = mesh_store.open_store(directory)
+    assert stored.kind == 'mesh' and len(stored) == 2
+    stored_vertices, = stored.get_arrays_from_intent('NIFTI_INTENT_POINTSET')
+    stored_faces, = stored.get_arrays_from_intent('NIFTI_INTENT_TRIANGLE')
+    np.testing.assert_array_equal(stored_vertices, vertices)
+    np.testing.assert_array_equal(stored_faces, faces)
+    assert isinstance(stored_vertices, np.memmap)
+
+
+def test_export_mesh_float16(tmp_path, mesh_arrays):
+    vertices, faces = mesh_arrays
+    source = save_mesh(tmp_path / 'mesh.gii', vertices, faces)
+    stored = mesh_store.open_store(mesh_store.export_mesh(source, str(tmp_path / 'mesh.store'), float16=True))
+    assert stored.darray(0).dtype == np.float16
+    np.testing.assert_allclose(stored.darray(0), vertices, rtol=1e-3, atol=1e-3)
+
+
+def test_export_mesh_requires_both_intents(tmp_path, mesh_arrays):
+    source = save_gifti(tmp_path / 'points.gii', [mesh_arrays[0]], intents=['NIFTI_INTENT_POINTSET'])
+    with pytest.raises(ValueError):
+        mesh_store.export_mesh(source, str(tmp_path / 'points.store'))
+
+
+@pytest.mark.parametrize('layout', ['darrays', 'columns'])
+def test_export_texture_frames(tmp_path, layout):
+    frames = np.random.default_rng(1).standard_normal((7, 40)).astype(np.float32)
+    arrays = list(frames) if layout == 'darrays' else [np.ascontiguousarray(frames.T)]
+    source = save_gifti(tmp_path / 'texture.gii', arrays)
+    stored = mesh_store.open_store(mesh_store.export_texture(source, str(tmp_path / 'texture.store'),
+                                                             chunk_frames=3))
+    assert stored.kind == 'texture' and len(stored) == 7
+    assert stored.shape(0) == (40,)
+    np.testing.assert_array_equal(np.stack(stored.darrays(range(7))), frames)
+
+
+@pytest.mark.parametrize('bits', [8, 16])
+def test_export_texture_quantized(tmp_path, bits):
+    values = np.linspace(-2, 3, 101, dtype=np.float32)
+    values[5] = np.nan
+    source = save_gifti(tmp_path / 'texture.gii', [values])
+    stored = mesh_store.open_store(mesh_store.export_texture(source, str(tmp_path / 'texture.store'),
+                                                             quantize_bits=bits))
+    decoded = stored.darray(0)
+    assert decoded.dtype == np.float32
+    assert np.isnan(decoded[5])
+    finite = np.isfinite(values)
+    assert np.abs(decoded[finite] - values[finite]).max() <= stored.quantization['scale'] / 2 + 1e-6
+
+
+@pytest.mark.parametrize('layout', ['darrays', 'columns'])
+def test_export_label_texture(tmp_path, layout):
+    labels = np.random.default_rng(2).integers(0, 40, (3, 50)).astype(np.int32)
+    arrays = list(labels) if layout == 'darrays' else [np.ascontiguousarray(labels.T)]
+    source = save_gifti(tmp_path / 'labels.gii', arrays, intents=['NIFTI_INTENT_LABEL'] * len(arrays))
+    # La quantification demandée est ignorée : les identifiants d'étiquettes restent exacts
+    stored = mesh_store.open_store(mesh_store.export_texture(source, str(tmp_path / 'labels.store'),
+                                                             quantize_bits=8, chunk_frames=2))
+    assert stored.quantization is None
+    assert stored.intents == [nib.nifti1.intent_codes['NIFTI_INTENT_LABEL']] * 3
+    frames = stored.darrays(range(3))
+    assert all(frame.dtype == np.int32 for frame in frames)
+    np.testing.assert_array_equal(np.stack(frames), labels)
+    assert is_label_texture(stored)
+
+
+def test_export_texture_keeps_intent(tmp_path):
+    values = np.linspace(0, 1, 50, dtype=np.float32)
+    source = save_gifti(tmp_path / 'tstat.gii', [values], intents=['NIFTI_INTENT_TTEST'])
+    stored = mesh_store.open_store(mesh_store.export_texture(source, str(tmp_path / 'tstat.store')))
+    assert stored.intents == [nib.nifti1.intent_codes['NIFTI_INTENT_TTEST']]
+    assert not is_label_texture(stored)
+
+
+def test_quantize_bounds_and_nan():
+    values = np.array([-1., 0., 0.5, 1., 2., np.nan], dtype=np.float32)
+    codes, quantization = mesh_store.quantize(values, 8, value_min=0, value_max=1)
+    assert codes.dtype == np.uint8
+    assert codes[0] == 0 and codes[4] == quantization['nan_code'] - 1
+    assert codes[-1] == quantization['nan_code']
+    decoded = mesh_store.dequantize(codes, quantization)
+    np.testing.assert_allclose(decoded[:5], [0, 0, 0.5, 1, 1], atol=quantization['scale'])
+    assert np.isnan(decoded[-1])
+
+
+def test_export_cohort(tmp_path, mesh_arrays):
+    cohort_directory = tmp_path / 'cohort'
+    (cohort_directory / 's1').mkdir(parents=True)
+    save_mesh(cohort_directory / 's1' / 'lh.white.gii', *mesh_arrays)
+    save_gifti(cohort_directory / 's1' / 'thickness.gii', [np.arange(50, dtype=np.float32)])
+    (cohort_directory / 'bad.gii').write_text('not a gifti file')
+    output = tmp_path / 'store'
+
+    errors = mesh_store.export_cohort(str(cohort_directory), str(output), workers=2)
+    assert [source for source, _ in errors] == [str(cohort_directory / 'bad.gii')]
+    assert mesh_store.open_store(str(output / 's1' / 'lh.white.store')).kind == 'mesh'
+    thickness = mesh_store.open_store(str(output / 's1' / 'thickness.store'))
+    np.testing.assert_array_equal(thickness.darray(0), nib.load(cohort_directory / 's1' / 'thickness.gii')
+                                  .darrays[0].data)
+
+    # Conversions déjà faites conservées : seul le fichier en erreur est retenté
+    errors = mesh_store.export_cohort(str(cohort_directory), str(output), workers=2)
+    assert len(errors) == 1
@@ -0,0 +1,27 @@
+from metrics import Metrics
+
+
+def test_render_prometheus_families():
+    metrics = Metrics(enabled=True)
+    metrics.observe('decode', 0.5, kind='mesh')
+    metrics.observe('decode', 0.25, kind='mesh')
+    metrics.inc('cache_lookups', result='hit')
+    lines = metrics.render_prometheus().splitlines()
+    # Chaque échantillon suit la déclaration # TYPE de sa propre famille
+    family = None
+    for line in lines:
+        if line.startswith('# TYPE '):
+            family = line.split()[2]
+        else:
+            assert line.split('{')[0].split()[0] in (family, f"{family}_sum", f"{family}_count")
+    assert '# TYPE neuro_mesh_decode_seconds summary' in lines
+    assert '# TYPE neuro_mesh_decode_seconds_max gauge' in lines
+    assert 'neuro_mesh_decode_seconds_max{kind="mesh"} 0.500000' in lines
+    assert 'neuro_mesh_decode_seconds_count{kind="mesh"} 2' in lines
+
+
+def test_disabled_metrics_render_nothing():
+    metrics = Metrics(enabled=False)
+    metrics.observe('decode', 0.5)
+    metrics.inc('cache_lookups')
+    assert metrics.render_prometheus() == '\n'
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from render_scheduler import RenderScheduler, RenderSkipped
+
+
+def submit_in_thread(scheduler, key, render, *args):
+    """Soumet une demande dans un thread ; retourne (thread, résultat) où résultat reçoit 'value' ou 'error'."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['value'] = scheduler.submit(key, render, *args)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def wait_for(condition, timeout=5.):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_single_request_renders():
+    scheduler = RenderScheduler(settle_interval=0)
+    assert scheduler.submit('session', lambda x: x * 2, 21) == 42
+    assert scheduler.stats() == {'submitted': 1, 'rendered': 1, 'skipped': 0}
+
+
+def test_superseded_while_settling():
+    scheduler = RenderScheduler(settle_interval=0.2)
+    rendered = []
+    first, first_outcome = submit_in_thread(scheduler, 'session', rendered.append, 'first')
+    wait_for(lambda: scheduler.stats()['submitted'] == 1)
+    assert scheduler.submit('session', lambda: rendered.append('second') or 'second') == 'second'
+    first.join()
+    # La demande remplacée pendant l'attente n'a rien calculé
+    assert isinstance(first_outcome['error'], RenderSkipped)
+    assert rendered == ['second']
+    assert scheduler.stats() == {'submitted': 2, 'rendered': 1, 'skipped': 1}
+
+
+def test_superseded_while_rendering():
+    scheduler = RenderScheduler(settle_interval=0)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_render():
+        started.set()
+        release.wait(5)
+        return 'first'
+
+    first, first_outcome = submit_in_thread(scheduler, 'session', slow_render)
+    started.wait(5)
+    second, second_outcome = submit_in_thread(scheduler, 'session', lambda: 'second')
+    wait_for(lambda: scheduler.stats()['submitted'] == 2)
+    release.set()
+    first.join()
+    second.join()
+    # Le rendu devenu obsolète pendant son calcul n'est pas renvoyé ; le plus récent l'est toujours
+    assert isinstance(first_outcome['error'], RenderSkipped)
+    assert second_outcome == {'value': 'second'}
+    assert scheduler.stats() == {'submitted': 2, 'rendered': 2, 'skipped': 1}
+
+
+def test_burst_renders_only_newest():
+    scheduler = RenderScheduler(settle_interval=0.1)
+    rendered = []
+    requests = []
+    for index in range(10):
+        requests.append(submit_in_thread(scheduler, 'session', lambda i=index: rendered.append(i) or i))
+        wait_for(lambda: scheduler.stats()['submitted'] == index + 1)
+    for thread, _ in requests:
+        thread.join()
+    assert rendered == [9]
+    assert requests[-1][1] == {'value': 9}
+    assert all(isinstance(outcome['error'], RenderSkipped) for _, outcome in requests[:-1])
+
+
+def test_keys_are_independent():
+    scheduler = RenderScheduler(settle_interval=0.1)
+    a, a_outcome = submit_in_thread(scheduler, 'a', lambda: 'a')
+    b, b_outcome = submit_in_thread(scheduler, 'b', lambda: 'b')
+    a.join()
+    b.join()
+    assert (a_outcome, b_outcome) == ({'value': 'a'}, {'value': 'b'})
+    # L'état d'une clé est oublié quand elle n'a plus de demande en cours
+    assert not scheduler._pending and not scheduler._generations
+
+
+def test_render_error_propagates():
+    scheduler = RenderScheduler(settle_interval=0)
+
+    def failing_render():
+        raise ValueError('render')
+
+    with pytest.raises(ValueError):
+        scheduler.submit('session', failing_render)
+    assert scheduler.submit('session', lambda: 'ok') == 'ok'
@@ -0,0 +1,60 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from session_store import SessionStore, new_session_id
+
+
+def test_put_arrays_keeps_arrays_of_the_call(tmp_path):
+    # Chaque tableau fait 8 Ko : la limite ne permet d'en garder qu'un
+    store = SessionStore(str(tmp_path), max_bytes=10000)
+    old_key = store.put_array(np.zeros(1000))
+    vertices_key, faces_key = store.put_arrays(np.ones(1000), np.full(1000, 2.))
+    np.testing.assert_array_equal(store.get_array(vertices_key), 1.)
+    np.testing.assert_array_equal(store.get_array(faces_key), 2.)
+    store._mapped.clear()
+    with pytest.raises(KeyError):
+        store.get_array(old_key)
+
+
+def test_put_array_larger_than_cache(tmp_path):
+    store = SessionStore(str(tmp_path), max_bytes=100)
+    key = store.put_array(np.arange(1000.))
+    np.testing.assert_array_equal(store.get_array(key), np.arange(1000.))
+
+
+def test_expire_sessions(tmp_path):
+    store = SessionStore(str(tmp_path), max_session_age=3600)
+    active, stale = new_session_id(), new_session_id()
+    store.set_session(active, {'mesh': None})
+    store.set_session(stale, {'mesh': None})
+    past = time.time() - 7200
+    for session_id in (active, stale):
+        os.utime(store._session_path(session_id), (past, past))
+    # Lire une session la garde active
+    assert store.get_session(active) == {'mesh': None}
+    store.expire_sessions()
+    assert store.get_session(active) == {'mesh': None}
+    assert store.get_session(stale) is None
+
+
+@pytest.mark.parametrize('key', ['../../etc/passwd', '/tmp/x', 'ABC', '', None, 'a.0'])
+def test_invalid_array_keys(tmp_path, key):
+    store = SessionStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.get_array(key)
+
+
+def test_memoize_closes_evicted_objects(tmp_path):
+    class Resource:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    store = SessionStore(str(tmp_path), max_objects=2)
+    resources = [store.memoize(index, Resource) for index in range(3)]
+    assert [resource.closed for resource in resources] == [True, False, False]
+    assert store.memoize(2, Resource) is resources[2]
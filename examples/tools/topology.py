@@ -0,0 +1,67 @@
+import hashlib
+import threading
+import weakref
+
+import numpy as np
+
+
+def topology_fingerprint(faces, sample_size=4096):
+    """
+    Empreinte rapide d'un tableau de faces : forme, type et un échantillon de lignes.
+
+    Deux tableaux identiques ont la même empreinte ; deux tableaux de même
+    empreinte doivent encore être comparés (voir TopologyRegistry.intern).
+    """
+    faces = np.asarray(faces)
+    rows = np.unique(np.linspace(0, len(faces) - 1, min(len(faces), sample_size)).astype(np.int64))
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{faces.dtype.str}{faces.shape}".encode())
+    h.update(np.ascontiguousarray(faces[rows]).tobytes())
+    return h.hexdigest()
+
+
+class TopologyRegistry:
+    """
+    Tableaux de faces partagés entre maillages de même topologie.
+
+    Des maillages rééchantillonnés sur un même gabarit (voir
+    example_remeshing.py) ont exactement les mêmes faces : intern() retourne,
+    pour des faces déjà connues, le tableau enregistré la première fois, et le
+    tableau reçu peut être libéré. Les tableaux partagés sont en lecture seule
+    et ne sont conservés que tant qu'un maillage les référence.
+    """
+
+    def __init__(self, sample_size=4096):
+        self.sample_size = sample_size
+        self._topologies = {}  # empreinte -> [weakref vers les faces]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def intern(self, faces):
+        """
+        Faces partagées identiques à faces (même contenu, forme et type).
+
+        :return: Le tableau déjà enregistré, ou faces (en lecture seule) s'il est nouveau.
+        """
+        faces = np.asarray(faces)
+        fingerprint = topology_fingerprint(faces, self.sample_size)
+        with self._lock:
+            candidates = [ref() for ref in self._topologies.get(fingerprint, [])]
+            candidates = [candidate for candidate in candidates if candidate is not None]
+            for candidate in candidates:
+                if candidate is faces or np.array_equal(candidate, faces):
+                    self.hits += 1
+                    return candidate
+            self.misses += 1
+            if faces.flags.writeable:
+                faces = faces.view()
+                faces.flags.writeable = False
+            self._topologies[fingerprint] = [weakref.ref(candidate) for candidate in candidates + [faces]]
+            return faces
+
+    def stats(self):
+        """Nombre de topologies enregistrées (encore référencées), de réutilisations et d'ajouts."""
+        with self._lock:
+            alive = sum(ref() is not None for refs in self._topologies.values() for ref in refs)
+            return {'topologies': alive, 'hits': self.hits, 'misses': self.misses}
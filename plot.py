@@ -53,6 +53,116 @@ def visbrain_plot(mesh, tex=None, caption=None, cblabel=None, visb_sc=None,
     return visb_sc
 
 
+def visbrain_mosaic(mesh, textures, captions=None, cblabel=None, clim=None,
+                    cmap='jet', bgcolor='black', n_cols=4,
+                    panel_size=(400, 400), visb_sc=None):
+    """
+    Visualize many textures of the same mesh in a grid of subplots, using
+    visbrain core plotting tool
+    the vertices and faces are converted once and the same buffers are given
+    to every panel, so that the cost of a panel is only its activation data
+    :param mesh: trimesh object
+    :param textures: list of numpy arrays, or 2D numpy array (one texture per
+     row), to be visualized on the mesh
+    :param captions: list of titles of the panels (strings)
+    :param cblabel: label of the colorbar
+    :param clim: (min,max) for the colorbar shared by all panels, by defaut
+     min and max of all textures
+    :param cmap: colormap (string)
+    :param bgcolor: color of the background (string or rgb triplet)
+    :param n_cols: number of panels per row
+    :param panel_size: (width, height) of a panel in pixels
+    :param visb_sc: visbrain scene to which the mosaic is added, below its
+     existing subplots
+    :return: visbrain scene
+    """
+    from visbrain.objects import BrainObj, ColorbarObj, SceneObj
+    # one geometry shared by every panel
+    vertices = np.ascontiguousarray(mesh.vertices, dtype=np.float32)
+    faces = np.ascontiguousarray(mesh.faces, dtype=np.uint32)
+    n_panels = len(textures)
+    n_rows = -(-n_panels // n_cols)
+    if clim is None:
+        clim = (min(np.nanmin(tex) for tex in textures),
+                max(np.nanmax(tex) for tex in textures))
+    if not isinstance(visb_sc, SceneObj):
+        visb_sc = SceneObj(bgcolor=bgcolor,
+                           size=(panel_size[0] * n_cols + 200,
+                                 panel_size[1] * n_rows))
+        first_row = 0
+    else:
+        # a single scan of the existing grid, then O(1) placement per panel
+        first_row = get_visb_sc_shape(visb_sc)[0] + 1
+
+    b_obj = None
+    for ind, tex in enumerate(textures):
+        row, col = divmod(ind, n_cols)
+        b_obj = BrainObj('mosaic_%i' % ind, vertices=vertices, faces=faces,
+                         translucent=False)
+        b_obj.add_activation(data=tex, cmap=cmap, clim=clim)
+        caption = None if captions is None else captions[ind]
+        visb_sc.add_to_subplot(b_obj, row=first_row + row, col=col,
+                               title=caption)
+
+    if b_obj is not None:
+        CBAR_STATE = dict(cbtxtsz=20, txtsz=20., width=.1, cbtxtsh=3.,
+                          rect=(-.3, -2., 1., 4.), cblabel=cblabel)
+        cbar = ColorbarObj(b_obj, **CBAR_STATE)
+        visb_sc.add_to_subplot(cbar, row=first_row, col=n_cols,
+                               row_span=n_rows, width_max=200)
+    return visb_sc
+
+
+def visbrain_playback(mesh, frames, fps=10, caption=None, cblabel=None,
+                      clim=None, cmap='jet', bgcolor='black'):
+    """
+    Play the frames of a multi-frame texture on a mesh using visbrain core
+    plotting tool; the geometry is sent once, then only the activation data
+    of the mesh is replaced at each tick of a vispy timer
+    :param mesh: trimesh object
+    :param frames: sequence of textures (list, 2D numpy array with one frame
+     per row, or any object with len() and indexing); if it has a
+     prefetch(index) method, it is called with the index of the next frame
+    :param fps: number of frames per second
+    :param caption: title of the plot (string)
+    :param cblabel: label of the colorbar
+    :param clim: (min,max) for your colorbar, by defaut min and max of the
+     first frame
+    :param cmap: colormap (string)
+    :param bgcolor: color of the background (string or rgb triplet)
+    :return: (visbrain scene, vispy timer), keep a reference to the timer
+     while the scene is shown with visb_sc.preview()
+    """
+    from visbrain.objects import BrainObj, ColorbarObj, SceneObj
+    from vispy import app
+    first = np.asarray(frames[0])
+    if clim is None:
+        clim = (np.nanmin(first), np.nanmax(first))
+    b_obj = BrainObj('playback', vertices=np.asarray(mesh.vertices),
+                     faces=np.asarray(mesh.faces), translucent=False)
+    b_obj.add_activation(data=first, cmap=cmap, clim=clim)
+    visb_sc = SceneObj(bgcolor=bgcolor, size=(1000, 1000))
+    visb_sc.add_to_subplot(b_obj, row=0, col=0, title=caption)
+    CBAR_STATE = dict(cbtxtsz=20, txtsz=20., width=.1, cbtxtsh=3.,
+                      rect=(-.3, -2., 1., 4.), cblabel=cblabel)
+    cbar = ColorbarObj(b_obj, **CBAR_STATE)
+    visb_sc.add_to_subplot(cbar, row=0, col=1, width_max=200)
+
+    state = {'frame': 0}
+
+    def on_timer(event):
+        state['frame'] = (state['frame'] + 1) % len(frames)
+        # replace the data of the first overlay, the geometry is untouched
+        b_obj.mesh.add_overlay(np.asarray(frames[state['frame']]),
+                               to_overlay=0)
+        b_obj.mesh.update_colormap(to_overlay=0, cmap=cmap, clim=clim)
+        if hasattr(frames, 'prefetch'):
+            frames.prefetch(state['frame'] + 1)
+
+    timer = app.Timer(1. / fps, connect=on_timer, start=True)
+    return visb_sc, timer
+
+
 def get_visb_sc_shape(visb_sc):
     """
     get the subplot shape in a visbrain scene
@@ -67,6 +177,61 @@ def get_visb_sc_shape(visb_sc):
     return rc
 
 
+def shallow_mesh(mesh_in):
+    """
+    Build a trimesh object sharing the vertex and face buffers of mesh_in,
+    with its own (empty) visual, so that coloring it leaves mesh_in untouched
+    :param mesh_in: trimesh object
+    :return: trimesh object
+    """
+    return trimesh.Trimesh(vertices=mesh_in.vertices, faces=mesh_in.faces,
+                           process=False, validate=False)
+
+
+def texture_to_colors(values, color_map=None, alpha_transp=255,
+                      default_color=[100, 100, 100, 200], clim=None):
+    """
+    Map a texture to RGBA colors in a single vectorized uint8 pass
+    values are normalized between their min and max (NaN excluded), as
+    trimesh.visual.color.interpolate does, or between the bounds of clim
+    :param values: numpy array of a texture, possibly containing NaN
+    :param color_map: str or matplotlib colormap, default is 'jet' (12 colors)
+    :param alpha_transp: transparency of the colored values, 0=transparent,
+     255=solid
+    :param default_color: color of the values that are NaN
+    :param clim: (min,max) of the colormap, values outside are clipped
+    :return: (N, 4) uint8 numpy array
+    """
+    import matplotlib.pyplot as plt
+    if color_map is None:
+        color_map = plt.get_cmap('jet', 12)
+    elif isinstance(color_map, str):
+        color_map = plt.get_cmap(color_map)
+    values = np.asarray(values)
+    colors = np.empty((len(values), 4), dtype=np.uint8)
+    nan_inds = np.isnan(values)
+    if nan_inds.all():
+        print('no value in the texture')
+        colors[:] = default_color
+        return colors
+    if clim is None:
+        vmin = np.min(values[~nan_inds])
+        span = np.max(values[~nan_inds]) - vmin
+    else:
+        vmin, span = clim[0], clim[1] - clim[0]
+    # index of each value in the lookup table of the colormap
+    lut = color_map(np.arange(color_map.N), bytes=True)
+    if span > 0:
+        inds = (values - vmin) * (color_map.N / span)
+    else:
+        inds = np.zeros(len(values))
+    inds[nan_inds] = 0
+    colors[:] = lut[np.clip(inds.astype(np.intp), 0, color_map.N - 1)]
+    colors[:, 3] = alpha_transp
+    colors[nan_inds] = default_color
+    return colors
+
+
 def pyglet_plot(mesh_in, values=None, color_map=None,
                 plot_colormap=False, caption=None,
                 alpha_transp=255, background_color=None,
@@ -87,8 +252,9 @@ def pyglet_plot(mesh_in, values=None, color_map=None,
     :return:
     """
     import matplotlib.pyplot as plt
-    # to ensure plotting do not affect the mesh (esp. visual aspects)
-    mesh = mesh_in.copy()
+    # to ensure plotting do not affect the mesh (esp. visual aspects),
+    # without copying its geometry
+    mesh = shallow_mesh(mesh_in)
     if background_color is not None:
         background = background_color
     else:
@@ -105,18 +271,8 @@ def pyglet_plot(mesh_in, values=None, color_map=None,
             color_map = plt.get_cmap('jet', 12)
         # in case NaN are present in 'values'
         nan_inds = np.isnan(values)
-        if sum(nan_inds) == len(values):
-            print('no value in the texture')
-            vect_col_map = np.tile(default_color, (1, len(values)))
-        else:
-
-            vect_col_map_tmp = \
-                trimesh.visual.color.interpolate(values[~nan_inds],
-                                                 color_map=color_map)
-            vect_col_map = np.zeros((len(values), 4))
-            vect_col_map[~nan_inds, :] = vect_col_map_tmp
-            vect_col_map[:, 3] = alpha_transp
-            vect_col_map[nan_inds, :] = default_color
+        vect_col_map = texture_to_colors(values, color_map, alpha_transp,
+                                         default_color)
 
         if values.shape[0] == mesh.vertices.shape[0]:
             mesh.visual.vertex_colors = vect_col_map
@@ -192,3 +348,252 @@ def pyglet_plot(mesh_in, values=None, color_map=None,
     else:
         output = [scene_viewer, fig]
     return output
+
+
+def view_basis(azimuth=0., elevation=0.):
+    """
+    Orthonormal basis of an orthographic camera looking at the origin
+    :param azimuth: angle (degrees) of the camera around the z axis, 0 is on
+     the +x side
+    :param elevation: angle (degrees) of the camera above the xy plane
+    :return: (right, up, direction) unit vectors, direction pointing from
+     the scene toward the camera
+    """
+    az, el = np.radians(azimuth), np.radians(elevation)
+    direction = np.array([np.cos(el) * np.cos(az), np.cos(el) * np.sin(az),
+                          np.sin(el)])
+    up = np.array([0., 0., 1.])
+    if abs(np.dot(up, direction)) > 0.999:
+        up = np.array([0., 1., 0.])
+    right = np.cross(up, direction)
+    right /= np.linalg.norm(right)
+    return right, np.cross(direction, right), direction
+
+
+def rasterize(screen, depth, faces, width, height, max_fragments=1 << 22):
+    """
+    Vectorized software rasterization of triangles with a z-buffer
+    triangles are grouped by the size of their bounding box (powers of two)
+    and every candidate pixel of a group is tested at once, in chunks of at
+    most max_fragments candidates; for each pixel the closest fragment is
+    kept
+    :param screen: (N, 2) pixel coordinates of the vertices (x to the right,
+     y downward)
+    :param depth: (N,) depth of the vertices, smaller is closer
+    :param faces: (M, 3) vertex indices of the triangles
+    :param width: width of the image in pixels
+    :param height: height of the image in pixels
+    :param max_fragments: maximum number of candidate pixels per chunk
+    :return: (face, bary) where face is the (height * width,) index of the
+     visible triangle of each pixel (-1 on background) and bary the
+     (height * width, 3) barycentric coordinates of the pixel in it
+    """
+    tri = screen[faces]
+    tri_depth = depth[faces]
+    lower = np.floor(tri.min(axis=1)).astype(np.int64)
+    upper = np.floor(tri.max(axis=1)).astype(np.int64)
+    lower = np.maximum(lower, 0)
+    upper = np.minimum(upper, [width - 1, height - 1])
+    extent = np.max(upper - lower + 1, axis=1)
+    visible = np.all(upper >= lower, axis=1)
+    size_class = np.ceil(np.log2(np.maximum(extent, 1))).astype(np.int64)
+
+    zbuffer = np.full(width * height, np.inf)
+    face_buffer = np.full(width * height, -1, dtype=np.int64)
+    bary_buffer = np.zeros((width * height, 3), dtype=np.float32)
+    for k in np.unique(size_class[visible]):
+        inds = np.flatnonzero(visible & (size_class == k))
+        side = 1 << int(k)
+        offset_y, offset_x = np.divmod(np.arange(side * side), side)
+        chunk = max(1, max_fragments // (side * side))
+        for start in range(0, len(inds), chunk):
+            f = inds[start:start + chunk]
+            px = lower[f, 0, None] + offset_x
+            py = lower[f, 1, None] + offset_y
+            # sample at pixel centers
+            cx, cy = px + 0.5, py + 0.5
+            (x0, y0), (x1, y1), (x2, y2) = \
+                [(tri[f, i, 0, None], tri[f, i, 1, None]) for i in range(3)]
+            denom = (y1 - y2) * (x0 - x2) + (x2 - x1) * (y0 - y2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                l0 = ((y1 - y2) * (cx - x2) + (x2 - x1) * (cy - y2)) / denom
+                l1 = ((y2 - y0) * (cx - x2) + (x0 - x2) * (cy - y2)) / denom
+                # inf - inf for degenerate triangles, rejected by the test below
+                l2 = 1 - l0 - l1
+            inside = (px <= upper[f, 0, None]) & (py <= upper[f, 1, None]) \
+                & (l0 >= 0) & (l1 >= 0) & (l2 >= 0)
+            rows, cols = np.nonzero(inside)
+            if not len(rows):
+                continue
+            pix = py[rows, cols] * width + px[rows, cols]
+            bary = np.column_stack([l0[rows, cols], l1[rows, cols],
+                                    l2[rows, cols]])
+            z = np.einsum('ij,ij->i', bary, tri_depth[f[rows]])
+            # closest fragment of each pixel in this chunk
+            order = np.lexsort((z, pix))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = pix[order[1:]] != pix[order[:-1]]
+            sel = order[first]
+            sel = sel[z[sel] < zbuffer[pix[sel]]]
+            zbuffer[pix[sel]] = z[sel]
+            face_buffer[pix[sel]] = f[rows[sel]]
+            bary_buffer[pix[sel]] = bary[sel]
+    return face_buffer, bary_buffer
+
+
+def offscreen_plot(mesh, tex=None, filename=None, caption=None, cblabel=None,
+                   clim=None, cmap='jet', bgcolor='black',
+                   default_color=[100, 100, 100, 255], size=(1000, 1000),
+                   azimuth=0., elevation=0., ambient=0.3, diffuse=0.7,
+                   values=None, color_map=None, plot_colormap=None,
+                   alpha_transp=255, background_color=None,
+                   cmap_bounds=None):
+    """
+    Render a trimesh object and its texture without any display
+    (orthographic projection, z-buffer and Lambert shading computed with
+    numpy), with a colorbar drawn by matplotlib's Agg backend
+    the keyword arguments of pyglet_plot are accepted as well, so that a
+    pyglet_plot call can be rendered without a window
+    :param mesh: trimesh object
+    :param tex: numpy array of a texture to be visualized on the mesh, defined
+     on the vertices or on the faces
+    :param filename: if not None, the image is written to this file (png)
+    :param caption: title of the plot (string), drawn above the mesh
+    :param cblabel: label of the colorbar
+    :param clim: (min,max) for your colorbar, by defaut min and max of tex
+    :param cmap: colormap (string or matplotlib colormap)
+    :param bgcolor: color of the background (string or rgb triplet)
+    :param default_color: color of the mesh where tex is NaN, or of the whole
+     mesh if tex is None
+    :param size: (width, height) of the rendered mesh in pixels
+    :param azimuth: angle (degrees) of the camera around the z axis
+    :param elevation: angle (degrees) of the camera above the xy plane
+    :param ambient: ambient part of the lighting
+    :param diffuse: diffuse part of the lighting (light placed at the camera)
+    :param values: same as tex (pyglet_plot)
+    :param color_map: same as cmap (pyglet_plot)
+    :param plot_colormap: draw the colorbar, by default when there is a
+     texture
+    :param alpha_transp: opacity of the colored mesh over the background,
+     0=transparent, 255=solid
+    :param background_color: background as an RGB(A) color in 0-255
+     (pyglet_plot), replaces bgcolor
+    :param cmap_bounds: boundaries of the colorbar bins (pyglet_plot)
+    :return: (height, width, 4) uint8 numpy array of the image, title and
+     colorbar included
+    """
+    import matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    if tex is None:
+        tex = values
+    if color_map is not None:
+        cmap = color_map
+    if background_color is not None:
+        bgcolor = np.asarray(background_color, dtype=float)[:3] / 255
+    if plot_colormap is None:
+        plot_colormap = tex is not None
+    width, height = size
+    vertices = np.asarray(mesh.vertices)
+    faces = np.asarray(mesh.faces)
+    right, up, direction = view_basis(azimuth, elevation)
+
+    # orthographic projection, the mesh filling 90% of the image
+    centered = vertices - (vertices.max(axis=0) + vertices.min(axis=0)) / 2
+    x, y, depth = centered @ right, centered @ up, -(centered @ direction)
+    scale = 0.9 * min(width, height) / max(np.ptp(x), np.ptp(y))
+    screen = np.column_stack([width / 2 + x * scale, height / 2 - y * scale])
+    face, bary = rasterize(screen, depth, faces, width, height)
+    covered = face >= 0
+    face, bary = face[covered], bary[covered]
+
+    # Lambert shading with interpolated vertex normals
+    normals = np.einsum('ij,ijk->ik', bary,
+                        np.asarray(mesh.vertex_normals)[faces[face]])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+    shade = ambient + diffuse * np.abs(normals @ direction)
+
+    if isinstance(cmap, str):
+        cmap = matplotlib.colormaps[cmap]
+    if tex is None:
+        colors = np.tile(np.asarray(default_color, dtype=np.uint8),
+                         (len(face), 1))
+    else:
+        tex = np.asarray(tex)
+        if clim is None:
+            clim = (np.nanmin(tex), np.nanmax(tex))
+        if tex.shape[0] == vertices.shape[0]:
+            values = np.einsum('ij,ij->i', bary, tex[faces[face]])
+        else:
+            values = tex[face]
+        colors = texture_to_colors(values, cmap, alpha_transp=alpha_transp,
+                                   default_color=default_color, clim=clim)
+
+    background = np.round(np.array(matplotlib.colors.to_rgba(bgcolor)) * 255)
+    image = np.empty((width * height, 4), dtype=np.uint8)
+    image[:] = background.astype(np.uint8)
+    if tex is None:
+        opacity = np.ones((len(face), 1))
+    else:
+        opacity = colors[:, 3:] / 255
+    image[covered, :3] = np.clip(colors[:, :3] * shade[:, None] * opacity
+                                 + background[:3] * (1 - opacity), 0, 255)
+    image[covered, 3] = 255
+    image = image.reshape(height, width, 4)
+
+    # composition with the title (in its own band above the mesh) and the
+    # colorbar
+    dpi = 100
+    cb_width = 200 if plot_colormap and tex is not None else 0
+    title_height = 60 if caption is not None else 0
+    fig_width, fig_height = width + cb_width, height + title_height
+    fig = Figure(figsize=(fig_width / dpi, fig_height / dpi), dpi=dpi,
+                 facecolor=background / 255)
+    FigureCanvasAgg(fig)
+    fg_color = 'white' if np.mean(background[:3]) < 128 else 'black'
+    ax = fig.add_axes([0, 0, width / fig_width, height / fig_height])
+    ax.imshow(image, interpolation='nearest')
+    ax.set_axis_off()
+    if caption is not None:
+        fig.suptitle(caption, color=fg_color, fontsize=16, va='center',
+                     x=width / 2 / fig_width,
+                     y=1 - title_height / 2 / fig_height)
+    if cb_width:
+        left = (width + 0.2 * cb_width) / fig_width
+        cax = fig.add_axes([left, 0.1 * height / fig_height,
+                            0.15 * cb_width / fig_width,
+                            0.8 * height / fig_height])
+        if cmap_bounds is None:
+            norm = matplotlib.colors.Normalize(vmin=clim[0], vmax=clim[1])
+        else:
+            norm = matplotlib.colors.BoundaryNorm(cmap_bounds, cmap.N)
+        sm = matplotlib.cm.ScalarMappable(norm=norm, cmap=cmap)
+        cbar = fig.colorbar(sm, cax=cax)
+        cbar.ax.tick_params(colors=fg_color)
+        cbar.outline.set_edgecolor(fg_color)
+        if cblabel is not None:
+            cbar.set_label(cblabel, color=fg_color)
+    fig.canvas.draw()
+    output = np.asarray(fig.canvas.buffer_rgba()).copy()
+    if filename is not None:
+        fig.savefig(filename, dpi=dpi, facecolor=fig.get_facecolor())
+    return output
+
+
+def _offscreen_plot_job(kwargs):
+    """run offscreen_plot in a worker process, return the file name only"""
+    offscreen_plot(**kwargs)
+    return kwargs['filename']
+
+
+def offscreen_plot_batch(jobs, n_jobs=None):
+    """
+    Render many figures with offscreen_plot in a pool of processes
+    :param jobs: list of dicts of offscreen_plot arguments, each one with a
+     'filename'
+    :param n_jobs: number of processes, by default the number of cores
+    :return: list of the written file names, in the order of jobs
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(_offscreen_plot_job, jobs, chunksize=1))